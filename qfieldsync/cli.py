@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+Synchronizes QFieldCloud projects without the QGIS user interface, e.g. from cron jobs:
+
+    python -m qfieldsync.cli --username jane --json owner/project_a 1c9d2c9e-...
+
+The password is read from the `QFIELDCLOUD_PASSWORD` environment variable, alternatively a token can be passed via
+`QFIELDCLOUD_TOKEN`. The exit code is 0 if all the projects are synchronized, 1 if any of them failed or has files
+changed both locally and on QFieldCloud, and 2 if the synchronization could not even start.
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from qgis.core import QgsApplication
+from qgis.PyQt.QtCore import QEventLoop
+
+from qfieldsync.core.batch_syncer import BatchSyncer
+from qfieldsync.core.cloud_api import CloudException, CloudNetworkAccessManager
+from qfieldsync.core.cloud_project import CloudProject
+from qfieldsync.core.preferences import Preferences
+from qfieldsync.core.sync_planner import ConflictPolicy
+
+EXIT_SUCCESS = 0
+EXIT_PROJECT_FAILED = 1
+EXIT_NOT_STARTED = 2
+
+
+class SyncError(Exception):
+    pass
+
+
+class SyncReporter:
+    """Reports the synchronization progress either as human readable lines on stderr, or as JSON lines on stdout."""
+
+    def __init__(self, is_json: bool) -> None:
+        self.is_json = is_json
+        self._last_percents: Dict[str, int] = {}
+
+    def event(self, event: str, message: str = "", **data: Any) -> None:
+        if self.is_json:
+            print(json.dumps({"event": event, **data}), flush=True)
+        elif message:
+            print(message, file=sys.stderr, flush=True)
+
+    def progress(self, project: str, direction: str, fraction: float) -> None:
+        percent = int(fraction * 100)
+        key = f"{project}:{direction}"
+
+        # the network replies report progress very often, report only whole percents
+        if self._last_percents.get(key) == percent:
+            return
+
+        self._last_percents[key] = percent
+        self.event(
+            "progress",
+            f"{project}: {direction} {percent}%",
+            project=project,
+            direction=direction,
+            percent=percent,
+        )
+
+
+def wait_for(*signals) -> None:
+    """Runs the event loop until any of the signals is emitted."""
+    loop = QEventLoop()
+
+    for signal in signals:
+        signal.connect(loop.quit)
+
+    loop.exec_()
+
+    for signal in signals:
+        signal.disconnect(loop.quit)
+
+
+def login(
+    network_manager: CloudNetworkAccessManager,
+    username: Optional[str],
+    password: Optional[str],
+    token: Optional[str],
+) -> None:
+    if token:
+        network_manager.set_token(token)
+        return
+
+    if not username or not password:
+        raise SyncError("Either a token or a username and password are required")
+
+    # unlike `CloudNetworkAccessManager.login`, never store the credentials in the QGIS authentication database
+    reply = network_manager.cloud_post(
+        "auth/login/", {"username": username, "password": password}
+    )
+    wait_for(reply.finished)
+
+    network_manager.set_token(network_manager.json_object(reply)["token"])
+
+
+def fetch_projects(network_manager: CloudNetworkAccessManager) -> List[CloudProject]:
+    projects_cache = network_manager.projects_cache
+    errors = []
+
+    projects_cache.projects_error.connect(errors.append)
+    projects_cache.refresh()
+
+    # the projects are fetched page by page
+    while projects_cache.is_refreshing:
+        wait_for(projects_cache.projects_updated, projects_cache.projects_error)
+
+    projects_cache.projects_error.disconnect(errors.append)
+
+    if errors:
+        raise SyncError(errors[0])
+
+    return projects_cache.projects or []
+
+
+def find_project(
+    projects: List[CloudProject], project_ref: str
+) -> Optional[CloudProject]:
+    for project in projects:
+        if project_ref in (project.id, project.name_with_owner):
+            return project
+
+    return None
+
+
+def report_project_finished(
+    reporter: SyncReporter, batch_syncer: BatchSyncer, project_id: str
+) -> None:
+    entry = batch_syncer.report[project_id]
+    counts = "{} uploaded, {} downloaded, {} deleted".format(
+        entry["to_upload"], entry["to_download"], entry["to_delete"]
+    )
+    message = f"{entry['project']}: {entry['status']} ({counts})"
+
+    if entry["errors"]:
+        message += "\n  " + "\n  ".join(entry["errors"])
+
+    reporter.event("project_finished", message, **entry)
+
+
+def sync(args: argparse.Namespace) -> int:
+    reporter = SyncReporter(args.json)
+    # never touch the settings and the queued mutations of the QGIS user running QFieldSync
+    network_manager = CloudNetworkAccessManager(is_headless=True)
+
+    if args.server_url:
+        network_manager.set_url(args.server_url)
+
+    try:
+        login(
+            network_manager,
+            args.username,
+            os.environ.get("QFIELDCLOUD_PASSWORD"),
+            os.environ.get("QFIELDCLOUD_TOKEN"),
+        )
+        projects = fetch_projects(network_manager)
+    except (CloudException, SyncError) as err:
+        reporter.event("error", f"Failed to start: {err}", message=str(err))
+        return EXIT_NOT_STARTED
+
+    projects_dir = Path(
+        args.projects_dir or Preferences().value("cloudDirectory")
+    ).absolute()
+    exit_code = EXIT_SUCCESS
+    cloud_projects = []
+
+    for project_ref in args.projects:
+        cloud_project = find_project(projects, project_ref)
+
+        if not cloud_project:
+            reporter.event(
+                "project_finished",
+                f"{project_ref}: project not found",
+                project=project_ref,
+                status="failed",
+                errors=["Project not found"],
+            )
+            exit_code = EXIT_PROJECT_FAILED
+            continue
+
+        cloud_projects.append(cloud_project)
+
+    batch_syncer = BatchSyncer(
+        network_manager,
+        cloud_projects,
+        ConflictPolicy(args.policy),
+        projects_dir,
+        args.max_parallel_requests,
+    )
+    batch_syncer.project_progress.connect(
+        lambda project_id, direction, fraction: reporter.progress(
+            batch_syncer.report[project_id]["project"], direction, fraction
+        )
+    )
+    batch_syncer.project_finished.connect(
+        lambda project_id: report_project_finished(reporter, batch_syncer, project_id)
+    )
+    batch_syncer.start()
+
+    if not batch_syncer.is_finished:
+        wait_for(batch_syncer.finished)
+
+    if any(
+        entry["status"] != "synced" and entry["status"] != "up_to_date"
+        for entry in batch_syncer.report.values()
+    ):
+        exit_code = EXIT_PROJECT_FAILED
+
+    return exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m qfieldsync.cli",
+        description="Synchronize QFieldCloud projects without user interaction.",
+    )
+    parser.add_argument(
+        "projects",
+        nargs="+",
+        metavar="PROJECT",
+        help='project id or "owner/name"',
+    )
+    parser.add_argument(
+        "--server-url",
+        help="QFieldCloud server URL, defaults to the one used by QFieldSync",
+    )
+    parser.add_argument("--username", help="QFieldCloud username")
+    parser.add_argument(
+        "--projects-dir",
+        help="directory for the projects that have no local copy yet, defaults to the QFieldSync cloud directory",
+    )
+    parser.add_argument(
+        "--policy",
+        choices=[policy.value for policy in ConflictPolicy],
+        default=ConflictPolicy.Newer.value,
+        help="which copy wins when a file differs, defaults to the most recently modified one",
+    )
+    parser.add_argument(
+        "--max-parallel-requests",
+        type=int,
+        default=8,
+        help="maximum number of file transfers at once, shared by all the projects",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print the progress as JSON lines on stdout",
+    )
+    args = parser.parse_args(argv)
+
+    app = QgsApplication.instance()
+    # only exit the QGIS application that was initialized here, e.g. not the one of the Python console
+    is_app_owned = app is None
+    if is_app_owned:
+        app = QgsApplication([], False)
+        app.initQgis()
+
+    try:
+        return sync(args)
+    finally:
+        Preferences.flush()
+
+        if is_app_owned:
+            app.exitQgis()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from qgis.core import Qgis, QgsApplication, QgsMapLayer, QgsMessageLog, QgsProject
+from qgis.PyQt.QtCore import QObject, QTimer, pyqtSignal
+from qgis.PyQt.QtWidgets import QApplication, QDialog
+
+from qfieldsync.core.cloud_api import CloudNetworkAccessManager
+from qfieldsync.core.cloud_project import CloudProject, ProjectFile
+from qfieldsync.core.cloud_transferrer import CloudTransferrer
+from qfieldsync.core.preferences import Preferences
+from qfieldsync.core.sync_lock import sync_lock
+from qfieldsync.core.sync_planner import (
+    ConflictPolicy,
+    SyncPlanner,
+    plan_file_transfers,
+    read_synced_hashes,
+    update_synced_hashes,
+)
+from qfieldsync.utils.qgis_utils import get_project_layer_paths
+
+try:
+    # removed in Qt 6, then the network is never considered metered
+    from qgis.PyQt.QtNetwork import QNetworkConfiguration, QNetworkConfigurationManager
+except ImportError:
+    QNetworkConfigurationManager = None
+
+
+class AutoSyncer(QObject):
+    """Synchronizes the currently open cloud project in the background.
+
+    A synchronization is attempted every `qfieldCloudAutoSyncInterval` minutes and shortly after local changes, but
+    only while QGIS is idle, i.e. no layer is being edited and no dialog is active, and nobody else holds the
+    `sync_lock` of the project. Only the safe actions are performed: nothing is deleted, the files opened in QGIS are
+    never replaced and the files changed both locally and on the cloud since the last synchronization are reported as
+    conflicts instead of being overwritten. Failures are retried with an exponential backoff.
+    """
+
+    # how often the scheduler checks whether a synchronization is due, in milliseconds
+    TICK_INTERVAL = 10 * 1000
+    # seconds to wait after the last local change, so a burst of changes is synchronized at once
+    LOCAL_CHANGE_DEBOUNCE = 30
+    BACKOFF_MIN = 60
+    BACKOFF_MAX = 60 * 60
+
+    # project id
+    sync_started = pyqtSignal(str)
+    # project id, whether the synchronization succeeded
+    sync_finished = pyqtSignal(str, bool)
+    # project id, the names of the files changed both locally and on the cloud, emitted when they change
+    sync_conflicts = pyqtSignal(str, list)
+
+    def __init__(
+        self, network_manager: CloudNetworkAccessManager, parent: QObject = None
+    ) -> None:
+        super(AutoSyncer, self).__init__(parent=parent)
+
+        self.preferences = Preferences()
+        self.network_manager = network_manager
+        # seconds between the first unsynchronized local edit and its upload, for the last synchronizations
+        self.latencies: Deque[float] = deque(maxlen=100)
+
+        self._cloud_project: Optional[CloudProject] = None
+        self._sync_planner: Optional[SyncPlanner] = None
+        self._transferrer: Optional[CloudTransferrer] = None
+        self._is_transfer_failed = False
+        # the last reported conflicts per project id
+        self._conflicting_filenames: Dict[str, Set[str]] = {}
+        self._sync_started_at = 0.0
+        self._next_sync_at = time.monotonic() + self._interval
+        self._failures_count = 0
+        self._first_unsynced_edit_at: Optional[float] = None
+        self._last_edit_at: Optional[float] = None
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._on_tick)
+        self._timer.start(AutoSyncer.TICK_INTERVAL)
+
+        self.network_manager.projects_cache.project_local_files_changed.connect(
+            self._on_project_local_files_changed
+        )
+        QgsProject.instance().layersAdded.connect(self._on_layers_added)
+        self._on_layers_added(list(QgsProject.instance().mapLayers().values()))
+
+    @property
+    def is_syncing(self) -> bool:
+        return self._cloud_project is not None
+
+    @property
+    def _interval(self) -> int:
+        return max(self.preferences.value("qfieldCloudAutoSyncInterval"), 1) * 60
+
+    def stop(self) -> None:
+        self._timer.stop()
+
+        if self._sync_planner:
+            self._sync_planner.cancel()
+
+        if self._transferrer:
+            self._transferrer.abort_requests()
+
+        if self._cloud_project:
+            sync_lock.release(self._cloud_project.id, self)
+
+        self._cloud_project = None
+        self._sync_planner = None
+        self._transferrer = None
+
+        QgsProject.instance().layersAdded.disconnect(self._on_layers_added)
+        self.network_manager.projects_cache.project_local_files_changed.disconnect(
+            self._on_project_local_files_changed
+        )
+
+        # the removed layers are already deleted together with their connections
+        for layer in QgsProject.instance().mapLayers().values():
+            if not hasattr(layer, "afterCommitChanges"):
+                continue
+
+            try:
+                layer.afterCommitChanges.disconnect(self._on_local_edit)
+            except TypeError:
+                # e.g. added while the auto synchronization was stopped
+                pass
+
+    def _on_layers_added(self, layers: List[QgsMapLayer]) -> None:
+        for layer in layers:
+            # only vector layers have `afterCommitChanges`
+            if hasattr(layer, "afterCommitChanges"):
+                layer.afterCommitChanges.connect(self._on_local_edit)
+
+    def _on_project_local_files_changed(self, project_id: str) -> None:
+        currently_open_project = (
+            self.network_manager.projects_cache.currently_open_project
+        )
+
+        if currently_open_project and currently_open_project.id == project_id:
+            self._on_local_edit()
+
+    def _on_local_edit(self) -> None:
+        now = time.monotonic()
+
+        self._last_edit_at = now
+        if self._first_unsynced_edit_at is None:
+            self._first_unsynced_edit_at = now
+
+        # do not shorten the backoff after failures
+        if self._failures_count == 0:
+            self._next_sync_at = now + AutoSyncer.LOCAL_CHANGE_DEBOUNCE
+
+    def _is_idle(self) -> bool:
+        # e.g. the user is synchronizing manually
+        if QApplication.activeModalWidget() is not None or isinstance(
+            QApplication.activeWindow(), QDialog
+        ):
+            return False
+
+        for layer in QgsProject.instance().mapLayers().values():
+            if layer.isEditable():
+                return False
+
+        return True
+
+    def _is_network_metered(self) -> bool:
+        if QNetworkConfigurationManager is None:
+            return False
+
+        bearer_type_family = (
+            QNetworkConfigurationManager().defaultConfiguration().bearerTypeFamily()
+        )
+
+        return bearer_type_family in (
+            QNetworkConfiguration.Bearer2G,
+            QNetworkConfiguration.Bearer3G,
+            QNetworkConfiguration.Bearer4G,
+        )
+
+    def _on_tick(self) -> None:
+        if not self.preferences.value("qfieldCloudAutoSync"):
+            return
+
+        if self.is_syncing or time.monotonic() < self._next_sync_at:
+            return
+
+        if not self._is_idle():
+            return
+
+        if (
+            self.preferences.value("qfieldCloudAutoSyncPauseOnMetered")
+            and self._is_network_metered()
+        ):
+            return
+
+        cloud_project = self.network_manager.projects_cache.currently_open_project
+
+        if (
+            not self.network_manager.has_token()
+            or not cloud_project
+            or not cloud_project.local_dir
+        ):
+            self._next_sync_at = time.monotonic() + self._interval
+            return
+
+        # e.g. the user is synchronizing manually, try again on the next tick
+        if not sync_lock.acquire(cloud_project.id, self):
+            return
+
+        self._start(cloud_project)
+
+    def _start(self, cloud_project: CloudProject) -> None:
+        self._cloud_project = cloud_project
+        self._sync_started_at = time.monotonic()
+        self.sync_started.emit(cloud_project.id)
+
+        reply = self.network_manager.projects_cache.get_project_files(cloud_project.id)
+        reply.finished.connect(self._on_project_files_fetched)
+
+    def _on_project_files_fetched(self) -> None:
+        if not self._cloud_project:
+            return
+
+        if self._cloud_project.cloud_files is None:
+            self._finish(False)
+            return
+
+        self._sync_planner = SyncPlanner(self._cloud_project)
+        self._sync_planner.taskCompleted.connect(self._on_sync_planner_completed)
+        self._sync_planner.taskTerminated.connect(lambda: self._finish(False))
+
+        QgsApplication.taskManager().addTask(self._sync_planner)
+
+    def _on_sync_planner_completed(self) -> None:
+        if not self._cloud_project or not self._sync_planner:
+            return
+
+        assert self._sync_planner.files_to_sync is not None
+
+        # the files that are the same on both sides are the base to detect the conflicts of the next synchronizations
+        synced_hashes = read_synced_hashes(self._cloud_project)
+        in_sync_hashes = {
+            filename: sha256
+            for filename, sha256 in self._sync_planner.in_sync_hashes.items()
+            if synced_hashes.get(filename) != sha256
+        }
+        update_synced_hashes(self._cloud_project, in_sync_hashes)
+        synced_hashes.update(in_sync_hashes)
+
+        files = plan_file_transfers(
+            self._cloud_project,
+            self._sync_planner.files_to_sync,
+            ConflictPolicy.Newer,
+            synced_hashes,
+        )
+        self._sync_planner = None
+
+        self._report_conflicts(files["conflicts"])
+
+        # replacing the files opened in QGIS might corrupt them, keep them for the manual synchronization
+        open_paths = get_project_layer_paths()
+        open_paths.add(os.path.normcase(QgsProject.instance().fileName()))
+        files_to_download = [
+            project_file
+            for project_file in files["to_download"]
+            if os.path.normcase(str(project_file.local_path)) not in open_paths
+        ]
+
+        if not files["to_upload"] and not files_to_download:
+            self._finish(True)
+            return
+
+        self._is_transfer_failed = False
+        self._transferrer = CloudTransferrer(self.network_manager, self._cloud_project)
+        # the transferrer keeps running after an error, it is released only once finished
+        self._transferrer.error.connect(self._on_transferrer_error)
+        self._transferrer.finished.connect(self._on_transferrer_finished)
+        self._transferrer.sync(files["to_upload"], files_to_download, [])
+
+    def _report_conflicts(self, conflicting_files: List[ProjectFile]) -> None:
+        assert self._cloud_project
+
+        conflicting_filenames = {
+            project_file.name for project_file in conflicting_files
+        }
+
+        project_id = self._cloud_project.id
+
+        if conflicting_filenames == self._conflicting_filenames.get(project_id, set()):
+            return
+
+        self._conflicting_filenames[project_id] = conflicting_filenames
+
+        if conflicting_filenames:
+            QgsMessageLog.logMessage(
+                self.tr(
+                    'Automatic synchronization of "{}" skipped the files changed both locally and on QFieldCloud: {}'
+                ).format(
+                    self._cloud_project.name_with_owner,
+                    ", ".join(sorted(conflicting_filenames)),
+                ),
+                "QFieldSync",
+                Qgis.Warning,
+            )
+
+        self.sync_conflicts.emit(project_id, sorted(conflicting_filenames))
+
+    def _on_transferrer_error(self, _descr: str, _error: Exception) -> None:
+        self._is_transfer_failed = True
+
+    def _on_transferrer_finished(self) -> None:
+        if not self._transferrer:
+            return
+
+        if self._is_transfer_failed:
+            self._finish(False)
+            return
+
+        for throttled_transferrer in (
+            self._transferrer.throttled_uploader,
+            self._transferrer.throttled_downloader,
+        ):
+            for transfer in throttled_transferrer.transfers.values():
+                if transfer.error:
+                    self._finish(False)
+                    return
+
+        self._finish(True)
+
+    def _finish(self, is_success: bool) -> None:
+        cloud_project = self._cloud_project
+
+        if not cloud_project:
+            return
+
+        now = time.monotonic()
+        sync_lock.release(cloud_project.id, self)
+        self._cloud_project = None
+        self._sync_planner = None
+        self._transferrer = None
+
+        if is_success:
+            self._failures_count = 0
+            self._next_sync_at = now + self._interval
+
+            if (
+                self._first_unsynced_edit_at is not None
+                and self._first_unsynced_edit_at <= self._sync_started_at
+            ):
+                latency = now - self._first_unsynced_edit_at
+                self.latencies.append(latency)
+
+                QgsMessageLog.logMessage(
+                    self.tr(
+                        'Automatically synchronized "{}", {:.0f}s after the first local change.'
+                    ).format(cloud_project.name_with_owner, latency),
+                    "QFieldSync",
+                    Qgis.Info,
+                )
+
+                # the edits made during the synchronization are left for the next one
+                if self._last_edit_at and self._last_edit_at > self._sync_started_at:
+                    self._first_unsynced_edit_at = self._last_edit_at
+                else:
+                    self._first_unsynced_edit_at = None
+        else:
+            self._failures_count += 1
+            self._next_sync_at = now + min(
+                AutoSyncer.BACKOFF_MIN * 2 ** (self._failures_count - 1),
+                AutoSyncer.BACKOFF_MAX,
+            )
+
+            QgsMessageLog.logMessage(
+                self.tr(
+                    'Automatic synchronization of "{}" failed, retrying in {:.0f}s.'
+                ).format(cloud_project.name_with_owner, self._next_sync_at - now),
+                "QFieldSync",
+                Qgis.Warning,
+            )
+
+        self.sync_finished.emit(cloud_project.id, is_success)
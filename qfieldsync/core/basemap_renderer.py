@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from osgeo import gdal
+from qgis.core import (
+    QgsApplication,
+    QgsExpressionContext,
+    QgsExpressionContextUtils,
+    QgsFeedback,
+    QgsMapLayer,
+    QgsMapLayerStyle,
+    QgsMapRendererParallelJob,
+    QgsMapSettings,
+    QgsProject,
+    QgsRectangle,
+)
+from qgis.PyQt.QtCore import QSize
+from qgis.PyQt.QtGui import QImage
+
+from qfieldsync.libqfieldsync import ProjectConfiguration, ProjectProperties
+from qfieldsync.utils.qgis_utils import ONLINE_PROVIDERS, get_layer_fingerprint
+
+# column and row of a tile in the tile grid
+TileIndex = Tuple[int, int]
+
+
+class BaseMapRenderer:
+    """Renders the base map of a project, as configured in its `ProjectConfiguration`, into a tiled raster.
+
+    The map is rendered in tiles of `base_map_tile_size` pixels, up to `max_parallel` at once. The tiles are aligned
+    to a grid starting at the CRS origin and cached on disk, keyed by the rendered layers and their styles, the map
+    units per pixel and the tile size. Rendering the base map again for an unchanged style, even with a different
+    area of interest, reuses the cached tiles that overlap. The changes of online layers, e.g. XYZ or WMS, cannot be
+    detected, so their tiles are rendered again once older than `ONLINE_TILES_MAX_AGE`.
+
+    The output is a GeoPackage or MBTiles tile pyramid, with overviews built using all the cores.
+
+    Must be used from the thread of the project, i.e. the main thread for `QgsProject.instance()`.
+    """
+
+    # number of styles with cached tiles, the least recently used are evicted first
+    MAX_CACHED_STYLES = 5
+    # total size in bytes of the cached tiles of a style, the oldest are evicted first
+    MAX_CACHED_TILES_SIZE = 1024 * 1024 * 1024
+    # age in seconds of the cached tiles with online layers, after which they are rendered again
+    ONLINE_TILES_MAX_AGE = 24 * 60 * 60
+    # output format and GDAL driver
+    FORMATS = {
+        "gpkg": "GPKG",
+        "mbtiles": "MBTiles",
+    }
+
+    def __init__(
+        self,
+        project: QgsProject,
+        max_parallel: Optional[int] = None,
+        feedback: Optional[QgsFeedback] = None,
+        cache_dir: Optional[Path] = None,
+    ) -> None:
+        self.project = project
+        self.project_configuration = ProjectConfiguration(project)
+        self.max_parallel = max(max_parallel or os.cpu_count() or 1, 1)
+        self.feedback = feedback
+        self.cache_dir = cache_dir or Path(
+            QgsApplication.qgisSettingsDirPath(), "cache", "qfieldsync", "tiles"
+        )
+        self.rendered_count = 0
+        self.cached_count = 0
+        self._tiles_max_age: Optional[float] = None
+
+    @property
+    def mupp(self) -> float:
+        return self.project_configuration.base_map_mupp
+
+    @property
+    def tile_size(self) -> int:
+        return self.project_configuration.base_map_tile_size
+
+    def get_layers(self) -> List[QgsMapLayer]:
+        """Returns the layers of the base map, from top to bottom."""
+        if (
+            self.project_configuration.base_map_type
+            == ProjectProperties.BaseMapType.SINGLE_LAYER
+        ):
+            layer = self.project.mapLayer(self.project_configuration.base_map_layer)
+
+            return [layer] if layer else []
+
+        return self.project.mapThemeCollection().mapThemeVisibleLayers(
+            self.project_configuration.base_map_theme
+        )
+
+    def get_style_overrides(self) -> Dict[str, str]:
+        if (
+            self.project_configuration.base_map_type
+            == ProjectProperties.BaseMapType.SINGLE_LAYER
+        ):
+            return {}
+
+        return self.project.mapThemeCollection().mapThemeStyleOverrides(
+            self.project_configuration.base_map_theme
+        )
+
+    def has_online_layers(self) -> bool:
+        return any(
+            layer.dataProvider() and layer.dataProvider().name() in ONLINE_PROVIDERS
+            for layer in self.get_layers()
+        )
+
+    def get_style_key(self) -> Optional[str]:
+        """Returns the key of the rendered layers and their styles, or `None` if their changes cannot be detected."""
+        style_overrides = self.get_style_overrides()
+        key_data: List[Any] = [
+            self.project.crs().toWkt(),
+            self.project.backgroundColor().name(),
+        ]
+
+        for layer in self.get_layers():
+            fingerprint = get_layer_fingerprint(layer)
+
+            if fingerprint is None and (
+                not layer.dataProvider()
+                or layer.dataProvider().name() not in ONLINE_PROVIDERS
+            ):
+                return None
+
+            style = QgsMapLayerStyle()
+            style.readFromLayer(layer)
+
+            key_data.append(
+                [
+                    layer.id(),
+                    layer.source(),
+                    fingerprint,
+                    style_overrides.get(layer.id()) or style.xmlData(),
+                ]
+            )
+
+        return hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+
+    def render(
+        self, extent: QgsRectangle, output_path: str, output_format: str = "gpkg"
+    ) -> None:
+        """Renders the base map covering the extent, in project CRS, into a raster at `output_path`.
+
+        The written raster is snapped to the tile grid, so it might be slightly larger than the extent. MBTiles are
+        always in EPSG:3857, so the rendered map is reprojected in that case.
+        """
+        if output_format not in BaseMapRenderer.FORMATS:
+            raise Exception(f'Unsupported base map format "{output_format}"')
+
+        if output_format == "gpkg":
+            self._render_gpkg(extent, output_path)
+        else:
+            gpkg_path = f"{output_path}.gpkg"
+
+            try:
+                self._render_gpkg(extent, gpkg_path)
+
+                if self.feedback and self.feedback.isCanceled():
+                    return
+
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+
+                if not gdal.Translate(
+                    output_path,
+                    gpkg_path,
+                    format=BaseMapRenderer.FORMATS[output_format],
+                ):
+                    raise Exception(
+                        f'Failed to write the base map "{output_path}": {gdal.GetLastErrorMsg()}'
+                    )
+            finally:
+                if os.path.exists(gpkg_path):
+                    os.remove(gpkg_path)
+
+        if self.feedback and self.feedback.isCanceled():
+            return
+
+        self._build_overviews(output_path)
+
+    def _render_gpkg(self, extent: QgsRectangle, output_path: str) -> None:
+        tile_span = self.tile_size * self.mupp
+        min_col = math.floor(extent.xMinimum() / tile_span)
+        max_col = max(math.ceil(extent.xMaximum() / tile_span), min_col + 1)
+        min_row = math.floor(extent.yMinimum() / tile_span)
+        max_row = max(math.ceil(extent.yMaximum() / tile_span), min_row + 1)
+
+        tiles_dir = self._get_tiles_dir()
+        dataset = self._create_dataset(
+            output_path,
+            (max_col - min_col) * self.tile_size,
+            (max_row - min_row) * self.tile_size,
+            (min_col * tile_span, max_row * tile_span),
+        )
+
+        try:
+            tile_indices = [
+                (col, row)
+                for row in range(max_row - 1, min_row - 1, -1)
+                for col in range(min_col, max_col)
+            ]
+
+            for done_count, (tile_index, image) in enumerate(
+                self._render_tiles(tile_indices, tiles_dir), 1
+            ):
+                col, row = tile_index
+                self._write_tile(
+                    dataset,
+                    image,
+                    (col - min_col) * self.tile_size,
+                    (max_row - 1 - row) * self.tile_size,
+                )
+
+                if self.feedback:
+                    self.feedback.setProgress(100 * done_count / len(tile_indices))
+        finally:
+            # closes the dataset
+            del dataset
+
+        if tiles_dir:
+            self._evict()
+            self._trim(tiles_dir.parent)
+
+    def _render_tiles(
+        self, tile_indices: List[TileIndex], tiles_dir: Optional[Path]
+    ) -> Iterator[Tuple[TileIndex, QImage]]:
+        pending_indices = list(tile_indices)
+
+        while pending_indices:
+            if self.feedback and self.feedback.isCanceled():
+                return
+
+            jobs: List[Tuple[TileIndex, QgsMapRendererParallelJob]] = []
+
+            while pending_indices and len(jobs) < self.max_parallel:
+                tile_index = pending_indices.pop(0)
+                tile_path = self._get_tile_path(tiles_dir, tile_index)
+
+                if tile_path and self._is_tile_fresh(tile_path):
+                    image = QImage(str(tile_path))
+
+                    if not image.isNull():
+                        self.cached_count += 1
+                        yield tile_index, image
+                        continue
+
+                job = QgsMapRendererParallelJob(self._get_map_settings(tile_index))
+                job.start()
+                jobs.append((tile_index, job))
+
+            # the jobs render concurrently, each with its layers in parallel, wait for all of them
+            for tile_index, job in jobs:
+                job.waitForFinished()
+                image = job.renderedImage()
+                self.rendered_count += 1
+
+                tile_path = self._get_tile_path(tiles_dir, tile_index)
+                if tile_path:
+                    temp_tile_path = tile_path.with_name(
+                        f".{uuid.uuid4().hex}{tile_path.suffix}"
+                    )
+                    image.save(str(temp_tile_path), "PNG")
+                    os.replace(temp_tile_path, tile_path)
+
+                yield tile_index, image
+
+    def _get_map_settings(self, tile_index: TileIndex) -> QgsMapSettings:
+        col, row = tile_index
+        tile_span = self.tile_size * self.mupp
+
+        map_settings = QgsMapSettings()
+        map_settings.setDestinationCrs(self.project.crs())
+        map_settings.setTransformContext(self.project.transformContext())
+        map_settings.setLayers(self.get_layers())
+        map_settings.setLayerStyleOverrides(self.get_style_overrides())
+        map_settings.setBackgroundColor(self.project.backgroundColor())
+        map_settings.setOutputSize(QSize(self.tile_size, self.tile_size))
+        map_settings.setExtent(
+            QgsRectangle(
+                col * tile_span,
+                row * tile_span,
+                (col + 1) * tile_span,
+                (row + 1) * tile_span,
+            )
+        )
+        # avoid clipped labels and symbols at the tile edges
+        map_settings.setFlag(QgsMapSettings.RenderMapTile, True)
+        map_settings.setFlag(QgsMapSettings.Antialiasing, True)
+
+        expression_context = QgsExpressionContext()
+        expression_context.appendScope(QgsExpressionContextUtils.globalScope())
+        expression_context.appendScope(
+            QgsExpressionContextUtils.projectScope(self.project)
+        )
+        map_settings.setExpressionContext(expression_context)
+
+        return map_settings
+
+    def _get_tiles_dir(self) -> Optional[Path]:
+        style_key = self.get_style_key()
+
+        if not style_key:
+            return None
+
+        self._tiles_max_age = (
+            BaseMapRenderer.ONLINE_TILES_MAX_AGE if self.has_online_layers() else None
+        )
+        style_dir = self.cache_dir.joinpath(style_key)
+        tiles_dir = style_dir.joinpath(f"{self.mupp!r}_{self.tile_size}")
+        tiles_dir.mkdir(parents=True, exist_ok=True)
+        # mark as recently used
+        os.utime(style_dir)
+
+        return tiles_dir
+
+    def _is_tile_fresh(self, tile_path: Path) -> bool:
+        try:
+            stat = tile_path.stat()
+        except OSError:
+            return False
+
+        if self._tiles_max_age is None:
+            return True
+
+        return time.time() - stat.st_mtime < self._tiles_max_age
+
+    def _get_tile_path(
+        self, tiles_dir: Optional[Path], tile_index: TileIndex
+    ) -> Optional[Path]:
+        if not tiles_dir:
+            return None
+
+        col, row = tile_index
+
+        return tiles_dir.joinpath(f"{col}_{row}.png")
+
+    def _create_dataset(
+        self, output_path: str, width: int, height: int, origin: Tuple[float, float]
+    ) -> gdal.Dataset:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+        dataset = gdal.GetDriverByName("GPKG").Create(
+            output_path,
+            width,
+            height,
+            4,
+            gdal.GDT_Byte,
+            options=[f"BLOCKSIZE={min(self.tile_size, 4096)}"],
+        )
+
+        if not dataset:
+            raise Exception(
+                f'Failed to create the base map "{output_path}": {gdal.GetLastErrorMsg()}'
+            )
+
+        x_origin, y_origin = origin
+        dataset.SetGeoTransform((x_origin, self.mupp, 0, y_origin, 0, -self.mupp))
+        dataset.SetProjection(self.project.crs().toWkt())
+
+        return dataset
+
+    def _build_overviews(self, output_path: str) -> None:
+        dataset = gdal.Open(output_path, gdal.GA_Update)
+
+        if not dataset:
+            raise Exception(
+                f'Failed to open the base map "{output_path}": {gdal.GetLastErrorMsg()}'
+            )
+
+        overview_levels = []
+        level = 2
+        while max(dataset.RasterXSize, dataset.RasterYSize) / level >= self.tile_size:
+            overview_levels.append(level)
+            level *= 2
+
+        # only the current thread, other tasks might use GDAL meanwhile
+        num_threads = gdal.GetThreadLocalConfigOption("GDAL_NUM_THREADS", None)
+        gdal.SetThreadLocalConfigOption("GDAL_NUM_THREADS", str(self.max_parallel))
+
+        try:
+            if overview_levels:
+                dataset.BuildOverviews("AVERAGE", overview_levels)
+        finally:
+            gdal.SetThreadLocalConfigOption("GDAL_NUM_THREADS", num_threads)
+            # closes the dataset
+            del dataset
+
+    def _write_tile(
+        self, dataset: gdal.Dataset, image: QImage, x_offset: int, y_offset: int
+    ) -> None:
+        image = image.convertToFormat(QImage.Format_RGBA8888)
+        bits = image.constBits()
+        bits.setsize(image.bytesPerLine() * image.height())
+
+        dataset.WriteRaster(
+            x_offset,
+            y_offset,
+            image.width(),
+            image.height(),
+            bytes(bits),
+            buf_type=gdal.GDT_Byte,
+            band_list=[1, 2, 3, 4],
+            buf_pixel_space=4,
+            buf_line_space=image.bytesPerLine(),
+            buf_band_space=1,
+        )
+
+    def _evict(self) -> None:
+        style_dirs = sorted(
+            (style_dir for style_dir in self.cache_dir.iterdir() if style_dir.is_dir()),
+            key=lambda style_dir: style_dir.stat().st_mtime,
+            reverse=True,
+        )
+
+        max_cached_styles = BaseMapRenderer.MAX_CACHED_STYLES
+        for style_dir in style_dirs[max_cached_styles:]:
+            shutil.rmtree(style_dir, ignore_errors=True)
+
+    def _trim(self, style_dir: Path) -> None:
+        """Removes the oldest tiles of the style, until their total size is within `MAX_CACHED_TILES_SIZE`."""
+        tile_stats: List[Tuple[float, int, Path]] = []
+
+        for dirpath, _dirnames, filenames in os.walk(style_dir):
+            for filename in filenames:
+                tile_path = Path(dirpath, filename)
+
+                try:
+                    stat = tile_path.stat()
+                except OSError:
+                    continue
+
+                tile_stats.append((stat.st_mtime, stat.st_size, tile_path))
+
+        total_size = sum(size for _mtime, size, _tile_path in tile_stats)
+
+        for _mtime, size, tile_path in sorted(tile_stats):
+            if total_size <= BaseMapRenderer.MAX_CACHED_TILES_SIZE:
+                break
+
+            try:
+                tile_path.unlink()
+            except OSError:
+                # e.g. already removed by another QGIS instance
+                continue
+
+            total_size -= size
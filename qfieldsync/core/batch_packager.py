@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+from qgis.core import QgsApplication, QgsOfflineEditing, QgsProject
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+from qfieldsync.core.package_cache import PackageCache
+from qfieldsync.core.package_task import PackageTask, ProjectPackager
+from qfieldsync.core.preferences import Preferences
+
+
+class PackageTarget(TypedDict):
+    export_folder: str
+    area_of_interest: str
+    area_of_interest_crs: str
+
+
+class BatchPackager(QObject):
+    """Packages a project for multiple devices at once, each with its own export folder and area of interest.
+
+    The targets with the same area of interest are packaged only once and the package is copied to the others. As the
+    conversion works on the open project, the areas are packaged one at a time. The outcome of each target is
+    collected in `report`, in the order of the targets.
+    """
+
+    # target index
+    target_started = pyqtSignal(int)
+    # target index, the details are in `report`
+    target_finished = pyqtSignal(int)
+    finished = pyqtSignal()
+
+    def __init__(
+        self,
+        project: QgsProject,
+        targets: List[PackageTarget],
+        attachment_dirs: List[str],
+        dirs_to_copy: Optional[Dict[str, bool]] = None,
+        parent: QObject = None,
+    ) -> None:
+        super(BatchPackager, self).__init__(parent=parent)
+
+        self.project = project
+        self.targets = targets
+        self.attachment_dirs = attachment_dirs
+        self.dirs_to_copy = dirs_to_copy
+        self.report: List[Dict[str, Any]] = [
+            {
+                "export_folder": target["export_folder"],
+                "status": "pending",
+                "error": None,
+                "is_cached": False,
+                "duration": None,
+            }
+            for target in targets
+        ]
+        self.offline_editing = QgsOfflineEditing()
+        self._pending_packagers: List[Tuple[ProjectPackager, List[int]]] = []
+        self._running_task: Optional[PackageTask] = None
+        self._running_target_idxs: List[int] = []
+        self._started_at = 0.0
+
+    @property
+    def is_finished(self) -> bool:
+        return all(entry["status"] != "pending" for entry in self.report)
+
+    def start(self) -> None:
+        """Starts packaging. The project must be saved, as the cached packages are keyed by its file."""
+        base_map_format = Preferences().value("baseMapFormat")
+        target_idxs_by_area: Dict[Tuple[str, str], List[int]] = {}
+
+        for target_idx, target in enumerate(self.targets):
+            target_idxs_by_area.setdefault(
+                (target["area_of_interest"], target["area_of_interest_crs"]), []
+            ).append(target_idx)
+
+        for area, target_idxs in target_idxs_by_area.items():
+            area_of_interest, area_of_interest_crs = area
+            project_packager = ProjectPackager(
+                self.project,
+                area_of_interest,
+                area_of_interest_crs,
+                self.attachment_dirs,
+                self.offline_editing,
+                dirs_to_copy=self.dirs_to_copy,
+                base_map_format=base_map_format,
+            )
+            self._pending_packagers.append((project_packager, target_idxs))
+
+        self._start_next()
+
+    def abort(self) -> None:
+        for _project_packager, target_idxs in self._pending_packagers:
+            self._finish_targets(target_idxs, "aborted", None, False)
+
+        self._pending_packagers = []
+
+        if self._running_task:
+            self._running_task.cancel()
+        else:
+            self._start_next()
+
+    def _start_next(self) -> None:
+        while self._pending_packagers and not self._running_task:
+            project_packager, target_idxs = self._pending_packagers.pop(0)
+            export_folders = self._get_export_folders(target_idxs)
+
+            self._started_at = time.perf_counter()
+            self._running_target_idxs = target_idxs
+
+            for target_idx in target_idxs:
+                self.target_started.emit(target_idx)
+
+            # the conversion blocks the main thread, only rendering the base map and writing the package run in the task
+            try:
+                task = project_packager.package(
+                    export_folders[0],
+                    cache_key=PackageCache.get_key(
+                        self.project,
+                        project_packager.area_of_interest,
+                        project_packager.area_of_interest_crs,
+                        self.attachment_dirs,
+                        self.dirs_to_copy,
+                    ),
+                    mirror_folders=export_folders[1:],
+                )
+            except Exception as err:
+                self._finish_targets(target_idxs, "failed", str(err), False)
+                continue
+
+            task.taskCompleted.connect(lambda: self._on_task_finished(True))
+            task.taskTerminated.connect(lambda: self._on_task_finished(False))
+            self._running_task = task
+
+            QgsApplication.taskManager().addTask(task)
+
+        if not self._running_task and self.is_finished:
+            self.finished.emit()
+
+    def _get_export_folders(self, target_idxs: List[int]) -> List[str]:
+        """Returns the distinct export folders of the targets, a package must not be copied onto itself."""
+        export_folders: Dict[str, str] = {}
+
+        for target_idx in target_idxs:
+            export_folder = self.targets[target_idx]["export_folder"]
+            export_folders.setdefault(os.path.normpath(export_folder), export_folder)
+
+        return list(export_folders.values())
+
+    def _on_task_finished(self, is_success: bool) -> None:
+        task = self._running_task
+        self._running_task = None
+
+        assert task
+
+        if is_success:
+            self._finish_targets(
+                self._running_target_idxs, "packaged", None, task.is_cached
+            )
+        elif task.error:
+            self._finish_targets(
+                self._running_target_idxs, "failed", str(task.error), task.is_cached
+            )
+        else:
+            self._finish_targets(
+                self._running_target_idxs, "aborted", None, task.is_cached
+            )
+
+        self._start_next()
+
+    def _finish_targets(
+        self,
+        target_idxs: List[int],
+        status: str,
+        error: Optional[str],
+        is_cached: bool,
+    ) -> None:
+        duration = time.perf_counter() - self._started_at
+
+        for target_idx in target_idxs:
+            entry = self.report[target_idx]
+            entry["status"] = status
+            entry["error"] = error
+            entry["is_cached"] = is_cached
+            # the aborted targets never started
+            entry["duration"] = (
+                duration if target_idx in self._running_target_idxs else None
+            )
+
+            self.target_finished.emit(target_idx)
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from qgis.core import QgsApplication
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+from qfieldsync.core.cloud_api import CloudNetworkAccessManager
+from qfieldsync.core.cloud_project import CloudProject
+from qfieldsync.core.cloud_transferrer import CloudTransferrer, TransferBudget
+from qfieldsync.core.sync_planner import (
+    ConflictPolicy,
+    SyncPlanner,
+    plan_file_transfers,
+    read_synced_hashes,
+    update_synced_hashes,
+)
+
+
+class BatchSyncer(QObject):
+    """Synchronizes multiple cloud projects at once.
+
+    The file lists of all the projects are fetched in parallel. The sync plans are computed one project at a time, as
+    each `SyncPlanner` already hashes the files with a pool of threads. The file transfers of all the projects share a
+    single `TransferBudget`. The outcome of each project is collected in `report`.
+
+    The projects without a local copy are stored in `projects_dir`, which becomes their local directory in the
+    preferences only once they are synchronized.
+    """
+
+    # project id
+    project_started = pyqtSignal(str)
+    # project id, "upload" or "download", fraction
+    project_progress = pyqtSignal(str, str, float)
+    # project id, the details are in `report`
+    project_finished = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(
+        self,
+        network_manager: CloudNetworkAccessManager,
+        cloud_projects: List[CloudProject],
+        policy: ConflictPolicy = ConflictPolicy.Newer,
+        projects_dir: Optional[Path] = None,
+        max_parallel_requests: int = 8,
+        max_parallel_bytes: Optional[int] = None,
+        parent: QObject = None,
+    ) -> None:
+        super(BatchSyncer, self).__init__(parent=parent)
+
+        self.network_manager = network_manager
+        self.cloud_projects = cloud_projects
+        self.policy = policy
+        # where to store the projects without a local copy, they are skipped if not set
+        self.projects_dir = projects_dir
+        self.budget = TransferBudget(max_parallel_requests, max_parallel_bytes)
+        self.report: Dict[str, Dict[str, Any]] = {
+            cloud_project.id: {
+                "project": cloud_project.name_with_owner,
+                "status": "pending",
+                "to_upload": 0,
+                "to_download": 0,
+                "to_delete": 0,
+                "conflicts": 0,
+                "errors": [],
+                "duration": None,
+            }
+            for cloud_project in cloud_projects
+        }
+        self._sync_planners: Dict[str, SyncPlanner] = {}
+        # the projects with fetched file lists, waiting for the running `SyncPlanner` to finish
+        self._projects_to_plan: List[CloudProject] = []
+        self._transferrers: Dict[str, CloudTransferrer] = {}
+        self._conflict_errors: Dict[str, List[str]] = {}
+        # the local directories created in `projects_dir`, not stored in the preferences yet
+        self._new_local_dirs: Dict[str, str] = {}
+        self._started_at: Dict[str, float] = {}
+
+    @property
+    def is_finished(self) -> bool:
+        return all(entry["status"] != "pending" for entry in self.report.values())
+
+    def start(self) -> None:
+        for cloud_project in self.cloud_projects:
+            self._started_at[cloud_project.id] = time.perf_counter()
+            self.project_started.emit(cloud_project.id)
+
+            if not cloud_project.local_dir:
+                if not self.projects_dir:
+                    self._finish_project(
+                        cloud_project,
+                        "skipped",
+                        [self.tr("The project has no local directory.")],
+                    )
+                    continue
+
+                local_dir = str(
+                    self.projects_dir.joinpath(
+                        f"{cloud_project.owner}__{cloud_project.name}"
+                    )
+                )
+                cloud_project.set_transient_local_dir(local_dir)
+                self._new_local_dirs[cloud_project.id] = local_dir
+
+            reply = self.network_manager.projects_cache.get_project_files(
+                cloud_project.id
+            )
+            reply.finished.connect(
+                lambda cloud_project=cloud_project: self._on_project_files_fetched(
+                    cloud_project
+                )
+            )
+
+        if not self.cloud_projects:
+            self.finished.emit()
+
+    def abort(self) -> None:
+        self._projects_to_plan = []
+
+        for sync_planner in self._sync_planners.values():
+            sync_planner.cancel()
+
+        for transferrer in self._transferrers.values():
+            transferrer.abort_requests()
+
+        for cloud_project in self.cloud_projects:
+            self._finish_project(cloud_project, "aborted", [])
+
+    def _on_project_files_fetched(self, cloud_project: CloudProject) -> None:
+        if self.report[cloud_project.id]["status"] != "pending":
+            return
+
+        if cloud_project.cloud_files is None:
+            self._finish_project(
+                cloud_project,
+                "failed",
+                [self.tr("Failed to update the project files status from the server.")],
+            )
+            return
+
+        self._projects_to_plan.append(cloud_project)
+        self._plan_next_project()
+
+    def _plan_next_project(self) -> None:
+        if self._sync_planners:
+            return
+
+        while self._projects_to_plan:
+            cloud_project = self._projects_to_plan.pop(0)
+
+            if self.report[cloud_project.id]["status"] != "pending":
+                continue
+
+            sync_planner = SyncPlanner(cloud_project)
+            sync_planner.taskCompleted.connect(
+                lambda cloud_project=cloud_project: self._on_project_planned(
+                    cloud_project
+                )
+            )
+            sync_planner.taskTerminated.connect(
+                lambda cloud_project=cloud_project: self._on_project_planning_terminated(
+                    cloud_project
+                )
+            )
+            self._sync_planners[cloud_project.id] = sync_planner
+
+            QgsApplication.taskManager().addTask(sync_planner)
+            return
+
+    def _on_project_planning_terminated(self, cloud_project: CloudProject) -> None:
+        sync_planner = self._sync_planners.pop(cloud_project.id)
+        self._plan_next_project()
+
+        self._finish_project(
+            cloud_project,
+            "failed",
+            [
+                self.tr(
+                    "Failed to compare the local and the QFieldCloud files: {}"
+                ).format(sync_planner.error)
+            ],
+        )
+
+    def _on_project_planned(self, cloud_project: CloudProject) -> None:
+        sync_planner = self._sync_planners.pop(cloud_project.id)
+        self._plan_next_project()
+
+        assert sync_planner.files_to_sync is not None
+
+        # the files that are the same on both sides are the base to detect the conflicts of the next synchronizations
+        synced_hashes = read_synced_hashes(cloud_project)
+        in_sync_hashes = {
+            filename: sha256
+            for filename, sha256 in sync_planner.in_sync_hashes.items()
+            if synced_hashes.get(filename) != sha256
+        }
+        update_synced_hashes(cloud_project, in_sync_hashes)
+        synced_hashes.update(in_sync_hashes)
+
+        files = plan_file_transfers(
+            cloud_project, sync_planner.files_to_sync, self.policy, synced_hashes
+        )
+        entry = self.report[cloud_project.id]
+
+        for key, project_files in files.items():
+            entry[key] = len(project_files)
+
+        self._conflict_errors[cloud_project.id] = [
+            self.tr('"{}": changed both locally and on QFieldCloud').format(
+                project_file.name
+            )
+            for project_file in files["conflicts"]
+        ]
+
+        if (
+            not files["to_upload"]
+            and not files["to_download"]
+            and not files["to_delete"]
+        ):
+            self._finish_project(cloud_project, "up_to_date", [])
+            return
+
+        transferrer = CloudTransferrer(self.network_manager, cloud_project, self.budget)
+        transferrer.error.connect(
+            lambda descr, _err: self._finish_project(cloud_project, "failed", [descr])
+        )
+        transferrer.upload_progress.connect(
+            lambda fraction: self.project_progress.emit(
+                cloud_project.id, "upload", fraction
+            )
+        )
+        transferrer.download_progress.connect(
+            lambda fraction: self.project_progress.emit(
+                cloud_project.id, "download", fraction
+            )
+        )
+        transferrer.finished.connect(
+            lambda: self._on_project_transferred(cloud_project)
+        )
+        self._transferrers[cloud_project.id] = transferrer
+
+        transferrer.sync(files["to_upload"], files["to_download"], files["to_delete"])
+
+    def _on_project_transferred(self, cloud_project: CloudProject) -> None:
+        transferrer = self._transferrers.pop(cloud_project.id)
+        errors = []
+
+        for throttled_transferrer in (
+            transferrer.throttled_uploader,
+            transferrer.throttled_deleter,
+            transferrer.throttled_downloader,
+        ):
+            for transfer in throttled_transferrer.transfers.values():
+                if transfer.error:
+                    errors.append(f'"{transfer.filename}": {transfer.error}')
+
+        self._finish_project(cloud_project, "failed" if errors else "synced", errors)
+
+    def _finish_project(
+        self, cloud_project: CloudProject, status: str, errors: List[str]
+    ) -> None:
+        entry = self.report[cloud_project.id]
+
+        # e.g. the transferrer might report an error and finish afterwards
+        if entry["status"] != "pending":
+            return
+
+        # the conflicting files are left untouched, so the project is not fully synchronized
+        conflict_errors = self._conflict_errors.pop(cloud_project.id, [])
+        if conflict_errors and status in ("synced", "up_to_date"):
+            status = "conflicts"
+
+        # only store the newly created local directory of the projects that were synchronized
+        new_local_dir = self._new_local_dirs.pop(cloud_project.id, None)
+        if new_local_dir:
+            cloud_project.set_transient_local_dir(None)
+
+            if status == "synced":
+                cloud_project.update_data({"local_dir": new_local_dir})
+
+        entry["status"] = status
+        entry["errors"] = errors + conflict_errors
+        entry["duration"] = time.perf_counter() - self._started_at.get(
+            cloud_project.id, time.perf_counter()
+        )
+
+        self.project_finished.emit(cloud_project.id)
+
+        if self.is_finished:
+            self.finished.emit()
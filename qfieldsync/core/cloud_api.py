@@ -23,11 +23,11 @@ import json
 import re
 import tempfile
 import urllib.parse
+import uuid
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Union
 from urllib.parse import urlparse
 
-import requests
 from PyQt5.QtNetwork import QSslPreSharedKeyAuthenticator
 from qgis.core import (
     Qgis,
@@ -36,7 +36,14 @@ from qgis.core import (
     QgsNetworkAccessManager,
     QgsProject,
 )
-from qgis.PyQt.QtCore import QFileSystemWatcher, QObject, QUrl, QUrlQuery, pyqtSignal
+from qgis.PyQt.QtCore import (
+    QFileSystemWatcher,
+    QObject,
+    QTimer,
+    QUrl,
+    QUrlQuery,
+    pyqtSignal,
+)
 from qgis.PyQt.QtNetwork import (
     QHttpMultiPart,
     QHttpPart,
@@ -45,7 +52,9 @@ from qgis.PyQt.QtNetwork import (
 )
 
 from qfieldsync.core.cloud_project import CloudProject
+from qfieldsync.core.message_bus import message_bus
 from qfieldsync.core.preferences import Preferences
+from qfieldsync.utils.file_utils import break_hardlink
 from qfieldsync.utils.qt_utils import strip_html
 
 
@@ -122,15 +131,21 @@ class CloudNetworkAccessManager(QObject):
     logout_failed = pyqtSignal(str)
     avatar_success = pyqtSignal()
 
-    def __init__(self, parent=None) -> None:
-        """Constructor."""
+    def __init__(self, parent=None, is_headless: bool = False) -> None:
+        """Constructor.
+
+        A headless network manager, e.g. of the command line interface, never writes the server URL or the token to
+        the QGIS settings and authentication database, and never queues or replays mutations.
+        """
         super(CloudNetworkAccessManager, self).__init__(parent=parent)
 
         self.preferences = Preferences()
+        self.is_headless = is_headless
         self.url = ""
         self._token = ""
         self.user_details: Dict[str, str] = {}
         self.projects_cache = CloudProjectsCache(self, self)
+        self.mutation_queue = CloudMutationQueue(self, self, is_enabled=not is_headless)
         self.is_login_active = False
 
         url = self.preferences.value("qfieldCloudServerUrl")
@@ -148,7 +163,7 @@ class CloudNetworkAccessManager(QObject):
         error = from_reply(reply)
         if error:
             if error.httpCode == 401 and not self.is_login_active:
-                self.set_token("", True)
+                self.set_token("", not self.is_headless)
                 self.logout_success.emit()
             raise error
 
@@ -230,7 +245,9 @@ class CloudNetworkAccessManager(QObject):
         # Ignore the URL path, as we assume the url is always /api/v1. Assume the URL has a scheme or at least starts with leading //.
         p = urlparse(server_url)
         self.url = f"{p.scheme or 'https'}://{p.netloc}/"
-        self.preferences.set_value("qfieldCloudServerUrl", server_url)
+
+        if not self.is_headless:
+            self.preferences.set_value("qfieldCloudServerUrl", server_url)
 
     @property
     def server_url(self):
@@ -281,30 +298,25 @@ class CloudNetworkAccessManager(QObject):
 
         return reply
 
-    def get_projects(self, should_include_public: bool = False) -> QNetworkReply:
-        """Get QFieldCloud projects"""
-        params = {"include-public": "1"} if should_include_public else {}
-        return self.cloud_get("projects", params)
-
-    def get_projects_not_async(self, should_include_public: bool = False) -> List[Dict]:
-        """Get QFieldCloud projects synchronously"""
-        headers = {"Authorization": "token {}".format(self._token)}
+    def get_projects(
+        self,
+        should_include_public: bool = False,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> QNetworkReply:
+        """Get QFieldCloud projects, optionally a single page of them"""
         params = {"include-public": "1"} if should_include_public else {}
+        params["limit"] = limit
+        params["offset"] = offset
 
-        response = requests.get(
-            self._prepare_uri("projects").toString(),
-            headers=headers,
-            params=params,
-        )
-        response.raise_for_status()
-
-        return response.json()
+        return self.cloud_get("projects", params)
 
     def create_project(
         self, name: str, owner: str, description: str, private: bool
     ) -> QNetworkReply:
         """Create a new QFieldCloud project"""
 
+        # not queued when offline, replaying a request that reached the server would create a duplicate
         return self.cloud_post(
             "projects/",
             {
@@ -320,18 +332,22 @@ class CloudNetworkAccessManager(QObject):
     ) -> QNetworkReply:
         """Update an existing QFieldCloud project"""
 
-        return self.cloud_patch(
+        return self.mutation_queue.send(
+            "PATCH",
             ["projects", project_id],
             {
                 "name": name,
                 "description": description,
             },
+            f"projects/{project_id}",
         )
 
     def delete_project(self, project_id: str) -> QNetworkReply:
         """Delete an existing QFieldCloud project"""
 
-        return self.cloud_delete(["projects", project_id])
+        return self.mutation_queue.send(
+            "DELETE", ["projects", project_id], resource=f"projects/{project_id}"
+        )
 
     def get_user_organizations(self, username: str) -> QNetworkReply:
         """Gets the available projects for the owner dropdown menu"""
@@ -349,7 +365,9 @@ class CloudNetworkAccessManager(QObject):
         return self.cloud_get(url, local_filename=local_filename)
 
     def delete_file(self, filename: str) -> QNetworkReply:
-        return self.cloud_delete("files/" + filename)
+        return self.mutation_queue.send(
+            "DELETE", "files/" + filename, resource="projects/" + filename.strip("/")
+        )
 
     def set_token(self, token: str, update_auth: bool = False) -> None:
         """Sets QFieldCloud authentication token to be used by all the following requests. Set to empty string to disable token authentication."""
@@ -446,6 +464,8 @@ class CloudNetworkAccessManager(QObject):
             # redirects should not be saved as files, just ignore them
             return
 
+        break_hardlink(local_filename)
+
         with open(local_filename, "wb") as file:
             assert (
                 file.write(reply.readAll()) != -1
@@ -726,12 +746,19 @@ class CloudReply:
 
 class CloudProjectsCache(QObject):
 
+    # number of projects requested at once
+    PROJECTS_PAGE_SIZE = 250
+
     projects_started = pyqtSignal()
     projects_updated = pyqtSignal()
+    # emitted with the newly received projects of each page, before `projects_updated` follows the last page
+    projects_page_received = pyqtSignal(list)
     projects_error = pyqtSignal(str)
     project_files_started = pyqtSignal(str)
     project_files_updated = pyqtSignal(str)
     project_files_error = pyqtSignal(str, str)
+    # emitted with the project id when the directory watcher notices local files being added or removed
+    project_local_files_changed = pyqtSignal(str)
 
     def __init__(self, network_manager: CloudNetworkAccessManager, parent=None) -> None:
         super(CloudProjectsCache, self).__init__(parent)
@@ -740,10 +767,19 @@ class CloudProjectsCache(QObject):
         self.network_manager = network_manager
         self._error_reason = ""
         self._projects: Optional[List[CloudProject]] = None
+        self._projects_by_id: Dict[str, CloudProject] = {}
+        self._project_names: Set[str] = set()
+        # the projects received so far while requesting the pages, swapped in once the last page arrives
+        self._pending_projects: List[CloudProject] = []
+        self._pending_projects_by_id: Dict[str, CloudProject] = {}
+        # lazily built from the preferences, see `_local_dir_project_ids`
+        self._project_ids_by_local_dir: Optional[Dict[str, List[str]]] = None
         self._projects_reply: Optional[QNetworkReply] = None
         self._fs_watcher = QFileSystemWatcher()
         self._fs_watcher.directoryChanged.connect(self._on_directory_changed)
 
+        message_bus.messaged.connect(self._on_message_bus_messaged)
+
         self.network_manager.token_changed.connect(self._on_token_changed)
         self.projects_updated.connect(self._on_projects_updated)
 
@@ -754,10 +790,23 @@ class CloudProjectsCache(QObject):
     def projects(self) -> Optional[List[CloudProject]]:
         return self._projects
 
+    @property
+    def received_projects(self) -> Optional[List[CloudProject]]:
+        """The projects received so far while refreshing, or the cached projects until the first page arrives."""
+        if self._pending_projects:
+            return self._pending_projects
+
+        return self._projects
+
     @property
     def error_reason(self) -> str:
         return self._error_reason
 
+    @property
+    def is_refreshing(self) -> bool:
+        """Whether a projects list request is currently in progress, including the requests for the next pages."""
+        return self._projects_reply is not None
+
     @property
     def is_currently_open_project_cloud_local(self) -> bool:
         """Checks whether the currently opened QGIS project is a configured cloud project.
@@ -769,16 +818,12 @@ class CloudProjectsCache(QObject):
             bool: opened QGIS project is configured cloud project
         """
         project_dir = QgsProject.instance().homePath()
-        project_ids = [p.id for p in self.projects] if self.projects else []
 
-        for project_id, local_dir in self.preferences.value(
-            "qfieldCloudProjectLocalDirs"
-        ).items():
-            if project_ids and project_id not in project_ids:
+        for project_id in self._local_dir_project_ids(project_dir):
+            if self._projects_by_id and project_id not in self._projects_by_id:
                 continue
 
-            if local_dir and Path(local_dir) == Path(project_dir):
-                return True
+            return True
 
         return False
 
@@ -796,12 +841,7 @@ class CloudProjectsCache(QObject):
         if not self.projects:
             return
 
-        for project_id, local_dir in self.preferences.value(
-            "qfieldCloudProjectLocalDirs"
-        ).items():
-            if not local_dir or Path(local_dir) != Path(project_dir):
-                continue
-
+        for project_id in self._local_dir_project_ids(project_dir):
             cloud_project = self.find_project(project_id)
 
             if cloud_project is not None:
@@ -811,47 +851,49 @@ class CloudProjectsCache(QObject):
         if not self.projects:
             return None
 
-        names = [p.name for p in self.projects]
-        if name not in names:
+        if name not in self._project_names:
             return name
 
         i = 1
         while True:
             new_name = f"{name}_{i}"
 
-            if new_name not in names:
+            if new_name not in self._project_names:
                 return new_name
 
             i += 1
 
     def refresh(self) -> QNetworkReply:
+        """Requests the projects list page by page.
+
+        Each received page is emitted with `projects_page_received` and is available in `received_projects`.
+        The already cached projects are kept until the last page arrives, then they are replaced at once and
+        `projects_updated` is emitted. Meanwhile `is_refreshing` remains `True`.
+
+        Returns:
+            QNetworkReply: the reply of the first page
+        """
         # TODO this abort appears sometimes in the UI, think how to hide it?
         if self._projects_reply:
             self._projects_reply.abort()
 
+        self._pending_projects = []
+        self._pending_projects_by_id = {}
         self.projects_started.emit()
-        self._projects_reply = self.network_manager.get_projects()
-        self._projects_reply.finished.connect(
-            lambda: self._on_get_projects_reply_finished(self._projects_reply)
-        )
 
-        return self._projects_reply
+        return self._get_projects_page(0)
 
-    def refresh_not_async(self) -> None:
-        """Projects are requested in synchronous manner.
-        The function name is cumbersome to discourage it's potential user.
-        Better use `refresh()`
-        """
-        self.projects_started.emit()
-
-        payload = self.network_manager.get_projects_not_async()
-
-        self._projects = []
+    def _get_projects_page(self, offset: int) -> QNetworkReply:
+        reply = self.network_manager.get_projects(
+            limit=self.PROJECTS_PAGE_SIZE, offset=offset
+        )
+        reply.finished.connect(
+            lambda: self._on_get_projects_reply_finished(reply, offset)
+        )
 
-        for project_data in payload:
-            self._projects.append(CloudProject(project_data))
+        self._projects_reply = reply
 
-        self.projects_updated.emit()
+        return reply
 
     def get_project_files(self, project_id: str) -> QNetworkReply:
         assert project_id
@@ -866,12 +908,33 @@ class CloudProjectsCache(QObject):
         return reply
 
     def find_project(self, project_id: str) -> Optional[CloudProject]:
-        if not self._projects or not project_id:
+        if not project_id:
             return
 
-        for project in self._projects:
-            if project.id == project_id:
-                return project
+        # the projects of the already received pages are shown while refreshing, so they must be found too
+        return self._projects_by_id.get(project_id) or self._pending_projects_by_id.get(
+            project_id
+        )
+
+    def _local_dir_project_ids(self, local_dir: str) -> List[str]:
+        """Returns the ids of the projects stored in `local_dir`, in the order of the preferences."""
+        if not local_dir:
+            return []
+
+        if self._project_ids_by_local_dir is None:
+            self._project_ids_by_local_dir = {}
+
+            for project_id, project_local_dir in self.preferences.value(
+                "qfieldCloudProjectLocalDirs"
+            ).items():
+                if not project_local_dir:
+                    continue
+
+                self._project_ids_by_local_dir.setdefault(
+                    str(Path(project_local_dir)), []
+                ).append(project_id)
+
+        return self._project_ids_by_local_dir.get(str(Path(local_dir)), [])
 
     def refresh_filesystem_watchers(self, _dirpath: str = "") -> None:
         # TODO in theory we can update only the _dirpath. There are gothas with links etc, better keep it KISS for now
@@ -897,24 +960,62 @@ class CloudProjectsCache(QObject):
 
                 self._fs_watcher.addPath(project.local_dir)
 
-    def _on_get_projects_reply_finished(self, reply: QNetworkReply) -> None:
+    def _on_get_projects_reply_finished(
+        self, reply: QNetworkReply, offset: int
+    ) -> None:
         if reply.error() == QNetworkReply.OperationCanceledError:
             return
 
         self._projects_reply = None
 
         try:
-            payload = self.network_manager.json_array(reply)
+            payload = self.network_manager.handle_response(reply)
         except Exception as err:
+            # keep the previous projects rather than a partial list
+            self._pending_projects = []
+            self._pending_projects_by_id = {}
+            self._error_reason = str(err)
             self.projects_error.emit(str(err))
             return
 
-        self._projects = []
+        self._error_reason = ""
+
+        # servers supporting pagination wrap the page in `{"count": ..., "next": ..., "results": [...]}`,
+        # older servers ignore the `limit` and `offset` params and return all the projects at once
+        if isinstance(payload, dict):
+            projects_data = payload.get("results") or []
+            has_next_page = bool(payload.get("next"))
+        else:
+            assert isinstance(payload, list)
+            projects_data = payload
+            has_next_page = len(projects_data) == self.PROJECTS_PAGE_SIZE
+
+        page_projects = []
+        for project_data in projects_data:
+            if project_data["id"] in self._pending_projects_by_id:
+                continue
 
-        for project_data in payload:
             cloud_project = CloudProject(project_data)
 
-            self._projects.append(cloud_project)
+            self._pending_projects.append(cloud_project)
+            self._pending_projects_by_id[cloud_project.id] = cloud_project
+            page_projects.append(cloud_project)
+
+        # a page without new projects means the server does not paginate at all
+        if has_next_page and page_projects:
+            self._get_projects_page(offset + len(projects_data))
+            self.projects_page_received.emit(page_projects)
+            return
+
+        # the cached projects are replaced only once all the pages are received, so lookups never miss a project
+        self._projects = self._pending_projects
+        self._projects_by_id = self._pending_projects_by_id
+        self._project_names = {project.name for project in self._projects}
+        self._pending_projects = []
+        self._pending_projects_by_id = {}
+
+        if page_projects:
+            self.projects_page_received.emit(page_projects)
 
         self.projects_updated.emit()
 
@@ -940,12 +1041,18 @@ class CloudProjectsCache(QObject):
 
     def _on_token_changed(self) -> None:
         self._projects = None
+        self._projects_by_id = {}
+        self._project_names = set()
         self.projects_updated.emit()
 
         if self.network_manager.has_token():
             self.refresh()
 
     def _on_projects_updated(self) -> None:
+        # wait for the last page, then refresh the watchers for all the projects at once
+        if self.is_refreshing:
+            return
+
         self.refresh_filesystem_watchers()
 
     def _on_directory_changed(self, dirpath: str) -> None:
@@ -954,6 +1061,323 @@ class CloudProjectsCache(QObject):
 
         self.refresh_filesystem_watchers(dirpath)
 
-        for project in self._projects:
-            if dirpath == project.local_dir:
+        for project_id in self._local_dir_project_ids(dirpath):
+            project = self.find_project(project_id)
+
+            if project and dirpath == project.local_dir:
                 project.refresh_files()
+                self.project_local_files_changed.emit(project_id)
+
+    def _on_message_bus_messaged(self, msg: str) -> None:
+        if msg == "cloud_project_local_dir_changed":
+            self._project_ids_by_local_dir = None
+
+
+class CloudMutationQueue(QObject):
+    """Persistent queue of the mutating API calls that failed because QFieldCloud was unreachable.
+
+    Only the idempotent calls are queued, i.e. updates and deletes. The queued calls are replayed once the server is
+    reachable again. The calls on the same project are replayed in the order they were made, the calls on different
+    projects in parallel. A call that fails to reach the server is coalesced with the queued ones, e.g. only the last
+    update of a project is kept, and deleting a project drops all the queued calls on it. A call that succeeds drops
+    the queued calls it overrides, so they do not undo it once replayed.
+    """
+
+    # errors proving the request was never sent. A timeout or a dropped connection might happen after the server
+    # received the request, so such calls are not queued, but fail like any other error
+    OFFLINE_ERRORS = (
+        QNetworkReply.ConnectionRefusedError,
+        QNetworkReply.HostNotFoundError,
+        QNetworkReply.NetworkSessionFailedError,
+        QNetworkReply.ProxyConnectionRefusedError,
+        QNetworkReply.ProxyNotFoundError,
+    )
+    # how often to retry while there are queued calls, in milliseconds
+    REPLAY_INTERVAL = 60 * 1000
+    # replaying the other methods might have side effects, e.g. creating a project twice
+    QUEUED_METHODS = ("PATCH", "DELETE")
+
+    # uri of the queued call
+    mutation_queued = pyqtSignal(str)
+    # uri of the replayed call
+    mutation_replayed = pyqtSignal(str)
+    # uri of the replayed call, error
+    mutation_failed = pyqtSignal(str, str)
+
+    def __init__(
+        self,
+        network_manager: CloudNetworkAccessManager,
+        parent=None,
+        is_enabled: bool = True,
+    ) -> None:
+        super(CloudMutationQueue, self).__init__(parent)
+
+        self.preferences = Preferences()
+        self.network_manager = network_manager
+        # a disabled queue only sends the calls, it neither queues them nor replays the already queued ones
+        self.is_enabled = is_enabled
+        self._operations: List[Dict[str, Any]] = (
+            json.loads(self.preferences.value("qfieldCloudPendingMutations") or "[]")
+            if is_enabled
+            else []
+        )
+        self._replies: Dict[str, QNetworkReply] = {}
+        # loading the authentication config is slow, it is cached until the token changes
+        self._username: Optional[str] = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.replay)
+
+        self.network_manager.token_changed.connect(self._on_token_changed)
+
+        if self._operations:
+            self._timer.start(CloudMutationQueue.REPLAY_INTERVAL)
+
+    @property
+    def operations(self) -> List[Dict[str, Any]]:
+        return self._operations
+
+    def send(
+        self,
+        method: str,
+        uri: Union[str, List[str]],
+        payload: Optional[Dict] = None,
+        resource: str = "",
+    ) -> QNetworkReply:
+        """Sends the request right away, but queues it if the server is unreachable.
+
+        The `resource` is the path of the mutated object, e.g. "projects/<id>" or "projects/<id>/<filename>".
+        """
+        assert method in CloudMutationQueue.QUEUED_METHODS
+
+        if not self.is_enabled:
+            return self._request({"method": method, "uri": uri, "payload": payload})
+
+        operation = {
+            "id": uuid.uuid4().hex,
+            "method": method,
+            "uri": uri,
+            "payload": payload,
+            "resource": resource,
+            "url": self.network_manager.url,
+            "username": self.username,
+            "depends_on": [],
+        }
+
+        reply = self._request(operation)
+        reply.finished.connect(lambda: self._on_send_finished(reply, operation))
+
+        return reply
+
+    @property
+    def username(self) -> str:
+        if self._username is None:
+            self._username = self.network_manager.auth().config("username")
+
+        return self._username
+
+    def prepare_upload(self, resource: str, callback: Callable[[], None]) -> bool:
+        """Makes sure the queued calls on a file do not affect its upload, e.g. deleting the new copy once replayed.
+
+        The queued deletes of the file are dropped. Returns `False` if a call on the file is being replayed right now,
+        then the `callback` is called once it is finished and the upload should be prepared again.
+        """
+        for operation in self._operations:
+            if operation["resource"] == resource and operation["id"] in self._replies:
+                self._replies[operation["id"]].finished.connect(callback)
+                return False
+
+        superseded_operations = [
+            operation
+            for operation in self._operations
+            if operation["method"] == "DELETE" and operation["resource"] == resource
+        ]
+
+        if superseded_operations:
+            self._remove_operations(superseded_operations)
+
+        return True
+
+    def replay(self) -> None:
+        if (
+            not self.is_enabled
+            or not self._operations
+            or not self.network_manager.has_token()
+        ):
+            return
+
+        queued_ids = {operation["id"] for operation in self._operations}
+        username = self.username
+
+        for operation in self._operations:
+            if operation["id"] in self._replies:
+                continue
+
+            # never replay the calls of another user or server
+            if (
+                operation["url"] != self.network_manager.url
+                or operation["username"] != username
+            ):
+                continue
+
+            if any(
+                operation_id in queued_ids for operation_id in operation["depends_on"]
+            ):
+                continue
+
+            reply = self._request(operation)
+            reply.finished.connect(
+                lambda reply=reply, operation=operation: self._on_replay_finished(
+                    reply, operation
+                )
+            )
+            self._replies[operation["id"]] = reply
+
+    def _request(self, operation: Dict[str, Any]) -> QNetworkReply:
+        if operation["method"] == "PATCH":
+            return self.network_manager.cloud_patch(
+                operation["uri"], operation["payload"]
+            )
+        elif operation["method"] == "DELETE":
+            return self.network_manager.cloud_delete(operation["uri"])
+        else:
+            raise NotImplementedError()
+
+    def _coalesce(self, operation: Dict[str, Any], is_sent: bool) -> None:
+        """Drops the queued calls made redundant by the given one.
+
+        If the given call is `is_sent` to the server, the fields it updated are dropped from the queued updates,
+        otherwise it is about to be queued and takes over the fields of the queued updates.
+        """
+        resource = operation["resource"]
+        redundant_operations = []
+        is_changed = False
+
+        for queued_operation in self._operations:
+            # already being replayed
+            if queued_operation["id"] in self._replies:
+                continue
+
+            queued_resource = queued_operation["resource"]
+
+            if operation["method"] == "PATCH":
+                if queued_operation["method"] != "PATCH" or queued_resource != resource:
+                    continue
+
+                if is_sent:
+                    queued_operation["payload"] = {
+                        key: value
+                        for key, value in (queued_operation["payload"] or {}).items()
+                        if key not in (operation["payload"] or {})
+                    }
+                    is_changed = True
+
+                    if not queued_operation["payload"]:
+                        redundant_operations.append(queued_operation)
+                else:
+                    # the new call carries the fields of the queued one too
+                    operation["payload"] = {
+                        **(queued_operation["payload"] or {}),
+                        **(operation["payload"] or {}),
+                    }
+                    redundant_operations.append(queued_operation)
+            elif operation["method"] == "DELETE":
+                if queued_resource == resource or queued_resource.startswith(
+                    resource + "/"
+                ):
+                    redundant_operations.append(queued_operation)
+
+        if redundant_operations:
+            self._remove_operations(redundant_operations)
+        elif is_changed:
+            self._save()
+
+    def _enqueue(self, operation: Dict[str, Any]) -> None:
+        # the calls on the same project must keep their order
+        project_resource = "/".join(operation["resource"].split("/")[:2])
+        operation["depends_on"] = [
+            queued_operation["id"]
+            for queued_operation in self._operations
+            if queued_operation["resource"] == project_resource
+            or queued_operation["resource"].startswith(project_resource + "/")
+        ]
+
+        self._operations.append(operation)
+        self._save()
+        self._timer.start(CloudMutationQueue.REPLAY_INTERVAL)
+
+        self.mutation_queued.emit(str(operation["uri"]))
+
+    def _remove_operations(self, operations: List[Dict[str, Any]]) -> None:
+        removed_ids = {operation["id"] for operation in operations}
+
+        self._operations = [
+            operation
+            for operation in self._operations
+            if operation["id"] not in removed_ids
+        ]
+
+        for operation in self._operations:
+            operation["depends_on"] = [
+                operation_id
+                for operation_id in operation["depends_on"]
+                if operation_id not in removed_ids
+            ]
+
+        self._save()
+
+    def _save(self) -> None:
+        self.preferences.set_value(
+            "qfieldCloudPendingMutations", json.dumps(self._operations)
+        )
+
+        if not self._operations:
+            self._timer.stop()
+
+    def _on_send_finished(
+        self, reply: QNetworkReply, operation: Dict[str, Any]
+    ) -> None:
+        if reply.error() in CloudMutationQueue.OFFLINE_ERRORS:
+            self._coalesce(operation, is_sent=False)
+            self._enqueue(operation)
+        elif reply.error() == QNetworkReply.NoError:
+            self._coalesce(operation, is_sent=True)
+
+    def _on_token_changed(self) -> None:
+        self._username = None
+        self.replay()
+
+    def _on_replay_finished(
+        self, reply: QNetworkReply, operation: Dict[str, Any]
+    ) -> None:
+        del self._replies[operation["id"]]
+
+        # still offline, wait for the next attempt
+        if reply.error() in CloudMutationQueue.OFFLINE_ERRORS:
+            return
+
+        try:
+            self.network_manager.handle_response(reply, False)
+        except CloudException as err:
+            # the calls depending on the failed one are pointless
+            failed_operations = [operation]
+            failed_ids = {operation["id"]}
+
+            for queued_operation in self._operations:
+                if failed_ids.intersection(queued_operation["depends_on"]):
+                    failed_operations.append(queued_operation)
+                    failed_ids.add(queued_operation["id"])
+
+            self._remove_operations(failed_operations)
+
+            for failed_operation in failed_operations:
+                self.mutation_failed.emit(str(failed_operation["uri"]), str(err))
+
+            return
+
+        self._remove_operations([operation])
+        self.mutation_replayed.emit(str(operation["uri"]))
+
+        if self._operations:
+            self.replay()
+        else:
+            self.network_manager.projects_cache.refresh()
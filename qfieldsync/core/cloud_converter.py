@@ -19,26 +19,119 @@
  ***************************************************************************/
 """
 
+import json
+import os
+import re
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from qgis.core import QgsMapLayer, QgsProject, QgsVirtualLayerDefinition
-from qgis.PyQt.QtCore import QCoreApplication, QObject, QUrl, pyqtSignal
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsFeatureRequest,
+    QgsMapLayer,
+    QgsMessageLog,
+    QgsProject,
+    QgsTask,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource,
+    QgsVirtualLayerDefinition,
+)
+from qgis.PyQt.QtCore import (
+    QCoreApplication,
+    QEventLoop,
+    QObject,
+    QTimer,
+    QUrl,
+    pyqtSignal,
+)
 from qgis.utils import iface
 
 from qfieldsync.core.preferences import Preferences
 from qfieldsync.libqfieldsync.layer import LayerSource
-from qfieldsync.libqfieldsync.utils.file_utils import copy_attachments
 from qfieldsync.libqfieldsync.utils.qgis import (
     get_qgis_files_within_dir,
     make_temp_qgis_file,
 )
-from qfieldsync.utils.qgis_utils import open_project
+from qfieldsync.utils.file_utils import sync_attachments
+from qfieldsync.utils.qgis_utils import get_layer_fingerprint, open_project
+
+
+class LayerConversionTask(QgsTask):
+    """Writes the features of a vector layer to a new GeoPackage.
+
+    The features are read through a `QgsVectorLayerFeatureSource` snapshot taken on the main thread, therefore the
+    layer itself is never touched by the worker thread. Changing the layer data source is left to the caller.
+    """
+
+    def __init__(
+        self, layer: QgsVectorLayer, project: QgsProject, gpkg_path: Path
+    ) -> None:
+        super().__init__(f'Converting "{layer.name()}"', QgsTask.CanCancel)
+
+        self.layer_id = layer.id()
+        self.gpkg_path = gpkg_path
+        self.layer_name = gpkg_path.stem
+        self.error: Optional[str] = None
+        self._source = QgsVectorLayerFeatureSource(layer)
+        self._fields = layer.fields()
+        self._wkb_type = layer.wkbType()
+        self._crs = layer.crs()
+        self._transform_context = project.transformContext()
+        self._feature_count = max(layer.featureCount(), 0)
+
+    @property
+    def data_source(self) -> str:
+        return f"{self.gpkg_path}|layername={self.layer_name}"
+
+    def run(self) -> bool:
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "GPKG"
+        options.layerName = self.layer_name
+        options.fileEncoding = "UTF-8"
+
+        writer = QgsVectorFileWriter.create(
+            str(self.gpkg_path),
+            self._fields,
+            self._wkb_type,
+            self._crs,
+            self._transform_context,
+            options,
+        )
+
+        try:
+            if writer.hasError() != QgsVectorFileWriter.NoError:
+                self.error = writer.errorMessage()
+                return False
+
+            for feature_index, feature in enumerate(
+                self._source.getFeatures(QgsFeatureRequest())
+            ):
+                if self.isCanceled():
+                    return False
+
+                if not writer.addFeature(feature):
+                    self.error = writer.errorMessage()
+                    return False
+
+                if self._feature_count and feature_index % 1000 == 0:
+                    self.setProgress(100 * feature_index / self._feature_count)
+        finally:
+            # the GeoPackage is finalized when the writer is destroyed
+            del writer
+
+        return True
 
 
 class CloudConverter(QObject):
+    # records the converted layers, so converting again into the same directory skips the unchanged ones
+    MANIFEST_FILENAME = ".qfieldsync_conversion.json"
+
     progressStopped = pyqtSignal()
     warning = pyqtSignal(str, str)
     total_progress_updated = pyqtSignal(int, int, str)
+    finished = pyqtSignal()
 
     def __init__(
         self,
@@ -48,126 +141,473 @@ class CloudConverter(QObject):
 
         super(CloudConverter, self).__init__(parent=None)
         self.project = project
-        self.__layers = list()
+        # the ids of the layers to convert, the layers might be removed meanwhile
+        self.__layer_ids: List[str] = list()
 
         # elipsis workaround
         self.trUtf8 = self.tr
 
         self.export_dirname = Path(export_dirname)
+        self.error_message: Optional[str] = None
+        self._original_project_path = ""
+        self._backup_project_path = ""
+        # set while converting
+        self._project_path: Optional[Path] = None
+        self._is_canceled = False
+        # the project was closed or another one was opened while converting
+        self._is_project_cleared = False
+        self._layer_index = 0
+        # progress of each started conversion by layer id, finished tasks are deleted by the task manager
+        self._conversion_progress: Dict[str, float] = {}
+        # layer id, data source and error of each finished conversion
+        self._conversion_results: List[Tuple[str, str, Optional[str]]] = []
+        # layer id and GeoPackage path of the conversions not started yet
+        self._pending_conversions: List[Tuple[str, Path]] = []
+        self._running_tasks: List[LayerConversionTask] = []
+        self._layer_sources: Dict[str, LayerSource] = {}
+        self._fingerprints: Dict[str, Optional[List[Any]]] = {}
+        self._gpkg_paths: Set[Path] = set()
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self._new_manifest: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.export_dirname.joinpath(CloudConverter.MANIFEST_FILENAME)
 
-    def convert(self) -> None:  # noqa: C901
+    @staticmethod
+    def has_manifest(export_dirname: str) -> bool:
+        """Whether the directory contains a previous conversion that can be updated."""
+        return Path(export_dirname).joinpath(CloudConverter.MANIFEST_FILENAME).exists()
+
+    @property
+    def is_running(self) -> bool:
+        return self._project_path is not None
+
+    @property
+    def is_canceled(self) -> bool:
+        return self._is_canceled
+
+    def convert(self) -> None:
         """
-        Convert the project to a cloud project.
+        Convert the project to a cloud project, blocking until finished.
         """
+        loop = QEventLoop()
+        self.finished.connect(loop.quit)
+        self.start()
+
+        if self.is_running:
+            loop.exec_()
 
-        original_project_path = self.project.fileName()
-        project_path = self.export_dirname.joinpath(
+        self.finished.disconnect(loop.quit)
+
+        if self.error_message is not None:
+            raise Exception(self.error_message)
+
+    def start(self) -> None:
+        """
+        Start converting the project to a cloud project.
+
+        The layers are processed one per event loop iteration and the format conversions run as background tasks,
+        so QGIS stays responsive. `finished` is emitted at the end, check `error_message` for the outcome.
+        """
+        assert not self.is_running
+
+        self._original_project_path = self.project.fileName()
+        self._project_path = self.export_dirname.joinpath(
             f"{self.project.baseName()}_cloud.qgs"
         )
-        backup_project_path = make_temp_qgis_file(self.project)
-        is_converted = False
+        self._backup_project_path = make_temp_qgis_file(self.project)
+        self._is_canceled = False
+        self._is_project_cleared = False
+        self.error_message = None
 
         try:
             if not self.export_dirname.exists():
                 self.export_dirname.mkdir(parents=True, exist_ok=True)
 
-            if get_qgis_files_within_dir(self.export_dirname):
+            self._manifest = self._read_manifest()
+            self._new_manifest = {}
+
+            if get_qgis_files_within_dir(self.export_dirname) and not self._manifest:
                 raise Exception(
                     self.tr("The destination folder already contains a project file")
                 )
 
             self.total_progress_updated.emit(0, 100, self.trUtf8("Converting project…"))
-            self.__layers = list(self.project.mapLayers().values())
-
-            # Loop through all layers and copy them to the destination folder
-            for current_layer_index, layer in enumerate(self.__layers):
-                self.total_progress_updated.emit(
-                    current_layer_index,
-                    len(self.__layers),
-                    self.trUtf8("Copying layers…"),
-                )
+            self.__layer_ids = list(self.project.mapLayers().keys())
+            self._layer_index = 0
+            self._conversion_progress = {}
+            self._conversion_results = []
+            self._pending_conversions = []
+            self._running_tasks = []
+            self._gpkg_paths = set()
+            self._layer_sources = {}
+            self._fingerprints = {}
+        except Exception as err:
+            self._finish(str(err))
+            return
 
-                layer_source = LayerSource(layer)
-                if not layer_source.is_supported:
-                    self.project.removeMapLayer(layer)
-                    continue
-
-                if layer.dataProvider() is not None:
-                    # layer stored in localized data path, skip
-                    if layer_source.is_localized_path:
-                        continue
-
-                if layer.type() == QgsMapLayer.VectorLayer:
-                    if (
-                        layer.dataProvider()
-                        and layer.dataProvider().name() == "virtual"
-                    ):
-                        url = QUrl.fromEncoded(layer.source().encode("ascii"))
-                        valid = url.isValid()
-                        if valid:
-                            definition = QgsVirtualLayerDefinition.fromUrl(url)
-                            for source in definition.sourceLayers():
-                                if not source.isReferenced():
-                                    valid = False
-                                    break
-                        if not valid:
-                            # virtual layers with non-referenced sources are not supported
-                            self.warning.emit(
-                                self.tr("Cloud Converter"),
-                                self.tr(
-                                    "The virtual layer '{}' is not valid or contains non-referenced source(s) and could not be converted and was therefore removed from the cloud project."
-                                ).format(layer.name()),
-                            )
-                            self.project.removeMapLayer(layer)
-                            continue
-                    else:
-                        if not layer_source.convert_to_gpkg(self.export_dirname):
-                            # something went wrong, remove layer and inform the user that layer will be missing
-                            self.warning.emit(
-                                self.tr("Cloud Converter"),
-                                self.tr(
-                                    "The layer '{}' could not be converted and was therefore removed from the cloud project."
-                                ).format(layer.name()),
-                            )
-                            self.project.removeMapLayer(layer)
-                            continue
-                else:
-                    layer_source.copy(self.export_dirname, list())
+        self.project.cleared.connect(self._on_project_cleared)
+
+        QTimer.singleShot(0, self._convert_next_layer)
+
+    def cancel(self) -> None:
+        """Stops the conversion as soon as possible, the original project is restored."""
+        if not self.is_running:
+            return
+
+        self._is_canceled = True
+
+        for task in self._running_tasks:
+            task.cancel()
+
+    def _on_project_cleared(self) -> None:
+        # the layers and the project being converted are gone, the original project file is left untouched anyway
+        self._is_project_cleared = True
+        self.cancel()
+
+    @property
+    def _cancel_message(self) -> str:
+        if self._is_project_cleared:
+            return self.tr("The conversion was canceled, as the project was closed.")
+
+        return self.tr("The conversion was canceled.")
+
+    def _convert_next_layer(self) -> None:
+        if self._is_canceled:
+            self._finish(self._cancel_message)
+            return
+
+        # Loop through all layers and copy them to the destination folder
+        if self._layer_index < len(self.__layer_ids):
+            self.total_progress_updated.emit(
+                self._layer_index,
+                len(self.__layer_ids),
+                self.trUtf8("Copying layers…"),
+            )
+
+            layer = self.project.mapLayer(self.__layer_ids[self._layer_index])
+
+            try:
+                # the layer might have been removed by the user meanwhile
+                if layer:
+                    self._convert_layer(layer)
+            except Exception as err:
+                self._finish(str(err))
+                return
+
+            self._layer_index += 1
+            QTimer.singleShot(0, self._convert_next_layer)
+            return
+
+        self._start_conversion_tasks()
+
+    def _convert_layer(self, layer: QgsMapLayer) -> None:  # noqa: C901
+        layer_source = LayerSource(layer)
+        if not layer_source.is_supported:
+            self.project.removeMapLayer(layer)
+            return
+
+        if layer.dataProvider() is not None:
+            # layer stored in localized data path, skip
+            if layer_source.is_localized_path:
+                return
+
+        if layer.type() == QgsMapLayer.VectorLayer:
+            fingerprint = get_layer_fingerprint(layer)
+
+            if self._reuse_converted_layer(layer, fingerprint):
                 layer.setCustomProperty(
                     "QFieldSync/cloud_action", layer_source.default_cloud_action
                 )
+                return
 
-            # save the offline project twice so that the offline plugin can "know" that it's a relative path
-            if not self.project.write(str(project_path)):
-                raise Exception(
-                    self.tr('Failed to save project to "{}".').format(project_path)
+            if layer.dataProvider() and layer.dataProvider().name() == "virtual":
+                url = QUrl.fromEncoded(layer.source().encode("ascii"))
+                valid = url.isValid()
+                if valid:
+                    definition = QgsVirtualLayerDefinition.fromUrl(url)
+                    for source in definition.sourceLayers():
+                        if not source.isReferenced():
+                            valid = False
+                            break
+                if not valid:
+                    # virtual layers with non-referenced sources are not supported
+                    self.warning.emit(
+                        self.tr("Cloud Converter"),
+                        self.tr(
+                            "The virtual layer '{}' is not valid or contains non-referenced source(s) and could not be converted and was therefore removed from the cloud project."
+                        ).format(layer.name()),
+                    )
+                    self.project.removeMapLayer(layer)
+                    return
+            elif not self._is_gpkg_layer(layer):
+                # converted in parallel afterwards, GeoPackages are merely copied
+                self._pending_conversions.append(
+                    (layer.id(), self._get_gpkg_path(layer))
+                )
+                self._layer_sources[layer.id()] = layer_source
+                self._fingerprints[layer.id()] = fingerprint
+                return
+            else:
+                if not layer_source.convert_to_gpkg(self.export_dirname):
+                    # something went wrong, remove layer and inform the user that layer will be missing
+                    self.warning.emit(
+                        self.tr("Cloud Converter"),
+                        self.tr(
+                            "The layer '{}' could not be converted and was therefore removed from the cloud project."
+                        ).format(layer.name()),
+                    )
+                    self.project.removeMapLayer(layer)
+                    return
+
+                self._add_to_manifest(layer, fingerprint)
+        else:
+            layer_source.copy(self.export_dirname, list())
+        layer.setCustomProperty(
+            "QFieldSync/cloud_action", layer_source.default_cloud_action
+        )
+
+    def _start_conversion_tasks(self) -> None:
+        """Starts the pending layer conversions, at most `cloudConversionWorkers` at once.
+
+        The tasks are created only when started, so at most that many feature source snapshots are held in memory.
+        """
+        max_workers = max(Preferences().value("cloudConversionWorkers"), 1)
+
+        while (
+            not self._is_canceled
+            and self._pending_conversions
+            and len(self._running_tasks) < max_workers
+        ):
+            layer_id, gpkg_path = self._pending_conversions.pop(0)
+            layer = self.project.mapLayer(layer_id)
+
+            # removed by the user meanwhile
+            if not layer:
+                continue
+
+            task = LayerConversionTask(layer, self.project, gpkg_path)
+            task.progressChanged.connect(
+                lambda progress, layer_id=layer_id: self._on_conversion_task_progress(
+                    layer_id, progress
                 )
+            )
+            task.taskCompleted.connect(
+                lambda task=task: self._on_conversion_task_finished(task)
+            )
+            task.taskTerminated.connect(
+                lambda task=task: self._on_conversion_task_finished(task)
+            )
+            self._conversion_progress[layer_id] = 0
+            self._running_tasks.append(task)
+
+            QgsApplication.taskManager().addTask(task)
+
+        self._on_conversion_task_progress()
+
+        if not self._running_tasks:
+            if self._is_canceled:
+                self._finish(self._cancel_message)
+                return
+
+            try:
+                self._write_project()
+            except Exception as err:
+                self._finish(str(err))
+                return
+
+            self._finish(None)
 
-            # export the DCIM folder
-            for attachment_dir in Preferences().value("attachmentDirs"):
-                copy_attachments(
-                    Path(original_project_path).parent,
-                    project_path.parent,
-                    attachment_dir,
+    def _on_conversion_task_progress(
+        self, layer_id: Optional[str] = None, progress: float = 0
+    ) -> None:
+        if layer_id is not None:
+            self._conversion_progress[layer_id] = progress
+
+        conversion_count = len(self._conversion_progress) + len(
+            self._pending_conversions
+        )
+
+        if not conversion_count:
+            return
+
+        self.total_progress_updated.emit(
+            int(sum(self._conversion_progress.values())),
+            100 * conversion_count,
+            self.trUtf8("Converting layers…"),
+        )
+
+    def _on_conversion_task_finished(self, task: LayerConversionTask) -> None:
+        if task.status() != QgsTask.Complete and task.error is None:
+            task.error = self.tr("Conversion canceled")
+
+        # the task is deleted by the task manager afterwards, so keep only its outcome
+        self._conversion_results.append((task.layer_id, task.data_source, task.error))
+        self._conversion_progress[task.layer_id] = 100
+        self._running_tasks.remove(task)
+        self._start_conversion_tasks()
+
+    def _write_project(self) -> None:
+        assert self._project_path
+
+        for layer_id, data_source, error in self._conversion_results:
+            layer = self.project.mapLayer(layer_id)
+
+            # removed by the user while being converted
+            if not layer:
+                continue
+
+            if error is not None:
+                self.warning.emit(
+                    self.tr("Cloud Converter"),
+                    self.tr(
+                        "The layer '{}' could not be converted and was therefore removed from the cloud project."
+                    ).format(layer.name()),
                 )
+                self.project.removeMapLayer(layer)
+                continue
 
-            title = self.project.title()
-            title_suffix = self.tr("(QFieldCloud)")
-            if not title.endswith(title_suffix):
-                self.project.setTitle("{} {}".format(title, title_suffix))
-            # Now we have a project state which can be saved as cloud project
-            self.project.write(str(project_path))
-            is_converted = True
-        finally:
-            # We need to let the app handle events before loading the next project or QGIS will crash with rasters
-            QCoreApplication.processEvents()
-            self.project.clear()
-            QCoreApplication.processEvents()
-
-            # TODO whatcha gonna do if QgsProject::read()/write() fails
-            if is_converted:
-                iface.addProject(str(project_path))
-            else:
-                open_project(original_project_path, backup_project_path)
+            layer.setDataSource(data_source, layer.name(), "ogr")
+            layer.setCustomProperty(
+                "QFieldSync/cloud_action",
+                self._layer_sources[layer_id].default_cloud_action,
+            )
+            self._add_to_manifest(layer, self._fingerprints[layer_id])
+
+        # save the offline project twice so that the offline plugin can "know" that it's a relative path
+        if not self.project.write(str(self._project_path)):
+            raise Exception(
+                self.tr('Failed to save project to "{}".').format(self._project_path)
+            )
+
+        # export the DCIM folder, only the files changed since the previous conversion are copied
+        preferences = Preferences()
+        for attachment_dir in preferences.value("attachmentDirs"):
+            stats = sync_attachments(
+                Path(self._original_project_path).parent,
+                self._project_path.parent,
+                attachment_dir,
+                preferences.value("attachmentsHardlink"),
+            )
+
+            QgsMessageLog.logMessage(
+                self.tr(
+                    'Attachments "{}": {} copied, {} hardlinked, {} unchanged.'
+                ).format(
+                    attachment_dir, stats["copied"], stats["linked"], stats["skipped"]
+                ),
+                "QFieldSync",
+                Qgis.Info,
+            )
+
+        title = self.project.title()
+        title_suffix = self.tr("(QFieldCloud)")
+        if not title.endswith(title_suffix):
+            self.project.setTitle("{} {}".format(title, title_suffix))
+        # Now we have a project state which can be saved as cloud project
+        self.project.write(str(self._project_path))
+        self._write_manifest()
+
+    def _finish(self, error_message: Optional[str]) -> None:
+        project_path = self._project_path
+        assert project_path
+
+        self.error_message = error_message
+        self._project_path = None
+
+        try:
+            self.project.cleared.disconnect(self._on_project_cleared)
+        except TypeError:
+            # failed before being connected
+            pass
+
+        if self._is_project_cleared:
+            # the user opened another project meanwhile, it must not be replaced
+            self.finished.emit()
+            return
+
+        # We need to let the app handle events before loading the next project or QGIS will crash with rasters
+        QCoreApplication.processEvents()
+        self.project.clear()
+        QCoreApplication.processEvents()
+
+        # TODO whatcha gonna do if QgsProject::read()/write() fails
+        if error_message is None:
+            iface.addProject(str(project_path))
+            self.total_progress_updated.emit(100, 100, self.tr("Finished"))
+        else:
+            open_project(self._original_project_path, self._backup_project_path)
+
+        self.finished.emit()
+
+    def _get_gpkg_path(self, layer: QgsMapLayer) -> Path:
+        """Returns a GeoPackage path for the layer that is not used yet, so each layer is written to its own file."""
+        # overwrite the output of the previous conversion of the same layer
+        if layer.id() in self._manifest:
+            gpkg_path = Path(self._manifest[layer.id()]["output"].split("|")[0])
+
+            if gpkg_path not in self._gpkg_paths:
+                self._gpkg_paths.add(gpkg_path)
+                return gpkg_path
+
+        basename = re.sub(r"[^\w\-]", "_", layer.name()) or "layer"
+        gpkg_path = self.export_dirname.joinpath(f"{basename}.gpkg")
+        suffix = 1
+
+        while gpkg_path in self._gpkg_paths or gpkg_path.exists():
+            suffix += 1
+            gpkg_path = self.export_dirname.joinpath(f"{basename}_{suffix}.gpkg")
+
+        self._gpkg_paths.add(gpkg_path)
+
+        return gpkg_path
+
+    @staticmethod
+    def _is_gpkg_layer(layer: QgsMapLayer) -> bool:
+        return layer.dataProvider().name() == "ogr" and layer.source().split("|")[
+            0
+        ].lower().endswith(".gpkg")
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)["layers"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _write_manifest(self) -> None:
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "layers": self._new_manifest}, f, indent=2)
+
+    def _add_to_manifest(
+        self, layer: QgsMapLayer, fingerprint: Optional[List[Any]]
+    ) -> None:
+        """Records the conversion of a layer, the `layer` must already point to the converted data source."""
+        if fingerprint is None:
+            return
+
+        self._new_manifest[layer.id()] = {
+            "source": fingerprint[0],
+            "provider": fingerprint[1],
+            "fingerprint": fingerprint,
+            "output": layer.source(),
+        }
+
+    def _reuse_converted_layer(
+        self, layer: QgsMapLayer, fingerprint: Optional[List[Any]]
+    ) -> bool:
+        """Points the layer to the output of the previous conversion, if its source did not change since."""
+        entry = self._manifest.get(layer.id())
+
+        if fingerprint is None or not entry or entry["fingerprint"] != fingerprint:
+            return False
+
+        if not os.path.isfile(entry["output"].split("|")[0]):
+            return False
+
+        layer.setDataSource(entry["output"], layer.name(), "ogr")
+        self._new_manifest[layer.id()] = entry
+        self._gpkg_paths.add(Path(entry["output"].split("|")[0]))
 
-        self.total_progress_updated.emit(100, 100, self.tr("Finished"))
+        return True
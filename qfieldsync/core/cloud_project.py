@@ -21,15 +21,19 @@
 
 
 import hashlib
-import sqlite3
+import os
+import threading
+import time
 from enum import IntFlag
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 from qgis.core import QgsProject
 from qgis.PyQt.QtCore import QDir
 
+from qfieldsync.core.message_bus import message_bus
 from qfieldsync.core.preferences import Preferences
+from qfieldsync.core.wal_checkpointer import wal_checkpointer
 from qfieldsync.libqfieldsync.utils.qgis import get_qgis_files_within_dir
 
 
@@ -40,11 +44,46 @@ class ProjectFileCheckout(IntFlag):
     LocalAndCloud = 3
 
 
+# the files are hashed in chunks of this many bytes, so hashing large files does not hold them in memory
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# the checkout filters `CloudProject.get_files` keeps a bucket for
+CHECKOUT_FILTERS = (
+    ProjectFileCheckout.Local,
+    ProjectFileCheckout.Cloud,
+    ProjectFileCheckout.LocalAndCloud,
+)
+
+
 class ProjectFile:
+    __slots__ = (
+        "_local_dir",
+        "_data",
+        "_path",
+        "_local_path",
+        "_local_stat",
+        "_has_local_stat",
+        "_local_sha256",
+        "_local_sha256_stat_key",
+        "_checkout_changed_callback",
+    )
+
     def __init__(self, data: Dict[str, Any], local_dir: str = None) -> None:
         self._local_dir = local_dir
-        self._temp_dir = None
         self._data = data
+        self._path: Optional[Path] = None
+        self._local_path: Optional[Path] = None
+        # snapshot of the local file stat, `None` if the file does not exist locally. Taken lazily on first access,
+        # but usually passed by the directory scanner in `CloudProject.refresh_files` via `update_local_stat`.
+        self._local_stat: Optional[os.stat_result] = None
+        self._has_local_stat = False
+        # the local checksum is reused as long as the modification time and the size of the stat snapshot match
+        self._local_sha256: Optional[str] = None
+        self._local_sha256_stat_key: Optional[Tuple[int, int]] = None
+        # called with the file and its previous checkout, see `set_checkout_changed_callback`
+        self._checkout_changed_callback: Optional[
+            Callable[["ProjectFile", ProjectFileCheckout], None]
+        ] = None
 
     @property
     def name(self) -> str:
@@ -52,7 +91,10 @@ class ProjectFile:
 
     @property
     def path(self) -> Path:
-        return Path(self.name)
+        if self._path is None:
+            self._path = Path(self.name)
+
+        return self._path
 
     @property
     def dirname(self) -> str:
@@ -80,7 +122,7 @@ class ProjectFile:
     def checkout(self) -> ProjectFileCheckout:
         checkout = ProjectFileCheckout.Deleted
 
-        if self.local_path and self.local_path.exists():
+        if self.local_path_exists:
             checkout |= ProjectFileCheckout.Local
 
         # indirect way to check whether it is a cloud project
@@ -99,57 +141,130 @@ class ProjectFile:
 
     @property
     def local_size(self) -> Optional[int]:
-        if not self.local_path_exists:
+        local_stat = self.local_stat
+
+        if local_stat is None:
             return
 
-        return self.local_path.stat().st_size
+        return local_stat.st_size
 
     @property
     def local_path(self) -> Optional[Path]:
         if not self._local_dir:
             return
 
-        return Path(self._local_dir + "/" + self.name)
+        if self._local_path is None:
+            self._local_path = Path(self._local_dir + "/" + self.name)
+
+        return self._local_path
 
     @property
     def local_path_exists(self) -> bool:
-        if self.local_path:
-            return self.local_path.exists()
+        return self.local_stat is not None
+
+    @property
+    def local_stat(self) -> Optional[os.stat_result]:
+        if not self._has_local_stat:
+            self.refresh_local_stat()
 
-        return False
+        return self._local_stat
 
     @property
     def local_sha256(self) -> Optional[str]:
-        if not self.local_path_exists:
+        local_stat = self.local_stat
+
+        if local_stat is None:
             return
 
         assert self.local_path
-        assert self.local_path.is_file()
 
-        with open(self.local_path, "rb") as f:
-            return hashlib.sha256(f.read()).hexdigest()
+        stat_key = (local_stat.st_mtime_ns, local_stat.st_size)
+        if stat_key != self._local_sha256_stat_key:
+            assert self.local_path.is_file()
+
+            sha256 = hashlib.sha256()
+
+            with open(self.local_path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    sha256.update(chunk)
+
+            self._local_sha256 = sha256.hexdigest()
+
+            self._local_sha256_stat_key = stat_key
+
+        return self._local_sha256
+
+    def set_checkout_changed_callback(
+        self, callback: Callable[["ProjectFile", ProjectFileCheckout], None]
+    ) -> None:
+        self._checkout_changed_callback = callback
+
+    def update_local_stat(self, local_stat: Optional[os.stat_result]) -> None:
+        """Sets the snapshot of the local file stat, `None` if the file does not exist locally."""
+        old_checkout = self.checkout if self._has_local_stat else None
+
+        self._local_stat = local_stat
+        self._has_local_stat = True
+
+        if (
+            self._checkout_changed_callback
+            and old_checkout is not None
+            and old_checkout != self.checkout
+        ):
+            self._checkout_changed_callback(self, old_checkout)
+
+    def refresh_local_stat(self) -> None:
+        local_stat = None
+
+        if self.local_path:
+            try:
+                local_stat = self.local_path.stat()
+            except OSError:
+                pass
+
+        self.update_local_stat(local_stat)
 
     def flush(self) -> None:
         if not self._local_dir:
             return
 
         if self.name.endswith(".gpkg"):
-            path = Path(str(self.local_path) + "-wal")
-            if path.exists() and path.stat().st_size > 0:
-                conn = sqlite3.connect(str(self.local_path))
-
-                with conn:
-                    conn.execute("PRAGMA wal_checkpoint")
+            # the checkpoint writes the WAL contents into the main file
+            if wal_checkpointer.checkpoint(str(self.local_path)):
+                self.refresh_local_stat()
 
 
 class CloudProject:
+    # how many projects are remembered in the `qfieldCloudLastProjectFiles` setting
+    LAST_PROJECT_FILES_MAX_COUNT = 100
+
     def __init__(self, project_data: Dict[str, Any]) -> None:
         """Constructor."""
         self._preferences = Preferences()
         self._files = {}
+        # files matching each `get_files` checkout filter by name, in the same order as `_files`
+        self._files_by_checkout: Dict[ProjectFileCheckout, Dict[str, ProjectFile]] = {}
+        # position of each file in `_files`, to restore the order of the re-bucketed files
+        self._file_positions: Dict[str, int] = {}
+        # buckets with re-bucketed files that are not in order anymore
+        self._unordered_checkouts: Set[ProjectFileCheckout] = set()
+        # the checkout changes noticed by worker threads with the previous checkout by file name, the buckets are
+        # only changed on the main thread, see `apply_checkout_changes`
+        self._pending_checkout_changes: Dict[
+            str, Tuple[ProjectFile, ProjectFileCheckout]
+        ] = {}
+        self._pending_checkout_changes_lock = threading.Lock()
+        # computed by `SyncPlanner`, valid as long as the local files match `_files_to_sync_snapshot`
+        self._files_to_sync: Optional[List[ProjectFile]] = None
+        self._files_to_sync_snapshot: Optional[Dict[str, Tuple[int, int]]] = None
         self._data = {}
         self._cloud_files = None
         self._local_dir = None
+        # `local_dir` is memoized as long as the (cached) preferences dictionary is the very same object
+        self._local_dirs_pref: Optional[Dict[str, str]] = None
+        self._resolved_local_dir: Optional[str] = None
+        # used instead of the one in the preferences, see `set_transient_local_dir`
+        self._transient_local_dir: Optional[str] = None
 
         self.update_data(project_data)
 
@@ -174,6 +289,7 @@ class CloudProject:
             }
 
             self._preferences.set_value("qfieldCloudProjectLocalDirs", new_value)
+            message_bus.messaged.emit("cloud_project_local_dir_changed")
 
             if self._local_dir:
                 Path(self._local_dir).mkdir(exist_ok=True, parents=True)
@@ -185,15 +301,7 @@ class CloudProject:
             del self._data["cloud_files"]
 
             if isinstance(self._cloud_files, list):
-                self._preferences.set_value(
-                    "qfieldCloudLastProjectFiles",
-                    {
-                        **self._preferences.value("qfieldCloudLastProjectFiles"),
-                        self.id: [
-                            cloud_file["name"] for cloud_file in self._cloud_files
-                        ],
-                    },
-                )
+                self._store_last_project_files()
                 self._cloud_files = sorted(self._cloud_files, key=lambda f: f["name"])
             else:
                 assert self._cloud_files is None
@@ -201,6 +309,38 @@ class CloudProject:
         if "cloud_files" in new_data or "local_dir" in new_data or not self._files:
             self.refresh_files()
 
+    def _store_last_project_files(self) -> None:
+        """Remembers the cloud file names of the project, keeping only the most recently updated projects."""
+        last_project_files = {
+            project_id: entry
+            for project_id, entry in self._preferences.value(
+                "qfieldCloudLastProjectFiles"
+            ).items()
+            # entries in the old format store just the list of file names and are dropped
+            if project_id != self.id and isinstance(entry, dict)
+        }
+        last_project_files[self.id] = {
+            "updated_at": time.time(),
+            "files": "\n".join(cloud_file["name"] for cloud_file in self._cloud_files),
+        }
+
+        evicted_count = (
+            len(last_project_files) - CloudProject.LAST_PROJECT_FILES_MAX_COUNT
+        )
+        if evicted_count > 0:
+            evicted_project_ids = sorted(
+                last_project_files,
+                key=lambda project_id: last_project_files[project_id]["updated_at"],
+            )[:evicted_count]
+
+            for project_id in evicted_project_ids:
+                del last_project_files[project_id]
+
+        # the files of many projects are updated at once, write them in a single batch
+        self._preferences.set_value_deferred(
+            "qfieldCloudLastProjectFiles", last_project_files
+        )
+
     @staticmethod
     def get_cloud_project_id(path: str) -> Optional[str]:
         project_local_dirs: Dict[str, str] = Preferences().value(
@@ -254,10 +394,38 @@ class CloudProject:
         # TODO remove as soon as all API servers support `status` key
         return self._data.get("status", "busy")
 
+    def set_transient_local_dir(self, local_dir: Optional[str]) -> None:
+        """Uses `local_dir` as the local directory of this instance only, without storing it in the preferences.
+
+        Pass `None` to use the local directory from the preferences again.
+        """
+        if local_dir == self._transient_local_dir:
+            return
+
+        self._transient_local_dir = local_dir
+
+        if local_dir:
+            Path(local_dir).mkdir(exist_ok=True, parents=True)
+
+        self.refresh_files()
+
     @property
     def local_dir(self) -> Optional[str]:
-        dirname = self._preferences.value("qfieldCloudProjectLocalDirs").get(self.id)
+        if self._transient_local_dir:
+            return self._transient_local_dir
+
+        local_dirs_pref = self._preferences.value("qfieldCloudProjectLocalDirs")
+
+        if local_dirs_pref is not self._local_dirs_pref:
+            self._local_dirs_pref = local_dirs_pref
+            self._resolved_local_dir = self._resolve_local_dir(
+                local_dirs_pref.get(self.id)
+            )
+
+        return self._resolved_local_dir
 
+    @staticmethod
+    def _resolve_local_dir(dirname: Optional[str]) -> Optional[str]:
         if not dirname or not Path(dirname).exists() or not Path(dirname).is_absolute():
             return None
 
@@ -265,9 +433,9 @@ class CloudProject:
 
     @property
     def human_local_dir(self) -> Optional[str]:
-        dirname = self._preferences.value("qfieldCloudProjectLocalDirs").get(self.id)
+        dirname = self.local_dir
 
-        if not dirname or not Path(dirname).exists() or not Path(dirname).is_absolute():
+        if not dirname:
             return None
 
         if QDir(dirname).absolutePath().startswith(QDir.homePath()):
@@ -282,21 +450,86 @@ class CloudProject:
 
     @property
     def files_to_sync(self) -> Iterator[ProjectFile]:
+        self.validate_cached_files_to_sync()
+
+        if self._files_to_sync is not None:
+            yield from self._files_to_sync
+            return
+
         for project_file in self.get_files():
-            project_file.flush()
+            if self.is_file_to_sync(project_file):
+                yield project_file
 
-            # don't attempt to sync files that are the same both locally and remote
-            if project_file.sha256 == project_file.local_sha256:
-                continue
+    @property
+    def cached_files_to_sync(self) -> Optional[List[ProjectFile]]:
+        return self._files_to_sync
 
-            # ignore local files that are not in the temp directory
-            if (
-                project_file.checkout & ProjectFileCheckout.Local
-                and not project_file.local_path_exists
-            ):
-                continue
+    @property
+    def cached_files_to_sync_snapshot(self) -> Optional[Dict[str, Tuple[int, int]]]:
+        return self._files_to_sync_snapshot
+
+    def set_cached_files_to_sync(
+        self,
+        files_to_sync: List[ProjectFile],
+        local_files_snapshot: Dict[str, Tuple[int, int]],
+    ) -> None:
+        """Caches the files to sync, computed when the local files matched the snapshot, see `get_local_files_snapshot`."""
+        self._files_to_sync = files_to_sync
+        self._files_to_sync_snapshot = local_files_snapshot
+
+    def get_local_files_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Returns the modification time and size of each local file, including the hidden and the WAL files."""
+        local_dir = self.local_dir
+
+        if not local_dir:
+            return {}
+
+        return {
+            filename: (local_stat.st_mtime_ns, local_stat.st_size)
+            for filename, local_stat in self._scan_local_files(
+                local_dir, skip_hidden=False
+            ).items()
+        }
 
-            yield project_file
+    def validate_cached_files_to_sync(self) -> None:
+        """Drops the cached files to sync if any local file changed since they were computed.
+
+        The directory watcher notices only the files added or removed in the watched directories, but not the files
+        modified in place, so the local files are compared with the snapshot taken when the cache was computed.
+        """
+        if self._files_to_sync is None:
+            return
+
+        snapshot = self.get_local_files_snapshot()
+
+        if snapshot == self._files_to_sync_snapshot:
+            return
+
+        if snapshot.keys() != (self._files_to_sync_snapshot or {}).keys():
+            # files were added or removed, e.g. within a subdirectory
+            self.refresh_files()
+        else:
+            self._files_to_sync = None
+            self._files_to_sync_snapshot = None
+
+    @staticmethod
+    def is_file_to_sync(project_file: ProjectFile) -> bool:
+        project_file.flush()
+        # the file might have been modified in place, which the directory scanner does not notice
+        project_file.refresh_local_stat()
+
+        # don't attempt to sync files that are the same both locally and remote
+        if project_file.sha256 == project_file.local_sha256:
+            return False
+
+        # ignore local files that are not in the temp directory
+        if (
+            project_file.checkout & ProjectFileCheckout.Local
+            and not project_file.local_path_exists
+        ):
+            return False
+
+        return True
 
     @property
     def is_current_qgis_project(self) -> bool:
@@ -336,40 +569,154 @@ class CloudProject:
         if checkout_filter is None:
             return list(self._files.values())
 
-        return [
-            file for file in self._files.values() if file.checkout & checkout_filter
-        ]
+        if checkout_filter not in self._files_by_checkout:
+            return []
+
+        self.apply_checkout_changes()
+
+        if checkout_filter in self._unordered_checkouts:
+            self._files_by_checkout[checkout_filter] = dict(
+                sorted(
+                    self._files_by_checkout[checkout_filter].items(),
+                    key=lambda item: self._file_positions[item[0]],
+                )
+            )
+            self._unordered_checkouts.discard(checkout_filter)
+
+        return list(self._files_by_checkout[checkout_filter].values())
+
+    def _add_file(self, project_file: ProjectFile) -> None:
+        self._file_positions[project_file.name] = len(self._files)
+        self._files[project_file.name] = project_file
+
+        checkout = project_file.checkout
+        for checkout_filter in CHECKOUT_FILTERS:
+            if checkout & checkout_filter:
+                self._files_by_checkout[checkout_filter][
+                    project_file.name
+                ] = project_file
+
+        project_file.set_checkout_changed_callback(self._on_file_checkout_changed)
+
+    def apply_checkout_changes(self) -> None:
+        """Moves the files whose checkout changed in a worker thread into their buckets. Must be called from the main thread."""
+        with self._pending_checkout_changes_lock:
+            pending_checkout_changes = self._pending_checkout_changes
+            self._pending_checkout_changes = {}
+
+        for project_file, old_checkout in pending_checkout_changes.values():
+            # replaced by `refresh_files` meanwhile
+            if self._files.get(project_file.name) is not project_file:
+                continue
+
+            self._move_file_to_buckets(project_file, old_checkout)
+
+    def _on_file_checkout_changed(
+        self, project_file: ProjectFile, old_checkout: ProjectFileCheckout
+    ) -> None:
+        # e.g. the `SyncPlanner` workers, the main thread might be iterating over the buckets meanwhile
+        if threading.current_thread() is not threading.main_thread():
+            with self._pending_checkout_changes_lock:
+                # the buckets still match the checkout before the first change
+                self._pending_checkout_changes.setdefault(
+                    project_file.name, (project_file, old_checkout)
+                )
+
+            return
+
+        self._move_file_to_buckets(project_file, old_checkout)
+
+    def _move_file_to_buckets(
+        self, project_file: ProjectFile, old_checkout: ProjectFileCheckout
+    ) -> None:
+        """Moves the file into the buckets of its new checkout, e.g. when the local file was created or deleted."""
+        checkout = project_file.checkout
+
+        for checkout_filter in CHECKOUT_FILTERS:
+            was_matching = bool(old_checkout & checkout_filter)
+            is_matching = bool(checkout & checkout_filter)
+
+            if was_matching == is_matching:
+                continue
+
+            bucket = self._files_by_checkout[checkout_filter]
+
+            if is_matching:
+                bucket[project_file.name] = project_file
+                self._unordered_checkouts.add(checkout_filter)
+            else:
+                bucket.pop(project_file.name, None)
 
     def refresh_files(self) -> None:
         self._files = {}
+        self._files_to_sync = None
+        self._files_to_sync_snapshot = None
+        self._files_by_checkout = {
+            checkout_filter: {} for checkout_filter in CHECKOUT_FILTERS
+        }
+        self._file_positions = {}
+        self._unordered_checkouts = set()
+
+        with self._pending_checkout_changes_lock:
+            self._pending_checkout_changes = {}
+
+        # the local directory might have been created or removed meanwhile
+        self._local_dirs_pref = None
+        local_dir = self.local_dir
+        local_stats = self._scan_local_files(local_dir) if local_dir else {}
 
         if self._cloud_files:
             for file_obj in self._cloud_files:
-                self._files[file_obj["name"]] = ProjectFile(
-                    file_obj, local_dir=self.local_dir
-                )
+                filename = file_obj["name"]
+                project_file = ProjectFile(file_obj, local_dir=local_dir)
 
-        if self.local_dir:
-            local_filenames = [
-                f
-                for f in [
-                    str(f.relative_to(self.local_dir).as_posix())
-                    for f in Path(self.local_dir).glob("**/*")
-                    if f.is_file()
-                ]
-                if not f.startswith(".")
-            ]
-
-            for filename in local_filenames:
-                if filename in self._files:
-                    continue
-
-                if filename.endswith((".gpkg-shm", ".gpkg-wal")):
-                    continue
-
-                if filename.endswith((".qgs~", ".qgz~")):
-                    continue
-
-                self._files[filename] = ProjectFile(
-                    {"name": filename}, local_dir=self.local_dir
-                )
+                # the scanner skips the hidden top level entries, their stat is taken lazily
+                if not filename.startswith("."):
+                    project_file.update_local_stat(local_stats.get(filename))
+
+                self._add_file(project_file)
+
+        for filename, local_stat in local_stats.items():
+            if filename in self._files:
+                continue
+
+            if filename.endswith((".gpkg-shm", ".gpkg-wal")):
+                continue
+
+            if filename.endswith((".qgs~", ".qgz~")):
+                continue
+
+            project_file = ProjectFile({"name": filename}, local_dir=local_dir)
+            project_file.update_local_stat(local_stat)
+
+            self._add_file(project_file)
+
+    @staticmethod
+    def _scan_local_files(
+        local_dir: str, skip_hidden: bool = True
+    ) -> Dict[str, os.stat_result]:
+        """Returns the stat of each file within `local_dir` by its relative posix path, skipping the hidden top level entries."""
+        local_stats = {}
+        dirnames = [""]
+
+        while dirnames:
+            dirname = dirnames.pop()
+
+            try:
+                with os.scandir(os.path.join(local_dir, dirname)) as entries:
+                    for entry in entries:
+                        if skip_hidden and not dirname and entry.name.startswith("."):
+                            continue
+
+                        filename = f"{dirname}/{entry.name}" if dirname else entry.name
+
+                        # a symlink to a parent directory would be scanned forever
+                        if entry.is_dir(follow_symlinks=False):
+                            dirnames.append(filename)
+                        elif entry.is_file():
+                            local_stats[filename] = entry.stat()
+            except OSError:
+                # e.g. a directory without read permission or removed meanwhile, its files are skipped
+                continue
+
+        return local_stats
@@ -21,9 +21,11 @@
 
 
 import shutil
+import time
+from collections import deque
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional
 
 from qgis.core import Qgis, QgsMessageLog
 from qgis.PyQt.QtCore import (
@@ -38,7 +40,11 @@ from qgis.PyQt.QtNetwork import QNetworkReply
 
 from qfieldsync.core.cloud_api import CloudNetworkAccessManager
 from qfieldsync.core.cloud_project import CloudProject, ProjectFile, ProjectFileCheckout
+from qfieldsync.core.sync_planner import update_synced_hashes
+from qfieldsync.core.transfer_estimator import record_throughput
+from qfieldsync.core.wal_checkpointer import wal_checkpointer
 from qfieldsync.libqfieldsync.utils.file_utils import copy_multifile
+from qfieldsync.utils.file_utils import break_hardlink
 
 
 class CloudTransferrer(QObject):
@@ -54,20 +60,26 @@ class CloudTransferrer(QObject):
     delete_finished = pyqtSignal()
 
     def __init__(
-        self, network_manager: CloudNetworkAccessManager, cloud_project: CloudProject
+        self,
+        network_manager: CloudNetworkAccessManager,
+        cloud_project: CloudProject,
+        budget: Optional["TransferBudget"] = None,
     ) -> None:
         super(CloudTransferrer, self).__init__(parent=None)
         assert cloud_project.local_dir
 
         self.network_manager = network_manager
         self.cloud_project = cloud_project
+        # shared by all the transferrers of a batch sync, see `BatchSyncer`
+        self.budget = budget
         # NOTE these `_files_to_(upload|download|delete)` uses POSIX path as keys, so beware on M$
         self._files_to_upload = {}
         self._files_to_download: Dict[str, ProjectFile] = {}
         self._files_to_delete = {}
         self.total_upload_bytes = 0
         self.total_download_bytes = 0
-        self.delete_files_finished = 0
+        self._upload_started_at = 0.0
+        self._download_started_at = 0.0
         self.is_aborted = False
         self.is_started = False
         self.is_finished = False
@@ -107,6 +119,8 @@ class CloudTransferrer(QObject):
 
         self.is_started = True
 
+        wal_checkpointer.update_open_database_paths()
+
         # .qgs/.qgz files should be uploaded the last, since they trigger a new job
         files_to_upload_sorted = [
             f
@@ -150,18 +164,21 @@ class CloudTransferrer(QObject):
             # note the .qgs/.qgz files are sorted in the end
             list(self._files_to_upload.values()),
             FileTransfer.Type.UPLOAD,
+            budget=self.budget,
         )
         self.throttled_deleter = ThrottledFileTransferrer(
             self.network_manager,
             self.cloud_project,
             list(self._files_to_delete.values()),
             FileTransfer.Type.DELETE,
+            budget=self.budget,
         )
         self.throttled_downloader = ThrottledFileTransferrer(
             self.network_manager,
             self.cloud_project,
             list(self._files_to_download.values()),
             FileTransfer.Type.DOWNLOAD,
+            budget=self.budget,
         )
         self.transfers_model = TransferFileLogsModel(
             [
@@ -181,6 +198,7 @@ class CloudTransferrer(QObject):
         assert self.cloud_project.local_dir
 
         self.is_upload_active = True
+        self._upload_started_at = time.monotonic()
 
         # nothing to upload
         if len(self._files_to_upload) == 0:
@@ -204,6 +222,13 @@ class CloudTransferrer(QObject):
         self.throttled_uploader.abort()
 
     def _on_throttled_upload_finished(self) -> None:
+        if not self.throttled_uploader.is_aborted:
+            record_throughput(
+                "upload",
+                self.total_upload_bytes,
+                time.monotonic() - self._upload_started_at,
+            )
+
         self.upload_progress.emit(1)
         self.upload_finished.emit()
         return
@@ -225,16 +250,11 @@ class CloudTransferrer(QObject):
         self.throttled_deleter.finished.connect(self._on_throttled_delete_finished)
         self.throttled_deleter.transfer()
 
-        # in case all the files to delete were local only
-        if self.delete_files_finished == len(self._files_to_delete):
-            self.delete_finished.emit()
-
     def _on_throttled_delete_error(self, filename: str, error: str) -> None:
         self.throttled_deleter.abort()
 
     def _on_throttled_delete_finished(self) -> None:
-        if self.delete_files_finished == len(self._files_to_delete):
-            self.delete_finished.emit()
+        self.delete_finished.emit()
 
     def _download(self) -> None:
         assert not self.is_upload_active, "Upload in progress"
@@ -242,6 +262,7 @@ class CloudTransferrer(QObject):
         assert not self.is_download_active, "Download in progress"
 
         self.is_download_active = True
+        self._download_started_at = time.monotonic()
 
         # nothing to download
         if len(self._files_to_download) == 0:
@@ -264,6 +285,13 @@ class CloudTransferrer(QObject):
         self.throttled_downloader.abort()
 
     def _on_throttled_download_finished(self) -> None:
+        if not self.throttled_downloader.is_aborted:
+            record_throughput(
+                "download",
+                self.total_download_bytes,
+                time.monotonic() - self._download_started_at,
+            )
+
         self.download_progress.emit(1)
         self.download_finished.emit()
         return
@@ -289,7 +317,7 @@ class CloudTransferrer(QObject):
         self.is_finished = True
 
         if not self.is_project_list_update_active:
-            self.finished.emit()
+            self._emit_finished()
 
     def _update_project_files_list(self) -> None:
         self.is_project_list_update_active = True
@@ -302,11 +330,39 @@ class CloudTransferrer(QObject):
     def _on_update_project_files_list_finished(self) -> None:
         self.is_project_list_update_active = False
 
-        if not self.is_download_active:
-            if self.error_message:
-                return
+        # the files list is updated while the files are still being deleted or downloaded
+        if self.is_finished:
+            self._emit_finished()
 
-            self.finished.emit()
+    def _emit_finished(self) -> None:
+        """Emits `finished` once, even after an error, so the owner knows when the transferrer is not used anymore."""
+        self._update_synced_hashes()
+        self.finished.emit()
+
+    def _update_synced_hashes(self) -> None:
+        """Stores the hashes of the transferred files, now the same locally and on the cloud."""
+        cloud_hashes = {
+            file_obj["name"]: file_obj.get("sha256")
+            for file_obj in self.cloud_project.cloud_files or []
+        }
+        hashes = {}
+
+        for filename, transfer in self.throttled_uploader.transfers.items():
+            if transfer.is_succeeded:
+                # the hash as computed by the server, `None` forgets it if the files list failed to update
+                hashes[filename] = cloud_hashes.get(filename)
+
+        for filename, transfer in self.throttled_deleter.transfers.items():
+            if transfer.is_succeeded:
+                hashes[filename] = None
+
+        # the downloaded files are not copied to the project directory if anything failed meanwhile
+        if not self.error_message:
+            for filename, transfer in self.throttled_downloader.transfers.items():
+                if transfer.is_succeeded:
+                    hashes[filename] = transfer.file.sha256
+
+        update_synced_hashes(self.cloud_project, hashes)
 
     def abort_requests(self) -> None:
         if self.is_aborted:
@@ -362,10 +418,13 @@ class CloudTransferrer(QObject):
                     dest_path = Path(str(dest_filename) + suffix)
 
                     if source_path.exists():
+                        break_hardlink(dest_path)
                         shutil.copyfile(source_path, dest_path)
                     else:
                         dest_path.unlink()
 
+            # the local file might be a hardlink of an original attachment, which must stay untouched
+            break_hardlink(dest_filename)
             shutil.copyfile(filename, dest_filename)
 
     def import_qfield_project(self) -> bool:
@@ -445,16 +504,23 @@ class FileTransfer(QObject):
             self.is_local_delete = True
 
     def abort(self):
-        if not self.is_started:
-            return
-
         if self.is_finished:
             return
 
         self.is_aborted = True
+
+        # the transfers that were not started yet are finished right away
+        if not self.is_started:
+            return
+
         self.last_reply.abort()
 
     def transfer(self) -> None:
+        # aborted while waiting for the queued calls on the file, see below
+        if self.is_aborted:
+            self.finished.emit()
+            return
+
         if self.type == FileTransfer.Type.DOWNLOAD:
             if self.is_redirect:
                 reply = self.network_manager.get(
@@ -468,6 +534,12 @@ class FileTransfer(QObject):
                     params=params,
                 )
         elif self.type == FileTransfer.Type.UPLOAD:
+            # e.g. a delete of the file replayed after the upload would delete the new copy
+            if not self.network_manager.mutation_queue.prepare_upload(
+                f"projects/{self.cloud_project.id}/{self.filename}", self.transfer
+            ):
+                return
+
             reply = self.network_manager.cloud_upload_files(
                 "files/" + self.cloud_project.id + "/" + self.filename,
                 filenames=[str(self.fs_filename)],
@@ -571,6 +643,10 @@ class FileTransfer(QObject):
 
         return self.replies[-1].isFinished()
 
+    @property
+    def is_succeeded(self) -> bool:
+        return self.is_finished and not self.is_aborted and not self.is_failed
+
     @property
     def is_redirect(self) -> bool:
         if not self.replies:
@@ -590,6 +666,75 @@ class FileTransfer(QObject):
             self.error is not None or self.last_reply.error() != QNetworkReply.NoError
         )
 
+    @property
+    def size(self) -> int:
+        if self.type == FileTransfer.Type.UPLOAD:
+            return self.file.local_size or 0
+        elif self.type == FileTransfer.Type.DOWNLOAD:
+            return self.file.size or 0
+        else:
+            return 0
+
+
+class TransferBudget(QObject):
+    """Limits the file transfers running at once, shared by multiple `ThrottledFileTransferrer` instances.
+
+    Besides the number of requests, the total size of the files being transferred can be limited, so a few large
+    files do not starve the bandwidth of all the others. A transfer is always allowed if nothing else is running.
+
+    The transferrers that could not acquire a transfer `wait` for a release, they are called back in order, only as
+    long as there is a free slot.
+    """
+
+    def __init__(
+        self, max_parallel_requests: int = 8, max_parallel_bytes: Optional[int] = None
+    ) -> None:
+        super(TransferBudget, self).__init__()
+
+        self.max_parallel_requests = max_parallel_requests
+        self.max_parallel_bytes = max_parallel_bytes
+        self._transfer_sizes: Dict[FileTransfer, int] = {}
+        self._bytes = 0
+        self._waiting_callbacks: Deque[Callable[[], None]] = deque()
+
+    def acquire(self, transfer: FileTransfer) -> bool:
+        if self._transfer_sizes:
+            if len(self._transfer_sizes) >= self.max_parallel_requests:
+                return False
+
+            if (
+                self.max_parallel_bytes is not None
+                and self._bytes + transfer.size > self.max_parallel_bytes
+            ):
+                return False
+
+        self._transfer_sizes[transfer] = transfer.size
+        self._bytes += transfer.size
+
+        return True
+
+    def release(self, transfer: FileTransfer) -> None:
+        if transfer not in self._transfer_sizes:
+            return
+
+        self._bytes -= self._transfer_sizes.pop(transfer)
+
+        # each callback is called at most once, as it waits again if it still cannot acquire
+        for _i in range(len(self._waiting_callbacks)):
+            if len(self._transfer_sizes) >= self.max_parallel_requests:
+                break
+
+            self._waiting_callbacks.popleft()()
+
+    def wait(self, callback: Callable[[], None]) -> None:
+        """Calls back once a transfer is released, e.g. to retry acquiring."""
+        if callback not in self._waiting_callbacks:
+            self._waiting_callbacks.append(callback)
+
+    def cancel_wait(self, callback: Callable[[], None]) -> None:
+        if callback in self._waiting_callbacks:
+            self._waiting_callbacks.remove(callback)
+
 
 class ThrottledFileTransferrer(QObject):
     error = pyqtSignal(str, str)
@@ -605,6 +750,7 @@ class ThrottledFileTransferrer(QObject):
         files: List[ProjectFile],
         transfer_type: FileTransfer.Type,
         max_parallel_requests: int = 8,
+        budget: Optional[TransferBudget] = None,
     ) -> None:
         super(QObject, self).__init__()
 
@@ -617,6 +763,14 @@ class ThrottledFileTransferrer(QObject):
         self.finished_count = 0
         self.temp_dir = Path(cloud_project.local_dir).joinpath(".qfieldsync")
         self.transfer_type = transfer_type
+        self.budget = budget
+        self.is_started = False
+        self.is_aborted = False
+        self._is_finished_emitted = False
+        # transfers not started yet, in order, and the number of the started but not finished ones
+        self._pending_transfers: Deque[FileTransfer] = deque()
+        self._running_count = 0
+        self._is_starting = False
 
         for file in self.files:
             transfer = FileTransfer(
@@ -626,38 +780,87 @@ class ThrottledFileTransferrer(QObject):
                 file,
                 self.temp_dir.joinpath(str(self.transfer_type.value), file.name),
             )
+            # bind the current `transfer` as a default argument, otherwise all the lambdas get the last one
             transfer.progress.connect(
-                lambda *args: self._on_transfer_progress(transfer, *args)
+                lambda *args, transfer=transfer: self._on_transfer_progress(
+                    transfer, *args
+                )
             )
             transfer.finished.connect(
-                lambda *args: self._on_transfer_finished(transfer, *args)
+                lambda *args, transfer=transfer: self._on_transfer_finished(
+                    transfer, *args
+                )
             )
 
             assert file.name not in self.transfers
 
             self.transfers[file.name] = transfer
+            self._pending_transfers.append(transfer)
 
     def transfer(self):
-        transfers_count = 0
+        self.is_started = True
 
-        for transfer in self.transfers.values():
-            if transfer.is_finished:
-                continue
+        # e.g. the previous transfer step failed and aborted everything, but the next step expects to be finished
+        if self.is_aborted:
+            self._emit_finished_if_done()
+            return
 
-            transfers_count += 1
+        # local deletes finish synchronously and call back here, the outer loop starts the next transfers
+        if self._is_starting:
+            return
 
-            # skip a started request but still waiting for a response
-            if not transfer.is_started:
-                transfer.transfer()
+        self._is_starting = True
+        try:
+            while (
+                self._pending_transfers
+                and self._running_count < self.max_parallel_requests
+            ):
+                transfer = self._pending_transfers[0]
 
-            if transfers_count == self.max_parallel_requests:
-                break
+                # the shared budget is exhausted, continue when another transfer finishes
+                if self.budget and not self.budget.acquire(transfer):
+                    self.budget.wait(self.transfer)
+                    break
+
+                self._pending_transfers.popleft()
+                self._running_count += 1
+                transfer.transfer()
+        finally:
+            self._is_starting = False
 
     def abort(self) -> None:
+        if self.is_aborted:
+            return
+
+        self.is_aborted = True
+
+        if self.budget:
+            self.budget.cancel_wait(self.transfer)
+
+        # the transfers that were not started yet are never going to emit `finished`
+        pending_transfers = list(self._pending_transfers)
+        self._pending_transfers.clear()
+
         for transfer in self.transfers.values():
             transfer.abort()
 
+        for transfer in pending_transfers:
+            self.finished_count += 1
+            self.file_finished.emit(transfer.filename)
+
         self.aborted.emit()
+        self._emit_finished_if_done()
+
+    def _emit_finished_if_done(self) -> None:
+        # not emitted before `transfer` is called, so the owner had the chance to connect to `finished`
+        if not self.is_started or self._is_finished_emitted:
+            return
+
+        if self.finished_count < len(self.transfers):
+            return
+
+        self._is_finished_emitted = True
+        self.finished.emit()
 
     def _on_transfer_progress(self, transfer, bytes_received: int, bytes_total: int):
         bytes_received_sum = sum([t.bytes_transferred for t in self.transfers.values()])
@@ -665,7 +868,10 @@ class ThrottledFileTransferrer(QObject):
         self.progress.emit(transfer.filename, bytes_received_sum, bytes_total_sum)
 
     def _on_transfer_finished(self, transfer: FileTransfer) -> None:
-        self.transfer()
+        self._running_count -= 1
+
+        if self.budget:
+            self.budget.release(transfer)
 
         if transfer.error:
             if transfer.type == FileTransfer.Type.DOWNLOAD:
@@ -686,12 +892,13 @@ class ThrottledFileTransferrer(QObject):
                 msg,
             )
 
+        # after the error is reported, so the next transfers are not started if it aborted everything
+        self.transfer()
+
         self.finished_count += 1
         self.file_finished.emit(transfer.filename)
 
-        if self.finished_count == len(self.transfers):
-            self.finished.emit()
-            return
+        self._emit_finished_if_done()
 
 
 class TransferFileLogsModel(QAbstractListModel):
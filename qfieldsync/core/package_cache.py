@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from qgis.core import QgsApplication, QgsProject
+
+from qfieldsync.libqfieldsync import ProjectConfiguration
+from qfieldsync.utils.file_utils import sync_files
+from qfieldsync.utils.qgis_utils import ONLINE_PROVIDERS, get_layer_fingerprint
+
+# the number of readers of each cache entry directory, which must not be replaced or evicted meanwhile
+_entry_readers: Dict[Path, int] = {}
+_entry_readers_lock = threading.Lock()
+
+
+class PackageCache:
+    """Keeps the output of the recent packagings, so packaging an unchanged project again is a mere copy.
+
+    The cache key covers the project file, the fingerprint of each layer source, the area of interest, the
+    `offline_copy_only_aoi` setting and the copied directories. Projects with layers that are not stored in local files,
+    e.g. PostGIS layers, have no key and are never cached, as their changes cannot be detected.
+
+    The packages are always copied in and out of the cache, never hardlinked, as QField edits the packaged files, e.g.
+    the offline GeoPackage, in place.
+    """
+
+    # number of packages kept, the least recently used are evicted first
+    MAX_ENTRIES = 5
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        self.cache_dir = cache_dir or Path(
+            QgsApplication.qgisSettingsDirPath(), "cache", "qfieldsync", "packages"
+        )
+
+    @staticmethod
+    def get_key(
+        project: QgsProject,
+        area_of_interest: str,
+        area_of_interest_crs: str,
+        attachment_dirs: List[str],
+        dirs_to_copy: Optional[Dict[str, bool]] = None,
+    ) -> Optional[str]:
+        """Returns the cache key of the package, or `None` if it cannot be cached. Must be called from the main thread."""
+        project_path = Path(project.fileName())
+
+        if not project_path.is_file():
+            return None
+
+        layer_fingerprints = []
+        for layer in project.mapLayers().values():
+            fingerprint = get_layer_fingerprint(layer)
+
+            if fingerprint is None and layer.isValid() and layer.dataProvider():
+                # online layers are not copied in the package, so they do not matter
+                if layer.dataProvider().name() not in ONLINE_PROVIDERS:
+                    return None
+
+            layer_fingerprints.append([layer.id(), fingerprint])
+
+        copied_dirs = sorted(
+            {*attachment_dirs, *[d for d, c in (dirs_to_copy or {}).items() if c]}
+        )
+        project_stat = project_path.stat()
+        key_data: List[Any] = [
+            str(project_path),
+            project_stat.st_mtime_ns,
+            project_stat.st_size,
+            area_of_interest,
+            area_of_interest_crs,
+            ProjectConfiguration(project).offline_copy_only_aoi,
+            sorted(layer_fingerprints),
+            [
+                [
+                    copied_dir,
+                    PackageCache._get_dir_fingerprint(project_path.parent, copied_dir),
+                ]
+                for copied_dir in copied_dirs
+            ],
+        ]
+
+        return hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+
+    def acquire(self, key: str) -> Optional[Path]:
+        """Returns the directory of the cached package, or `None` if not cached. Marks the package as recently used.
+
+        The package is neither replaced nor evicted until `release` is called.
+        """
+        entry_dir = self.cache_dir.joinpath(key)
+
+        with _entry_readers_lock:
+            if not entry_dir.is_dir():
+                return None
+
+            os.utime(entry_dir)
+            _entry_readers[entry_dir] = _entry_readers.get(entry_dir, 0) + 1
+
+        return entry_dir
+
+    def release(self, key: str) -> None:
+        entry_dir = self.cache_dir.joinpath(key)
+
+        with _entry_readers_lock:
+            if entry_dir not in _entry_readers:
+                return
+
+            _entry_readers[entry_dir] -= 1
+
+            if _entry_readers[entry_dir] == 0:
+                del _entry_readers[entry_dir]
+
+    def store(self, key: str, package_folder: str) -> None:
+        """Copies the package from the package folder into the cache."""
+        entry_dir = self.cache_dir.joinpath(key)
+        temp_dir = self.cache_dir.joinpath(f".{key}.{uuid.uuid4().hex}")
+
+        # other QGIS instances might store the same package meanwhile, so write into a temporary directory first
+        try:
+            sync_files(package_folder, temp_dir)
+
+            with _entry_readers_lock:
+                # the package being read has the same key, hence the same content
+                if entry_dir not in _entry_readers:
+                    if entry_dir.exists():
+                        shutil.rmtree(entry_dir)
+
+                    temp_dir.rename(entry_dir)
+
+                self._evict()
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _evict(self) -> None:
+        """Removes the least recently used packages. Must be called with `_entry_readers_lock` held."""
+        entry_dirs = sorted(
+            (
+                entry_dir
+                for entry_dir in self.cache_dir.iterdir()
+                if entry_dir.is_dir() and not entry_dir.name.startswith(".")
+            ),
+            key=lambda entry_dir: entry_dir.stat().st_mtime,
+            reverse=True,
+        )
+
+        max_entries = PackageCache.MAX_ENTRIES
+        for entry_dir in entry_dirs[max_entries:]:
+            if entry_dir in _entry_readers:
+                continue
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    @staticmethod
+    def _get_dir_fingerprint(base_dir: Path, dir_name: str) -> List[List[Any]]:
+        file_stats = []
+
+        for dirpath, _dirnames, filenames in os.walk(base_dir.joinpath(dir_name)):
+            for filename in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                except OSError:
+                    continue
+
+                file_stats.append(
+                    [
+                        os.path.relpath(os.path.join(dirpath, filename), base_dir),
+                        stat.st_mtime_ns,
+                        stat.st_size,
+                    ]
+                )
+
+        return sorted(file_stats)
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import shutil
+import tempfile
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsFeatureSource,
+    QgsFeedback,
+    QgsGeometry,
+    QgsMapLayer,
+    QgsMessageLog,
+    QgsOfflineEditing,
+    QgsProject,
+    QgsRasterLayer,
+    QgsTask,
+    QgsVectorDataProvider,
+)
+from qgis.PyQt.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from qfieldsync.core.basemap_renderer import BaseMapRenderer
+from qfieldsync.core.package_cache import PackageCache
+from qfieldsync.libqfieldsync import OfflineConverter, ProjectConfiguration
+from qfieldsync.libqfieldsync.layer import LayerSource, SyncAction
+from qfieldsync.libqfieldsync.utils.qgis import get_qgis_files_within_dir
+from qfieldsync.utils.file_utils import sync_files, zip_directory
+
+# providers that build the spatial index in memory, creating it leaves the layer source untouched
+IN_MEMORY_INDEX_PROVIDERS = ("memory", "delimitedtext")
+
+
+class ProjectPackager(QObject):
+    """Packages the currently open project for QField. Must be used from the main thread.
+
+    The `OfflineConverter` of libqfieldsync converts the layers using `QgsOfflineEditing`, which only works on
+    `QgsProject.instance()`, and clears and reopens that project. The conversion therefore cannot run in a background
+    task and blocks the main thread, without the possibility to cancel it. Everything afterwards is left to the returned
+    `PackageTask`.
+    """
+
+    # same as the `OfflineConverter` signals
+    total_progress_updated = pyqtSignal(int, int, str)
+    task_progress_updated = pyqtSignal(int, int)
+    warning = pyqtSignal(str, str)
+
+    def __init__(
+        self,
+        project: QgsProject,
+        area_of_interest: str,
+        area_of_interest_crs: str,
+        attachment_dirs: List[str],
+        offline_editing: QgsOfflineEditing,
+        dirs_to_copy: Optional[Dict[str, bool]] = None,
+        base_map_format: str = "gpkg",
+    ) -> None:
+        super(ProjectPackager, self).__init__(parent=None)
+
+        self.project = project
+        self.area_of_interest = area_of_interest
+        self.area_of_interest_crs = area_of_interest_crs
+        self.attachment_dirs = attachment_dirs
+        self.offline_editing = offline_editing
+        self.dirs_to_copy = dirs_to_copy
+        self.base_map_format = base_map_format
+
+    def package(
+        self,
+        export_folder: str,
+        cache_key: Optional[str] = None,
+        mirror_folders: Optional[List[str]] = None,
+        zip_path: Optional[str] = None,
+    ) -> "PackageTask":
+        """Converts the project, unless cached, and returns the task writing the package. The task is not started.
+
+        If a `cache_key` is given, see `PackageCache.get_key`, a cached package is used instead of converting again.
+        """
+        cached_folder = PackageCache().acquire(cache_key) if cache_key else None
+
+        if cached_folder:
+            return PackageTask(
+                str(cached_folder),
+                export_folder,
+                cache_key=cache_key,
+                is_cached=True,
+                mirror_folders=mirror_folders,
+                zip_path=zip_path,
+            )
+
+        # the package folder is only temporary when writing a ZIP archive
+        if zip_path:
+            Path(zip_path).parent.mkdir(parents=True, exist_ok=True)
+            package_folder = tempfile.mkdtemp(
+                prefix=".qfieldsync_package_", dir=Path(zip_path).parent
+            )
+        else:
+            package_folder = export_folder
+
+        project_configuration = ProjectConfiguration(self.project)
+
+        try:
+            if project_configuration.offline_copy_only_aoi:
+                self._create_spatial_indexes()
+
+            self._convert_project(package_folder)
+        except Exception:
+            if zip_path:
+                shutil.rmtree(package_folder, ignore_errors=True)
+
+            raise
+
+        return PackageTask(
+            package_folder,
+            export_folder,
+            cache_key=cache_key,
+            mirror_folders=mirror_folders,
+            zip_path=zip_path,
+            remove_package_folder=bool(zip_path),
+            base_map_project_path=(
+                self.project.fileName()
+                if project_configuration.create_base_map
+                else None
+            ),
+            area_of_interest=self.area_of_interest,
+            area_of_interest_crs=self.area_of_interest_crs,
+            base_map_format=self.base_map_format,
+        )
+
+    def _create_spatial_indexes(self) -> None:
+        """Creates the missing in memory spatial indexes of the offline copied layers.
+
+        The features within the area of interest are then selected using the index, instead of scanning the whole
+        layer. Only the providers in `IN_MEMORY_INDEX_PROVIDERS` are indexed, as the others would write the index into
+        the layer source, e.g. a ".qix" file or a database table, which belongs to the user.
+        """
+        for layer in self.project.mapLayers().values():
+            if (
+                layer.type() != QgsMapLayer.VectorLayer
+                or not layer.isValid()
+                or not layer.isSpatial()
+                or LayerSource(layer).action != SyncAction.OFFLINE
+            ):
+                continue
+
+            provider = layer.dataProvider()
+
+            if (
+                provider.name() not in IN_MEMORY_INDEX_PROVIDERS
+                or provider.hasSpatialIndex() != QgsFeatureSource.SpatialIndexNotPresent
+                or not provider.capabilities()
+                & QgsVectorDataProvider.CreateSpatialIndex
+            ):
+                continue
+
+            self.total_progress_updated.emit(
+                0, 100, f'Creating the spatial index of "{layer.name()}"…'
+            )
+
+            if not provider.createSpatialIndex():
+                QgsMessageLog.logMessage(
+                    f'Failed to create the spatial index of "{layer.name()}"',
+                    "QFieldSync",
+                    Qgis.Warning,
+                )
+
+    def _convert_project(self, package_folder: str) -> None:
+        # the base map is rendered by the `PackageTask` instead
+        offline_converter = OfflineConverter(
+            self.project,
+            package_folder,
+            self.area_of_interest,
+            self.area_of_interest_crs,
+            self.attachment_dirs,
+            self.offline_editing,
+            create_basemap=False,
+            dirs_to_copy=self.dirs_to_copy,
+        )
+        offline_converter.total_progress_updated.connect(
+            self.total_progress_updated.emit
+        )
+        offline_converter.task_progress_updated.connect(self.task_progress_updated.emit)
+        offline_converter.warning.connect(self.warning.emit)
+
+        offline_converter.convert()
+
+
+class PackageTask(QgsTask):
+    """Finishes a converted or cached package in a background thread, see `ProjectPackager`.
+
+    If a `base_map_project_path` is given, the base map is rendered from a separate `QgsProject` read from that file
+    by the `BaseMapRenderer` in the `base_map_format`, see `BaseMapRenderer.FORMATS`, and is added to the packaged
+    project as a regular raster layer. The package is then stored in the cache, unless it comes from there, copied into
+    the export folder and each of the `mirror_folders`, e.g. of other devices with the same area of interest. If a
+    `zip_path` is given, the package is written into a ZIP archive instead of the export folder.
+    """
+
+    total_progress_updated = pyqtSignal(int, int, str)
+    task_progress_updated = pyqtSignal(int, int)
+
+    def __init__(
+        self,
+        package_folder: str,
+        export_folder: str,
+        cache_key: Optional[str] = None,
+        is_cached: bool = False,
+        mirror_folders: Optional[List[str]] = None,
+        zip_path: Optional[str] = None,
+        remove_package_folder: bool = False,
+        base_map_project_path: Optional[str] = None,
+        area_of_interest: str = "",
+        area_of_interest_crs: str = "",
+        base_map_format: str = "gpkg",
+    ) -> None:
+        super().__init__("Packaging project for QField", QgsTask.CanCancel)
+
+        self.package_folder = package_folder
+        self.export_folder = export_folder
+        self.cache_key = cache_key
+        self.is_cached = is_cached
+        self.mirror_folders = mirror_folders or []
+        self.zip_path = zip_path
+        # e.g. the temporary folder of a package written into a ZIP archive
+        self.remove_package_folder = remove_package_folder
+        self.base_map_project_path = base_map_project_path
+        self.area_of_interest = area_of_interest
+        self.area_of_interest_crs = area_of_interest_crs
+        self.base_map_format = base_map_format
+        self.error: Optional[Exception] = None
+        self.error_traceback = ""
+
+    def run(self) -> bool:
+        try:
+            if self.base_map_project_path:
+                self._create_base_map()
+
+            if self.isCanceled():
+                return False
+
+            if not self.is_cached:
+                self._store_in_cache()
+
+            if self.isCanceled():
+                return False
+
+            if self.package_folder != self.export_folder and not self.zip_path:
+                self.total_progress_updated.emit(0, 100, "Copying the cached package…")
+                sync_files(
+                    self.package_folder, self.export_folder, delete_extraneous=True
+                )
+
+            for mirror_folder in self.mirror_folders:
+                if self.isCanceled():
+                    return False
+
+                self.total_progress_updated.emit(
+                    0, 100, f'Copying the package to "{mirror_folder}"…'
+                )
+                sync_files(self.package_folder, mirror_folder, delete_extraneous=True)
+
+            if self.zip_path and not self.isCanceled():
+                self.total_progress_updated.emit(0, 100, "Writing the ZIP archive…")
+                zip_directory(self.package_folder, self.zip_path)
+
+            self.total_progress_updated.emit(100, 100, "Finished")
+        except Exception as err:
+            self.error = err
+            self.error_traceback = traceback.format_exc()
+            return False
+        finally:
+            if self.remove_package_folder:
+                shutil.rmtree(self.package_folder, ignore_errors=True)
+
+        return not self.isCanceled()
+
+    def _create_base_map(self) -> None:
+        base_map_dir = tempfile.mkdtemp(prefix="qfieldsync_basemap_")
+
+        try:
+            base_map_path = self._render_base_map(base_map_dir)
+
+            if not self.isCanceled():
+                self._add_base_map(base_map_path)
+        finally:
+            shutil.rmtree(base_map_dir, ignore_errors=True)
+
+    def _render_base_map(self, base_map_dir: str) -> str:
+        self.total_progress_updated.emit(
+            0, 100, QCoreApplication.translate("QFieldSync", "Rendering the base map…")
+        )
+
+        # the open project belongs to the main thread, the task reads its own copy
+        project = QgsProject()
+
+        if not project.read(self.base_map_project_path):
+            raise Exception(
+                f'Failed to read the project "{self.base_map_project_path}": {project.error()}'
+            )
+
+        area_of_interest = QgsGeometry.fromWkt(self.area_of_interest)
+        area_of_interest.transform(
+            QgsCoordinateTransform(
+                QgsCoordinateReferenceSystem(self.area_of_interest_crs),
+                project.crs(),
+                project,
+            )
+        )
+        base_map_path = str(Path(base_map_dir, f"basemap.{self.base_map_format}"))
+
+        feedback = QgsFeedback()
+
+        def on_progress_changed(progress: float) -> None:
+            self.setProgress(progress)
+            self.task_progress_updated.emit(int(progress), 100)
+
+            # a canceled task stops the rendering after the current tiles
+            if self.isCanceled():
+                feedback.cancel()
+
+        feedback.progressChanged.connect(on_progress_changed)
+
+        base_map_renderer = BaseMapRenderer(project, feedback=feedback)
+        base_map_renderer.render(
+            area_of_interest.boundingBox(), base_map_path, self.base_map_format
+        )
+
+        QgsMessageLog.logMessage(
+            f"Base map tiles: {base_map_renderer.rendered_count} rendered, "
+            f"{base_map_renderer.cached_count} cached",
+            "QFieldSync",
+        )
+
+        return base_map_path
+
+    def _add_base_map(self, base_map_path: str) -> None:
+        """Adds the rendered base map to the packaged project, which is read into a separate `QgsProject`."""
+        project_filenames = get_qgis_files_within_dir(self.package_folder)
+
+        if not project_filenames:
+            raise Exception(f'No packaged project found in "{self.package_folder}"')
+
+        packaged_base_map_path = Path(self.package_folder, Path(base_map_path).name)
+        shutil.copyfile(base_map_path, packaged_base_map_path)
+
+        project_path = str(Path(self.package_folder, project_filenames[0]))
+        packaged_project = QgsProject()
+
+        if not packaged_project.read(project_path):
+            raise Exception(
+                f'Failed to read the packaged project "{project_path}": {packaged_project.error()}'
+            )
+
+        base_map_layer = QgsRasterLayer(
+            str(packaged_base_map_path),
+            QCoreApplication.translate("QFieldSync", "Basemap"),
+        )
+        packaged_project.addMapLayer(base_map_layer, False)
+        layer_tree = packaged_project.layerTreeRoot()
+        layer_tree.insertLayer(len(layer_tree.children()), base_map_layer)
+
+        if not packaged_project.write(project_path):
+            raise Exception(
+                f'Failed to write the packaged project "{project_path}": {packaged_project.error()}'
+            )
+
+    def finished(self, result: bool) -> None:
+        # also called when canceled before running
+        if self.is_cached and self.cache_key:
+            PackageCache().release(self.cache_key)
+
+    def _store_in_cache(self) -> None:
+        if not self.cache_key:
+            return
+
+        # a failure to cache must not fail the packaging
+        try:
+            PackageCache().store(self.cache_key, self.package_folder)
+        except Exception as err:
+            QgsMessageLog.logMessage(
+                f"Failed to cache the package: {err}", "QFieldSync", Qgis.Warning
+            )
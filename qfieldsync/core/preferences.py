@@ -1,8 +1,12 @@
 from pathlib import Path
+from typing import Any, Dict, Set
+
+from qgis.PyQt.QtCore import QTimer
 
 from qfieldsync.setting_manager import (
     Bool,
     Dictionary,
+    Integer,
     Scope,
     SettingManager,
     String,
@@ -13,6 +17,12 @@ pluginName = "QFieldSync"
 
 
 class Preferences(SettingManager):
+    # Global setting values shared by all `Preferences` instances, as reading them means a `QSettings` read and
+    # deserialization. Invalidated on each write, therefore the returned values must never be mutated in place.
+    _global_values_cache: Dict[str, Any] = {}
+    # names of the cached settings that are not yet written to `QSettings`, see `set_value_deferred`
+    _pending_setting_names: Set[str] = set()
+
     def __init__(self):
         SettingManager.__init__(self, pluginName, False)
         home = Path.home()
@@ -25,12 +35,81 @@ class Preferences(SettingManager):
         )
         self.add_setting(String("importDirectoryProject", Scope.Project, None))
         self.add_setting(Dictionary("dirsToCopy", Scope.Project, {}))
+        # "gpkg" or "mbtiles", see `BaseMapRenderer.FORMATS`
+        self.add_setting(String("baseMapFormat", Scope.Project, "gpkg"))
         self.add_setting(Stringlist("attachmentDirs", Scope.Project, ["DCIM"]))
         self.add_setting(Dictionary("qfieldCloudProjectLocalDirs", Scope.Global, {}))
         self.add_setting(Dictionary("qfieldCloudLastProjectFiles", Scope.Global, {}))
         self.add_setting(String("qfieldCloudServerUrl", Scope.Global, ""))
         self.add_setting(String("qfieldCloudAuthcfg", Scope.Global, ""))
         self.add_setting(Bool("qfieldCloudRememberMe", Scope.Global, True))
+        # JSON list of the API calls to be replayed, see `CloudMutationQueue`
+        self.add_setting(String("qfieldCloudPendingMutations", Scope.Global, "[]"))
+        self.add_setting(Bool("qfieldCloudAutoSync", Scope.Global, False))
+        # minutes
+        self.add_setting(Integer("qfieldCloudAutoSyncInterval", Scope.Global, 15))
+        self.add_setting(Bool("qfieldCloudAutoSyncPauseOnMetered", Scope.Global, True))
+        # bytes per second measured in the recent operations, see `transfer_estimator`
+        self.add_setting(Dictionary("transferThroughputs", Scope.Global, {}))
+        # hardlink the attachments and the cached packages instead of copying them when on the same volume
+        self.add_setting(Bool("attachmentsHardlink", Scope.Global, False))
+        # package into a ZIP archive instead of a folder
+        self.add_setting(Bool("exportZip", Scope.Global, False))
+        # maximum number of layers converted at once when converting a project to a cloud project
+        self.add_setting(Integer("cloudConversionWorkers", Scope.Global, 4))
         self.add_setting(
             String("cloudDirectory", Scope.Global, str(home.joinpath("QField/cloud")))
         )
+
+    def value(self, setting_name: str) -> Any:
+        # project settings depend on the currently opened project, never cache them
+        if self.setting(setting_name).scope != Scope.Global:
+            return SettingManager.value(self, setting_name)
+
+        if setting_name not in Preferences._global_values_cache:
+            Preferences._global_values_cache[setting_name] = SettingManager.value(
+                self, setting_name
+            )
+
+        return Preferences._global_values_cache[setting_name]
+
+    def set_value(self, setting_name: str, value: Any) -> None:
+        Preferences._global_values_cache.pop(setting_name, None)
+        Preferences._pending_setting_names.discard(setting_name)
+
+        SettingManager.set_value(self, setting_name, value)
+
+    def set_value_deferred(self, setting_name: str, value: Any) -> None:
+        """Sets the value of a global setting immediately, but writes it to `QSettings` on the next event loop tick.
+
+        Consecutive calls are coalesced, so the (potentially huge) value is written only once.
+        """
+        assert self.setting(setting_name).scope == Scope.Global
+
+        if not Preferences._pending_setting_names:
+            QTimer.singleShot(0, Preferences.flush)
+
+        Preferences._global_values_cache[setting_name] = value
+        Preferences._pending_setting_names.add(setting_name)
+
+    @staticmethod
+    def flush() -> None:
+        """Writes all the values set with `set_value_deferred` that are not written yet."""
+        if not Preferences._pending_setting_names:
+            return
+
+        preferences = Preferences()
+        for setting_name in Preferences._pending_setting_names:
+            SettingManager.set_value(
+                preferences,
+                setting_name,
+                Preferences._global_values_cache[setting_name],
+            )
+
+        Preferences._pending_setting_names.clear()
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """Needed after the settings are written without `set_value`, e.g. by the `SettingDialog` widgets."""
+        Preferences.flush()
+        Preferences._global_values_cache.clear()
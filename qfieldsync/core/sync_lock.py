@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+
+from typing import Dict
+
+
+class SyncLock:
+    """Makes sure a cloud project is synchronized by a single owner at a time.
+
+    Both the automatic and the manual synchronization acquire the lock of the project before comparing the files and
+    release it once the file transfers are finished. Used only from the main thread.
+    """
+
+    def __init__(self) -> None:
+        # owner per project id
+        self._owners: Dict[str, object] = {}
+
+    def acquire(self, project_id: str, owner: object) -> bool:
+        """Returns whether the lock is held by `owner`, an owner might acquire the same lock multiple times."""
+        current_owner = self._owners.setdefault(project_id, owner)
+
+        return current_owner is owner
+
+    def release(self, project_id: str, owner: object) -> None:
+        if self._owners.get(project_id) is owner:
+            del self._owners[project_id]
+
+    def is_locked(self, project_id: str) -> bool:
+        return project_id in self._owners
+
+
+# Modules are evaluated only once, therefore it works as a poor man version of singleton.
+sync_lock = SyncLock()
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from qgis.core import Qgis, QgsMessageLog, QgsTask
+
+from qfieldsync.core.cloud_project import CloudProject, ProjectFile, ProjectFileCheckout
+from qfieldsync.core.wal_checkpointer import wal_checkpointer
+
+# the hashes of the files as they were after the last synchronization, relative to the project local directory
+SYNCED_HASHES_FILENAME = ".qfieldsync_synced_files.json"
+
+
+def _get_synced_hashes_path(cloud_project: CloudProject) -> Path:
+    assert cloud_project.local_dir
+
+    return Path(cloud_project.local_dir).joinpath(SYNCED_HASHES_FILENAME)
+
+
+def read_synced_hashes(cloud_project: CloudProject) -> Dict[str, str]:
+    """Returns the sha256 of each file when it was last synchronized, i.e. when the local and the cloud copy were the same."""
+    try:
+        with open(_get_synced_hashes_path(cloud_project)) as f:
+            synced_hashes = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(synced_hashes, dict):
+        return {}
+
+    return synced_hashes
+
+
+def update_synced_hashes(
+    cloud_project: CloudProject, hashes: Dict[str, Optional[str]]
+) -> None:
+    """Stores the sha256 of the synchronized files, `None` forgets a file, e.g. deleted both locally and on the cloud."""
+    if not hashes:
+        return
+
+    synced_hashes = read_synced_hashes(cloud_project)
+
+    for filename, sha256 in hashes.items():
+        if sha256 is None:
+            synced_hashes.pop(filename, None)
+        else:
+            synced_hashes[filename] = sha256
+
+    try:
+        with open(_get_synced_hashes_path(cloud_project), "w") as f:
+            json.dump(synced_hashes, f, indent=2, sort_keys=True)
+    except OSError as err:
+        QgsMessageLog.logMessage(
+            "Failed to store the synchronized files state: {}".format(err),
+            "QFieldSync",
+            Qgis.Warning,
+        )
+
+
+class ConflictPolicy(Enum):
+    """Which copy of a file wins when both the local and the cloud one changed."""
+
+    # the same default as in the `CloudTransferDialog`, the most recently modified copy wins
+    Newer = "newer"
+    Local = "local"
+    Cloud = "cloud"
+
+
+def plan_file_transfers(
+    cloud_project: CloudProject,
+    files_to_sync: List[ProjectFile],
+    policy: ConflictPolicy = ConflictPolicy.Newer,
+    synced_hashes: Optional[Dict[str, str]] = None,
+) -> Dict[str, List[ProjectFile]]:
+    """Decides what to do with each file to sync without user interaction.
+
+    Mirrors the checkboxes of the `CloudTransferDialog`, e.g. preferring the local copy of a file that exists only on
+    the cloud deletes it from the cloud. Returns the files keyed by "to_upload", "to_download" and "to_delete".
+
+    If the `synced_hashes` from the last synchronization are passed, the files changed both locally and on the cloud
+    since then are not transferred at all, but returned as "conflicts" to be resolved by the user. With the `Newer`
+    policy, the copy that changed since then wins, the modification times are compared only for the files never
+    synchronized before.
+    """
+    files: Dict[str, List[ProjectFile]] = {
+        "to_upload": [],
+        "to_download": [],
+        "to_delete": [],
+        "conflicts": [],
+    }
+    is_local_enabled = cloud_project.user_role != "reader"
+
+    for project_file in files_to_sync:
+        has_local = project_file.local_path_exists
+        has_cloud = bool(project_file.checkout & ProjectFileCheckout.Cloud)
+
+        # whether the local copy changed since the last synchronization, `None` if unknown
+        is_local_changed: Optional[bool] = None
+
+        if synced_hashes is not None:
+            synced_hash = synced_hashes.get(project_file.name)
+            local_hash = project_file.local_sha256 if has_local else None
+            cloud_hash = project_file.sha256 if has_cloud else None
+
+            if local_hash != synced_hash and cloud_hash != synced_hash:
+                files["conflicts"].append(project_file)
+                continue
+
+            # a file never synchronized before has no base to tell which copy changed
+            if synced_hash is not None:
+                is_local_changed = local_hash != synced_hash
+
+        if policy == ConflictPolicy.Local and is_local_enabled:
+            prefer_local = True
+        elif policy == ConflictPolicy.Cloud:
+            prefer_local = False
+        elif is_local_changed is not None:
+            prefer_local = is_local_enabled and is_local_changed
+        else:
+            prefer_local = is_local_enabled and has_local
+            if prefer_local:
+                local_stat = project_file.local_stat
+                assert local_stat
+
+                cloud_updated_at = 0.0
+                if project_file.updated_at:
+                    # the server reports the times in UTC, `strptime` ignores the timezone name
+                    cloud_updated_at = (
+                        datetime.strptime(
+                            project_file.updated_at, "%d.%m.%Y %H:%M:%S %Z"
+                        )
+                        .replace(tzinfo=timezone.utc)
+                        .timestamp()
+                    )
+
+                prefer_local = local_stat.st_mtime > cloud_updated_at
+
+        if prefer_local:
+            if has_cloud and not has_local:
+                files["to_delete"].append(project_file)
+            else:
+                files["to_upload"].append(project_file)
+        elif has_cloud:
+            files["to_download"].append(project_file)
+        elif policy == ConflictPolicy.Cloud or is_local_changed is False:
+            # only the cloud copy changed since the last synchronization, i.e. it was deleted
+            files["to_delete"].append(project_file)
+
+    return files
+
+
+class SyncPlanner(QgsTask):
+    """Computes the files that differ between the local and the cloud copy of a project.
+
+    Flushing the GeoPackage WAL files, listing and hashing the local files is done by a pool of worker threads. The
+    result is cached on the `CloudProject` as long as the local files keep the same modification time and size.
+    """
+
+    # hashing is bound by the disk, more workers only add memory and seeks
+    MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+    def __init__(self, cloud_project: CloudProject) -> None:
+        super().__init__("Comparing local and QFieldCloud files", QgsTask.CanCancel)
+
+        self.cloud_project = cloud_project
+        self.files_to_sync: Optional[List[ProjectFile]] = None
+        # the hashes of the files that are the same locally and on the cloud, see `read_synced_hashes`
+        self.in_sync_hashes: Dict[str, str] = {}
+        self.error: Optional[Exception] = None
+        # files were added or removed since the cached result, e.g. within a subdirectory, which the directory watcher
+        # does not notice
+        self.is_local_files_changed = False
+
+        self._project_files = cloud_project.get_files()
+        self._local_files_snapshot: Dict[str, Tuple[int, int]] = {}
+
+        wal_checkpointer.update_open_database_paths()
+
+    def run(self) -> bool:
+        try:
+            with ThreadPoolExecutor(max_workers=SyncPlanner.MAX_WORKERS) as executor:
+                # the checkpoints change the GeoPackage files, so they are made before taking the snapshot
+                list(
+                    executor.map(
+                        lambda project_file: project_file.flush(), self._project_files
+                    )
+                )
+
+            # taken before the files are hashed, so a file modified meanwhile invalidates the result
+            self._local_files_snapshot = self.cloud_project.get_local_files_snapshot()
+        except Exception as err:
+            self.error = err
+            return False
+
+        if self.isCanceled():
+            return False
+
+        cached_files_to_sync = self.cloud_project.cached_files_to_sync
+        cached_snapshot = self.cloud_project.cached_files_to_sync_snapshot
+
+        if cached_files_to_sync is not None and cached_snapshot is not None:
+            if cached_snapshot == self._local_files_snapshot:
+                self.files_to_sync = cached_files_to_sync
+                self._collect_in_sync_hashes()
+                return True
+
+            self.is_local_files_changed = (
+                cached_snapshot.keys() != self._local_files_snapshot.keys()
+            )
+
+        files_total = len(self._project_files)
+        files_checked = 0
+        is_file_to_sync_results = []
+
+        try:
+            with ThreadPoolExecutor(max_workers=SyncPlanner.MAX_WORKERS) as executor:
+                # `map` keeps the order of the files, which is expected to be sorted by name
+                for is_file_to_sync in executor.map(
+                    self._is_file_to_sync, self._project_files
+                ):
+                    is_file_to_sync_results.append(is_file_to_sync)
+                    files_checked += 1
+
+                    progress = files_checked * 100 // files_total
+                    if progress != int(self.progress()):
+                        self.setProgress(progress)
+        except Exception as err:
+            self.error = err
+            return False
+
+        if self.isCanceled():
+            return False
+
+        self.files_to_sync = [
+            project_file
+            for project_file, is_file_to_sync in zip(
+                self._project_files, is_file_to_sync_results
+            )
+            if is_file_to_sync
+        ]
+        self._collect_in_sync_hashes()
+
+        return True
+
+    def _collect_in_sync_hashes(self) -> None:
+        assert self.files_to_sync is not None
+
+        filenames_to_sync = {project_file.name for project_file in self.files_to_sync}
+
+        # the local hashes are already computed while comparing the files, unless the files changed meanwhile
+        for project_file in self._project_files:
+            if project_file.name in filenames_to_sync or not project_file.sha256:
+                continue
+
+            if (
+                project_file.local_path_exists
+                and project_file.sha256 == project_file.local_sha256
+            ):
+                self.in_sync_hashes[project_file.name] = project_file.sha256
+
+    def finished(self, result: bool) -> None:
+        # the workers only updated the local stats, the files are moved between the checkout buckets here
+        self.cloud_project.apply_checkout_changes()
+
+        # the added files are listed for the next comparison, this result is not cached then
+        if self.is_local_files_changed:
+            self.cloud_project.refresh_files()
+
+        checkpoint_count, checkpoint_duration = wal_checkpointer.take_stats()
+        if checkpoint_count:
+            QgsMessageLog.logMessage(
+                "Checkpointed {} GeoPackage file(s) in {:.2f}s.".format(
+                    checkpoint_count, checkpoint_duration
+                ),
+                "QFieldSync",
+                Qgis.Info,
+            )
+
+        # the project files might have been refreshed while the task was running, then the result is outdated
+        if result and self.cloud_project.get_files() == self._project_files:
+            self.cloud_project.set_cached_files_to_sync(
+                self.files_to_sync, self._local_files_snapshot
+            )
+
+    def _is_file_to_sync(self, project_file: ProjectFile) -> bool:
+        # the remaining files are skipped as fast as possible once the task is canceled
+        if self.isCanceled():
+            return False
+
+        return CloudProject.is_file_to_sync(project_file)
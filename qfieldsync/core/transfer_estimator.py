@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, TypedDict
+
+from qgis.core import QgsMapLayer, QgsProject, QgsTask
+from qgis.PyQt.QtCore import QCoreApplication
+
+from qfieldsync.core.preferences import Preferences
+from qfieldsync.libqfieldsync.layer import LayerSource
+
+# rough size of a feature converted to a GeoPackage, used when the layer is not stored in a local file
+BYTES_PER_FEATURE = 1024
+# bytes per second, used until the first real measurement
+DEFAULT_THROUGHPUTS = {
+    "package": 20 * 1024 * 1024,
+    "convert": 20 * 1024 * 1024,
+    "upload": 1024 * 1024,
+    "download": 4 * 1024 * 1024,
+}
+# weight of the last measurement in the moving average
+THROUGHPUT_SMOOTHING = 0.3
+# shorter operations are dominated by fixed costs and are not representative
+MIN_MEASURED_SECONDS = 2.0
+
+
+class SizeEstimate(TypedDict):
+    layers_bytes: int
+    attachments_bytes: int
+    total_bytes: int
+
+
+class SizeEstimator(QgsTask):
+    """Estimates the bytes written when packaging or converting the project.
+
+    The layers are inspected on the main thread when the task is created, the files and the attachment directories
+    are measured by the task. Only the layers stored in local files and the memory layers are counted, asking a
+    database for its feature count might take long. The files are counted at their full size, the actual output
+    might be smaller when the layers are filtered by the area of interest.
+    """
+
+    def __init__(self, project: QgsProject, attachment_dirs: Iterable[str]) -> None:
+        super().__init__("Estimating the project size", QgsTask.CanCancel)
+
+        self.estimate: Optional[SizeEstimate] = None
+        self._memory_layers_bytes = 0
+        # multiple layers might be stored in the same file
+        self._layer_paths: Dict[str, None] = {}
+        self._attachment_paths: List[Path] = []
+
+        for layer in project.mapLayers().values():
+            layer_source = LayerSource(layer)
+
+            if not layer_source.is_supported or layer_source.is_localized_path:
+                continue
+
+            if layer_source.filename:
+                self._layer_paths[layer_source.filename] = None
+            elif (
+                layer.type() == QgsMapLayer.VectorLayer
+                and layer.isValid()
+                and layer.dataProvider().name() == "memory"
+            ):
+                self._memory_layers_bytes += (
+                    max(layer.featureCount(), 0) * BYTES_PER_FEATURE
+                )
+
+        if project.homePath():
+            self._attachment_paths = [
+                Path(project.homePath()).joinpath(attachment_dir)
+                for attachment_dir in attachment_dirs
+            ]
+
+    def run(self) -> bool:
+        layers_bytes = self._memory_layers_bytes
+
+        for filename in self._layer_paths:
+            if self.isCanceled():
+                return False
+
+            if os.path.isfile(filename):
+                layers_bytes += os.path.getsize(filename)
+
+        attachments_bytes = 0
+
+        for attachment_path in self._attachment_paths:
+            if self.isCanceled():
+                return False
+
+            attachments_bytes += get_path_size(attachment_path, self.isCanceled)
+
+        self.estimate = {
+            "layers_bytes": layers_bytes,
+            "attachments_bytes": attachments_bytes,
+            "total_bytes": layers_bytes + attachments_bytes,
+        }
+
+        return not self.isCanceled()
+
+
+def get_path_size(path: Path, is_canceled: Optional[Callable[[], bool]] = None) -> int:
+    """Returns the total size of the files within the path, or the size of the path if it is a file."""
+    try:
+        if path.is_file():
+            return path.stat().st_size
+    except OSError:
+        return 0
+
+    size = 0
+    dir_paths = [str(path)]
+
+    while dir_paths:
+        if is_canceled and is_canceled():
+            break
+
+        try:
+            with os.scandir(dir_paths.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dir_paths.append(entry.path)
+                    elif entry.is_file():
+                        size += entry.stat().st_size
+        except OSError:
+            continue
+
+    return size
+
+
+def get_throughput(kind: str) -> float:
+    """Returns the bytes per second measured in the recent operations of the given kind."""
+    throughputs: Dict[str, float] = Preferences().value("transferThroughputs")
+
+    return throughputs.get(kind) or DEFAULT_THROUGHPUTS[kind]
+
+
+def record_throughput(kind: str, bytes_count: int, seconds: float) -> None:
+    """Records the throughput of a finished operation, e.g. "upload", "download", "package" or "convert"."""
+    if seconds < MIN_MEASURED_SECONDS or bytes_count <= 0:
+        return
+
+    preferences = Preferences()
+    # never mutate the cached value in place
+    throughputs: Dict[str, float] = {**preferences.value("transferThroughputs")}
+    throughput = bytes_count / seconds
+
+    if throughputs.get(kind):
+        throughput = (
+            THROUGHPUT_SMOOTHING * throughput
+            + (1 - THROUGHPUT_SMOOTHING) * throughputs[kind]
+        )
+
+    throughputs[kind] = throughput
+    preferences.set_value_deferred("transferThroughputs", throughputs)
+
+
+def estimate_duration(kind: str, bytes_count: int) -> float:
+    """Returns the estimated seconds to process the given amount of bytes."""
+    return bytes_count / get_throughput(kind)
+
+
+def format_estimate(bytes_count: int, seconds: Optional[float] = None) -> str:
+    """Formats the estimated size and duration to be shown to the user, e.g. "~120 MB, ~2 min"."""
+    size = float(bytes_count)
+
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+
+        size /= 1024
+
+    text = "~{:.0f} {}".format(size, unit)
+
+    if seconds is not None:
+        if seconds < 60:
+            duration = QCoreApplication.translate("QFieldSync", "less than a minute")
+        elif seconds < 60 * 60:
+            duration = QCoreApplication.translate("QFieldSync", "~{} min").format(
+                round(seconds / 60)
+            )
+        else:
+            duration = QCoreApplication.translate("QFieldSync", "~{:.1f} h").format(
+                seconds / 60 / 60
+            )
+
+        text += ", " + duration
+
+    return text
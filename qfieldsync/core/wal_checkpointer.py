@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from qfieldsync.utils.qgis_utils import get_project_layer_paths
+
+
+class WalCheckpointer:
+    """Coordinates the checkpoints of the SQLite write-ahead log of the GeoPackage files.
+
+    A database is checkpointed only if its WAL file changed since the last checkpoint, and only by one thread at a
+    time. The `TRUNCATE` mode is used only for the databases that are not opened as a layer in QGIS, as it has to wait
+    for all the other connections to finish.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._database_locks: Dict[str, threading.Lock] = {}
+        # modification time and size of the WAL file right after the last checkpoint, per database path
+        self._checkpointed_wal_keys: Dict[str, Tuple[int, int]] = {}
+        # `None` until the open databases are known, then nothing is truncated
+        self._open_database_paths: Optional[Set[str]] = None
+        self._checkpoint_count = 0
+        self._checkpoint_duration = 0.0
+
+    def update_open_database_paths(self) -> None:
+        """Collects the databases opened as layers in the current project. Must be called from the main thread."""
+        open_database_paths = get_project_layer_paths()
+
+        with self._lock:
+            self._open_database_paths = open_database_paths
+
+    def checkpoint(self, database_path: str) -> bool:
+        """Checkpoints the WAL of the database if it changed since the last checkpoint.
+
+        Returns whether a complete checkpoint was made. A busy or partial checkpoint is retried on the next call.
+        """
+        database_key = os.path.normcase(str(Path(database_path)))
+
+        with self._lock:
+            database_lock = self._database_locks.setdefault(
+                database_key, threading.Lock()
+            )
+            truncate = (
+                self._open_database_paths is not None
+                and database_key not in self._open_database_paths
+            )
+
+        with database_lock:
+            wal_key = self._get_wal_key(database_path)
+
+            if wal_key is None or wal_key == self._checkpointed_wal_keys.get(
+                database_key
+            ):
+                return False
+
+            started_at = time.perf_counter()
+
+            conn = sqlite3.connect(database_path)
+            try:
+                with conn:
+                    busy, log_frames, checkpointed_frames = conn.execute(
+                        "PRAGMA wal_checkpoint(TRUNCATE)"
+                        if truncate
+                        else "PRAGMA wal_checkpoint"
+                    ).fetchone()
+            finally:
+                conn.close()
+
+            # another connection blocked the checkpoint, or kept some frames from being written to the database
+            if busy != 0 or checkpointed_frames != log_frames:
+                return False
+
+            self._checkpointed_wal_keys[database_key] = self._get_wal_key(
+                database_path
+            ) or (0, 0)
+
+            with self._lock:
+                self._checkpoint_count += 1
+                self._checkpoint_duration += time.perf_counter() - started_at
+
+        return True
+
+    def take_stats(self) -> Tuple[int, float]:
+        """Returns the number of checkpoints and the seconds spent on them since the last call."""
+        with self._lock:
+            stats = (self._checkpoint_count, self._checkpoint_duration)
+            self._checkpoint_count = 0
+            self._checkpoint_duration = 0.0
+
+        return stats
+
+    @staticmethod
+    def _get_wal_key(database_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            wal_stat = os.stat(database_path + "-wal")
+        except OSError:
+            return None
+
+        if wal_stat.st_size == 0:
+            return None
+
+        return (wal_stat.st_mtime_ns, wal_stat.st_size)
+
+
+# Modules are evaluated only once, therefore it works as a poor man version of singleton.
+wal_checkpointer = WalCheckpointer()
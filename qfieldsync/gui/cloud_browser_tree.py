@@ -21,7 +21,7 @@
 
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from qgis.core import (
     QgsDataCollectionItem,
@@ -74,15 +74,23 @@ class QFieldCloudRootItem(QgsDataCollectionItem):
         )
         self.network_manager = network_manager
         self.error = None
+        self._shown_projects = None
+        self._shown_projects_count = 0
 
         self.network_manager.login_finished.connect(lambda: self.update_icon())
         self.network_manager.token_changed.connect(lambda: self.update_icon())
+        self.network_manager.projects_cache.projects_page_received.connect(
+            lambda _projects: self.refreshing_cloud_projects()
+        )
         self.network_manager.projects_cache.projects_updated.connect(
             lambda: self.refreshing_cloud_projects()
         )
+        self.network_manager.projects_cache.projects_error.connect(
+            lambda error: self.on_projects_error(error)
+        )
 
     def capabilities2(self):
-        return QgsDataItem.Fast
+        return QgsDataItem.Fast | QgsDataItem.Fertile
 
     def createChildren(self):
         items = []
@@ -115,6 +123,31 @@ class QFieldCloudRootItem(QgsDataCollectionItem):
         return items
 
     def refreshing_cloud_projects(self):
+        projects = self.network_manager.projects_cache.received_projects
+
+        # the received pages become the cached projects after the last page, so they might be already shown
+        if (
+            projects is not None
+            and projects is self._shown_projects
+            and len(projects) == self._shown_projects_count
+        ):
+            return
+
+        self._shown_projects = projects
+        self._shown_projects_count = len(projects) if projects is not None else 0
+        self.error = None
+        self.depopulate()
+        self.refresh()
+
+    def on_projects_error(self, error: str) -> None:
+        # keep showing the cached projects instead of the received pages, only report the error if there is nothing to show
+        if self.network_manager.projects_cache.projects is not None:
+            self.refreshing_cloud_projects()
+            return
+
+        self.error = error
+        self._shown_projects = None
+        self._shown_projects_count = 0
         self.depopulate()
         self.refresh()
 
@@ -144,30 +177,41 @@ class QFieldCloudGroupItem(QgsDataCollectionItem):
         self.setIcon(QIcon(os.path.join(os.path.dirname(__file__), icon)))
         self.setSortKey(order)
 
+    def capabilities2(self):
+        return QgsDataItem.Fast | QgsDataItem.Fertile
+
     def createChildren(self):
         items = []
 
-        projects: List[CloudProject] = self.network_manager.projects_cache.projects
+        projects_cache = self.network_manager.projects_cache
+        projects: Optional[List[CloudProject]] = projects_cache.received_projects
 
+        # the children are created as soon as the projects cache emits `projects_page_received`,
+        # which makes the root item to repopulate, so never block the browser here
         if projects is None:
-            try:
-                # TODO try to be make it Fast Fertile
-                self.network_manager.projects_cache.refresh_not_async()
-            except Exception:
-                return []
-
-            projects = self.network_manager.projects_cache.projects
-
-        for project in self.network_manager.projects_cache.projects:
-            if (self.project_type == "public" and not project.is_private) or (
-                self.project_type == "private" and project.is_private
-            ):
-                item = QFieldCloudProjectItem(self, project)
-                item.setState(QgsDataItem.Populated)
+            if not projects_cache.is_refreshing:
+                projects_cache.refresh()
+
+            return []
+
+        for project in projects:
+            item = self.create_project_item(project)
+
+            if item:
                 items.append(item)
 
         return items
 
+    def create_project_item(self, project: CloudProject) -> Optional[QgsDataItem]:
+        if (self.project_type == "public" and not project.is_private) or (
+            self.project_type == "private" and project.is_private
+        ):
+            item = QFieldCloudProjectItem(self, project)
+            item.setState(QgsDataItem.Populated)
+            return item
+
+        return None
+
 
 class QFieldCloudProjectItem(QgsDataItem):
     """QFieldCloud project item."""
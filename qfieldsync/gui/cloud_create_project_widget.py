@@ -22,13 +22,15 @@
 """
 
 import os
+import time
 from pathlib import Path
 from typing import Optional
 
-from qgis.core import Qgis, QgsProject
+from qgis.core import Qgis, QgsApplication, QgsProject
 from qgis.gui import QgisInterface
-from qgis.PyQt.QtCore import QDir, QRegularExpression, Qt, QTimer, pyqtSignal
+from qgis.PyQt.QtCore import QDir, QRegularExpression, Qt, pyqtSignal
 from qgis.PyQt.QtGui import QIcon, QRegularExpressionValidator
+from qgis.PyQt.QtNetwork import QNetworkReply
 from qgis.PyQt.QtWidgets import (
     QAction,
     QApplication,
@@ -44,6 +46,12 @@ from qfieldsync.core.cloud_converter import CloudConverter
 from qfieldsync.core.cloud_project import CloudProject
 from qfieldsync.core.cloud_transferrer import CloudTransferrer
 from qfieldsync.core.preferences import Preferences
+from qfieldsync.core.transfer_estimator import (
+    SizeEstimator,
+    estimate_duration,
+    format_estimate,
+    record_throughput,
+)
 from qfieldsync.gui.cloud_login_dialog import CloudLoginDialog
 from qfieldsync.libqfieldsync.layer import LayerSource
 from qfieldsync.libqfieldsync.utils.file_utils import (
@@ -84,9 +92,11 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
         self.qfield_preferences = Preferences()
         self.network_manager = network_manager
         self.cloud_transferrer: Optional[CloudTransferrer] = None
-
-        # keep a timer reference
-        self.timer = QTimer(self)
+        self.cloud_converter: Optional[CloudConverter] = None
+        self.create_project_reply: Optional[QNetworkReply] = None
+        self.estimated_bytes = 0
+        self.size_estimator: Optional[SizeEstimator] = None
+        self.convert_started_at = 0.0
 
         if not self.network_manager.has_token():
             CloudLoginDialog.show_auth_dialog(
@@ -96,6 +106,9 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
             self.network_manager.projects_cache.refresh()
 
         self.cancelButton.clicked.connect(self.on_cancel_button_clicked)
+        self.progressCancelButton.clicked.connect(
+            self.on_progress_cancel_button_clicked
+        )
         self.nextButton.clicked.connect(self.on_next_button_clicked)
         self.backButton.clicked.connect(self.on_back_button_clicked)
         self.createButton.clicked.connect(self.on_create_button_clicked)
@@ -142,7 +155,11 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
                 )
                 return
 
-        if get_qgis_files_within_dir(self.dirnameLineEdit.text()):
+        export_dirname = self.dirnameLineEdit.text()
+        # a previous conversion into the same directory is updated in place
+        if get_qgis_files_within_dir(
+            export_dirname
+        ) and not CloudConverter.has_manifest(export_dirname):
             QMessageBox.warning(
                 None,
                 self.tr("Warning"),
@@ -152,9 +169,11 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
             )
             return
 
-        QApplication.setOverrideCursor(Qt.WaitCursor)
+        # QGIS stays usable while converting, therefore not `Qt.WaitCursor`
+        QApplication.setOverrideCursor(Qt.BusyCursor)
 
         self.stackedWidget.setCurrentWidget(self.progressPage)
+        self.progressCancelButton.setEnabled(True)
         self.convertProgressBar.setVisible(True)
         self.convertLabel.setVisible(True)
         self.uploadLabel.setText(self.tr("Uploading project"))
@@ -163,31 +182,46 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
             self.project.setTitle(self.get_cloud_project_name())
             self.project.setDirty()
 
-        cloud_convertor = CloudConverter(self.project, self.dirnameLineEdit.text())
+        self.cloud_converter = CloudConverter(self.project, self.dirnameLineEdit.text())
 
-        cloud_convertor.warning.connect(self.on_show_warning)
-        cloud_convertor.total_progress_updated.connect(self.on_update_total_progressbar)
+        self.cloud_converter.warning.connect(self.on_show_warning)
+        self.cloud_converter.total_progress_updated.connect(
+            self.on_update_total_progressbar
+        )
+        self.cloud_converter.finished.connect(self.on_convert_finished)
+        self.convert_started_at = time.monotonic()
+        self.cloud_converter.start()
 
-        def convert():
-            try:
-                cloud_convertor.convert()
-            except Exception:
-                QApplication.restoreOverrideCursor()
-                critical_message = self.tr(
-                    "The project could not be converted into the export directory."
-                )
-                self.iface.messageBar().pushMessage(critical_message, Qgis.Critical, 0)
-                self.close()
-                return
+    def on_convert_finished(self) -> None:
+        assert self.cloud_converter
 
-            self.create_cloud_project()
+        cloud_converter = self.cloud_converter
+        self.cloud_converter = None
 
-        self.timer.singleShot(1, convert)
+        if cloud_converter.is_canceled:
+            self.on_progress_canceled()
+            return
+
+        if cloud_converter.error_message is not None:
+            QApplication.restoreOverrideCursor()
+            critical_message = self.tr(
+                "The project could not be converted into the export directory."
+            )
+            self.iface.messageBar().pushMessage(critical_message, Qgis.Critical, 0)
+            self.close()
+            return
+
+        record_throughput(
+            "convert", self.estimated_bytes, time.monotonic() - self.convert_started_at
+        )
+
+        self.create_cloud_project()
 
     def get_cloud_project_name(self) -> str:
         return self.projectNameLineEdit.text()
 
     def create_empty_cloud_project(self):
+        self.progressCancelButton.setEnabled(True)
         self.convertProgressBar.setVisible(False)
         self.convertLabel.setVisible(False)
         self.uploadLabel.setText(self.tr("Creating project"))
@@ -212,8 +246,15 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
             True,
         )
         reply.finished.connect(lambda: self.on_create_project_finished(reply))
+        self.create_project_reply = reply
 
     def on_create_project_finished(self, reply):
+        self.create_project_reply = None
+
+        if reply.error() == QNetworkReply.OperationCanceledError:
+            self.on_progress_canceled()
+            return
+
         try:
             payload = self.network_manager.json_object(reply)
         except CloudException as err:
@@ -337,6 +378,10 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
         self.uploadProgressBar.setValue(int(fraction * 100))
 
     def on_transferrer_finished(self):
+        # the canceled upload is already handled
+        if self.cloud_transferrer.is_aborted:
+            return
+
         result_message = self.tr(
             "Finished uploading the project to QFieldCloud, you are now viewing the locally stored copy."
         )
@@ -350,6 +395,30 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
     def on_cancel_button_clicked(self):
         self.canceled.emit()
 
+    def on_progress_cancel_button_clicked(self) -> None:
+        self.progressCancelButton.setEnabled(False)
+
+        if self.cloud_converter:
+            self.cloud_converter.cancel()
+        elif self.create_project_reply:
+            self.create_project_reply.abort()
+        elif self.cloud_transferrer and not self.cloud_transferrer.is_aborted:
+            self.cloud_transferrer.abort_requests()
+
+            # the project already exists on QFieldCloud, the remaining files are uploaded on the next synchronization
+            self.iface.messageBar().pushMessage(
+                self.tr(
+                    "The upload was canceled, synchronize the project to upload the remaining files."
+                ),
+                Qgis.Warning,
+                0,
+            )
+            self.after_project_creation_action(self.cloud_transferrer.cloud_project.id)
+
+    def on_progress_canceled(self) -> None:
+        QApplication.restoreOverrideCursor()
+        self.stackedWidget.setCurrentWidget(self.projectDetailsPage)
+
     def on_next_button_clicked(self) -> None:
         project_name = self.get_unique_project_name(self.project)
 
@@ -371,12 +440,58 @@ class CloudCreateProjectWidget(QWidget, WidgetUi):
 
             self.createButton.setEnabled(True)
             self.set_dirname(str(export_dirname))
+            self.update_estimate()
         elif self.createCloudRadioButton.isChecked():
             if self.project.fileName():
                 self.set_dirname(str(Path(self.project.fileName()).parent))
 
+            if self.size_estimator:
+                self.size_estimator.cancel()
+                self.size_estimator = None
+
+            self.estimateLabel.setVisible(False)
+
         self.update_info_visibility()
 
+    def update_estimate(self):
+        if self.size_estimator:
+            self.size_estimator.cancel()
+
+        self.estimateLabel.setText(self.tr("Estimating upload size…"))
+        self.estimateLabel.setVisible(True)
+
+        # walking the attachment directories might take a while
+        size_estimator = SizeEstimator(
+            self.project, self.qfield_preferences.value("attachmentDirs")
+        )
+        size_estimator.taskCompleted.connect(
+            lambda: self.on_size_estimated(size_estimator)
+        )
+        self.size_estimator = size_estimator
+
+        QgsApplication.taskManager().addTask(size_estimator)
+
+    def on_size_estimated(self, size_estimator: SizeEstimator) -> None:
+        # a newer estimate was started meanwhile
+        if size_estimator is not self.size_estimator:
+            return
+
+        assert size_estimator.estimate
+
+        self.size_estimator = None
+        self.estimated_bytes = size_estimator.estimate["total_bytes"]
+        # the converted project is uploaded as a whole
+        duration = estimate_duration(
+            "convert", self.estimated_bytes
+        ) + estimate_duration("upload", self.estimated_bytes)
+
+        self.estimateLabel.setText(
+            self.tr("Estimated upload size and duration: {}").format(
+                format_estimate(self.estimated_bytes, duration)
+            )
+        )
+        self.estimateLabel.setVisible(True)
+
     def on_back_button_clicked(self):
         self.stackedWidget.setCurrentWidget(self.selectTypePage)
 
@@ -22,7 +22,7 @@
 """
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from qgis.core import Qgis, QgsApplication, QgsProject
 from qgis.PyQt.QtCore import (
@@ -117,6 +117,8 @@ class CloudProjectsDialog(QDialog, CloudProjectsDialogUi):
         self._suggest_upload_files = False
         self.transfer_dialog = None
         self.project_transfer = None
+        self._shown_projects = None
+        self._shown_projects_count = 0
 
         self.update_welcome_label()
 
@@ -240,6 +242,9 @@ class CloudProjectsDialog(QDialog, CloudProjectsDialogUi):
         self.network_manager.projects_cache.projects_error.connect(
             lambda err: self.on_projects_cached_projects_error(err)
         )
+        self.network_manager.projects_cache.projects_page_received.connect(
+            lambda projects: self.on_projects_cached_projects_page_received(projects)
+        )
         self.network_manager.projects_cache.projects_updated.connect(
             lambda: self.on_projects_cached_projects_updated()
         )
@@ -311,12 +316,42 @@ class CloudProjectsDialog(QDialog, CloudProjectsDialogUi):
 
     def on_projects_cached_projects_error(self, error: str) -> None:
         self.projectsStack.setEnabled(True)
+
+        # the received pages of the failed refresh are dropped, show the still cached projects instead
+        projects = self.network_manager.projects_cache.projects
+        if projects is not None and projects is not self._shown_projects:
+            self.show_projects()
+
         self.set_feedback(error)
 
+    def on_projects_cached_projects_page_received(
+        self, _projects: List[CloudProject]
+    ) -> None:
+        self.projectsStack.setEnabled(True)
+
+        received_projects = self.network_manager.projects_cache.received_projects
+
+        # the first page of a refresh replaces the shown rows, the next pages are appended
+        if received_projects is not self._shown_projects:
+            self.projectsTable.setRowCount(0)
+            self.projectsTable.setEnabled(True)
+            self._shown_projects = received_projects
+            self._shown_projects_count = 0
+
+        self.show_projects_page()
+
     def on_projects_cached_projects_updated(self) -> None:
         self.projectsStack.setEnabled(True)
         self.projects_refreshed.emit()
-        self.show_projects()
+
+        projects = self.network_manager.projects_cache.projects
+
+        # the pages were already shown while received, only append the rows not shown yet
+        if projects is not None and projects is self._shown_projects:
+            self.set_feedback(None)
+            self.show_projects_page()
+        else:
+            self.show_projects()
 
     def on_projects_cached_project_files_started(self, project_id: str) -> None:
         self.projectFilesTab.setEnabled(False)
@@ -546,6 +581,8 @@ class CloudProjectsDialog(QDialog, CloudProjectsDialogUi):
 
         self.projectsTable.setRowCount(0)
         self.projectsTable.setSortingEnabled(False)
+        self._shown_projects = None
+        self._shown_projects_count = 0
 
         if self.network_manager.projects_cache.projects is None:
             self.network_manager.projects_cache.refresh()
@@ -560,81 +597,98 @@ class CloudProjectsDialog(QDialog, CloudProjectsDialogUi):
 
         self.projectsTable.setEnabled(True)
 
-        for cloud_project in self.network_manager.projects_cache.projects:
-            if (
-                self.projectsType.currentIndex() != 1
-                and cloud_project.user_role_origin == "public"
-            ) or (
-                self.projectsType.currentIndex() == 1
-                and cloud_project.user_role_origin != "public"
-            ):
-                continue
-
-            count = self.projectsTable.rowCount()
-            self.projectsTable.insertRow(count)
+        self._shown_projects = self.network_manager.projects_cache.projects
+        self.show_projects_page()
 
-            item = QTableWidgetItem(cloud_project.name)
-
-            if cloud_project.status == "ok":
-                color = QColor("#87af87")
-            elif cloud_project.status == "busy":
-                color = QColor("#9e6a03")
-            elif cloud_project.status == "failed":
-                color = QColor("#dc3545")
-            else:
-                raise NotImplementedError()
-
-            pm = QPixmap(40, 20)
-            pm.fill(Qt.transparent)
-            painter = QPainter(pm)
-            painter.setPen(QPen(color, 8, Qt.SolidLine))
-            painter.setBrush(QBrush(color, Qt.SolidPattern))
-            painter.drawEllipse(30, 10, 5, 5)
-            icon = QIcon(
-                str(
-                    Path(__file__).parent.joinpath(
-                        "../resources/cloud_project.svg"
-                        if cloud_project.local_dir
-                        else "../resources/cloud_project_remote.svg"
-                    )
-                )
-            )
-            painter.drawPixmap(0, 0, icon.pixmap(pm.size()))
-            del painter
-
-            item.setData(Qt.UserRole, cloud_project)
-            item.setData(Qt.EditRole, cloud_project.name)
-            item.setData(
-                Qt.DecorationRole,
-                pm,
-            )
+    def show_projects_page(self) -> None:
+        """Appends the projects that are not yet shown in the projects table, e.g. the last received page."""
+        assert self._shown_projects is not None
 
-            tooltip = self.tr("Cloud status: {}. \nLocal status: ").format(
-                cloud_project.status
-            )
-
-            if bool(cloud_project.local_dir):
-                tooltip += self.tr('Project stored at "{}".').format(
-                    str(cloud_project.local_dir)
-                )
-            else:
-                tooltip += self.tr("No local dir configured.")
+        self.projectsTable.setSortingEnabled(False)
 
-            item.setToolTip(tooltip)
+        first_new_idx = self._shown_projects_count
+        for cloud_project in self._shown_projects[first_new_idx:]:
+            self.add_project_row(cloud_project)
 
-            self.projectsTable.setItem(count, 0, item)
-            self.projectsTable.setItem(count, 1, QTableWidgetItem(cloud_project.owner))
+        self._shown_projects_count = len(self._shown_projects)
 
         self.projectsTable.sortByColumn(1, Qt.AscendingOrder)
         self.projectsTable.sortByColumn(0, Qt.AscendingOrder)
         self.projectsTable.setSortingEnabled(True)
         self.update_project_table_selection()
 
-        if self._suggest_upload_files:
+        # wait for the last page, the project might be on any of them
+        is_refreshing = self.network_manager.projects_cache.is_refreshing
+        if self._suggest_upload_files and not is_refreshing:
             self._suggest_upload_files = False
 
             self.sync()
 
+    def add_project_row(self, cloud_project: CloudProject) -> None:
+        if (
+            self.projectsType.currentIndex() != 1
+            and cloud_project.user_role_origin == "public"
+        ) or (
+            self.projectsType.currentIndex() == 1
+            and cloud_project.user_role_origin != "public"
+        ):
+            return
+
+        count = self.projectsTable.rowCount()
+        self.projectsTable.insertRow(count)
+
+        item = QTableWidgetItem(cloud_project.name)
+
+        if cloud_project.status == "ok":
+            color = QColor("#87af87")
+        elif cloud_project.status == "busy":
+            color = QColor("#9e6a03")
+        elif cloud_project.status == "failed":
+            color = QColor("#dc3545")
+        else:
+            raise NotImplementedError()
+
+        pm = QPixmap(40, 20)
+        pm.fill(Qt.transparent)
+        painter = QPainter(pm)
+        painter.setPen(QPen(color, 8, Qt.SolidLine))
+        painter.setBrush(QBrush(color, Qt.SolidPattern))
+        painter.drawEllipse(30, 10, 5, 5)
+        icon = QIcon(
+            str(
+                Path(__file__).parent.joinpath(
+                    "../resources/cloud_project.svg"
+                    if cloud_project.local_dir
+                    else "../resources/cloud_project_remote.svg"
+                )
+            )
+        )
+        painter.drawPixmap(0, 0, icon.pixmap(pm.size()))
+        del painter
+
+        item.setData(Qt.UserRole, cloud_project)
+        item.setData(Qt.EditRole, cloud_project.name)
+        item.setData(
+            Qt.DecorationRole,
+            pm,
+        )
+
+        tooltip = self.tr("Cloud status: {}. \nLocal status: ").format(
+            cloud_project.status
+        )
+
+        if bool(cloud_project.local_dir):
+            tooltip += self.tr('Project stored at "{}".').format(
+                str(cloud_project.local_dir)
+            )
+        else:
+            tooltip += self.tr("No local dir configured.")
+
+        item.setToolTip(tooltip)
+
+        self.projectsTable.setItem(count, 0, item)
+        self.projectsTable.setItem(count, 1, QTableWidgetItem(cloud_project.owner))
+
     def sync(self) -> None:
         assert self.current_cloud_project is not None
         self.show_sync_popup()
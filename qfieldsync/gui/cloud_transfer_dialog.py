@@ -24,9 +24,9 @@ import os
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional
 
-from qgis.core import QgsProject
+from qgis.core import QgsApplication, QgsProject
 from qgis.PyQt.QtCore import QDir, Qt, QUrl, pyqtSignal
 from qgis.PyQt.QtGui import QDesktopServices, QShowEvent
 from qgis.PyQt.QtWidgets import (
@@ -47,6 +47,8 @@ from qfieldsync.core.cloud_api import CloudNetworkAccessManager
 from qfieldsync.core.cloud_project import CloudProject, ProjectFile, ProjectFileCheckout
 from qfieldsync.core.cloud_transferrer import CloudTransferrer, TransferFileLogsModel
 from qfieldsync.core.preferences import Preferences
+from qfieldsync.core.sync_lock import sync_lock
+from qfieldsync.core.sync_planner import SyncPlanner
 from qfieldsync.libqfieldsync.project_checker import ProjectChecker
 from qfieldsync.libqfieldsync.utils.file_utils import get_unique_empty_dirname
 from qfieldsync.libqfieldsync.utils.qgis import get_qgis_files_within_dir
@@ -116,6 +118,7 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
         self.network_manager = network_manager
         self.cloud_project = cloud_project
         self.project_transfer = None
+        self.sync_planner: Optional[SyncPlanner] = None
         self.is_project_download = False
 
         self.filesTree.header().setSectionResizeMode(0, QHeaderView.ResizeToContents)
@@ -160,6 +163,9 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
         self.preferLocalButton.clicked.connect(self._on_prefer_local_button_clicked)
         self.preferCloudButton.clicked.connect(self._on_prefer_cloud_button_clicked)
 
+        self.rejected.connect(self._cancel_sync_planner)
+        self.finished.connect(lambda _result: self._release_sync_lock())
+
     def showEvent(self, event: QShowEvent) -> None:
         self.buttonBox.button(QDialogButtonBox.Cancel).setVisible(True)
 
@@ -184,8 +190,20 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
             if (
                 self.network_manager.projects_cache.is_currently_open_project_cloud_local
             ):
-                reply = self.network_manager.projects_cache.refresh()
-                reply.finished.connect(lambda: self.show_project_compatibility_page())
+                self.network_manager.projects_cache.projects_updated.connect(
+                    self._on_projects_cache_projects_updated
+                )
+                self.network_manager.projects_cache.refresh()
+
+    def _on_projects_cache_projects_updated(self) -> None:
+        # the currently open project might be on any page, so wait for the last one
+        if self.network_manager.projects_cache.is_refreshing:
+            return
+
+        self.network_manager.projects_cache.projects_updated.disconnect(
+            self._on_projects_cache_projects_updated
+        )
+        self.show_project_compatibility_page()
 
     def show_project_local_dir_selection(self):
         assert self.cloud_project
@@ -235,6 +253,8 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
         self.buttonBox.button(QDialogButtonBox.Apply).setVisible(False)
         self.projectFilesLabel.setVisible(True)
         self.projectFilesProgressBar.setVisible(True)
+        # busy indicator until the file list is fetched
+        self.projectFilesProgressBar.setMaximum(0)
 
         if (
             not self.cloud_project
@@ -316,7 +336,72 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
             self.openProjectCheck.setVisible(False)
             return
 
-        if len(list(self.cloud_project.files_to_sync)) == 0:
+        # the automatic synchronization must not replace the files while the user picks what to keep
+        if not sync_lock.acquire(self.cloud_project.id, self):
+            self.show_end_page(
+                self.tr(
+                    "The project is being synchronized in the background, please try again in a moment."
+                )
+            )
+            self.openProjectCheck.setChecked(False)
+            self.openProjectCheck.setVisible(False)
+            return
+
+        self._cancel_sync_planner()
+
+        self.projectFilesProgressBar.setMaximum(100)
+        self.projectFilesProgressBar.setValue(0)
+
+        self.sync_planner = SyncPlanner(self.cloud_project)
+        self.sync_planner.progressChanged.connect(
+            lambda progress: self.projectFilesProgressBar.setValue(int(progress))
+        )
+        self.sync_planner.taskCompleted.connect(self._on_sync_planner_completed)
+        self.sync_planner.taskTerminated.connect(self._on_sync_planner_terminated)
+
+        QgsApplication.taskManager().addTask(self.sync_planner)
+
+    def _release_sync_lock(self) -> None:
+        if not self.cloud_project:
+            return
+
+        # the transfer goes on after the dialog is closed, then the lock is released once it is finished
+        if self.project_transfer and self.project_transfer.is_started:
+            return
+
+        sync_lock.release(self.cloud_project.id, self)
+
+    def _cancel_sync_planner(self) -> None:
+        if self.sync_planner:
+            self.sync_planner.cancel()
+            self.sync_planner = None
+
+    def _on_sync_planner_terminated(self) -> None:
+        # ignore the planners that were canceled meanwhile
+        if self.sync_planner is None or self.sender() is not self.sync_planner:
+            return
+
+        sync_planner = self.sync_planner
+        self.sync_planner = None
+
+        self.show_end_page(
+            self.tr("Failed to compare the local and the QFieldCloud project files.")
+            + (f" {sync_planner.error}" if sync_planner.error else "")
+        )
+        self.openProjectCheck.setChecked(False)
+        self.openProjectCheck.setVisible(False)
+
+    def _on_sync_planner_completed(self) -> None:
+        if self.sync_planner is None or self.sender() is not self.sync_planner:
+            return
+
+        assert self.cloud_project
+        assert self.sync_planner.files_to_sync is not None
+
+        files_to_sync = self.sync_planner.files_to_sync
+        self.sync_planner = None
+
+        if len(files_to_sync) == 0:
             files_total = len(self.cloud_project.get_files())
             if files_total > 0:
                 self.show_end_page(
@@ -353,7 +438,7 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
 
         self.explanationLabel.setVisible(False)
 
-        self.build_files_tree()
+        self.build_files_tree(files_to_sync)
         if self.is_project_download:
             self._file_tree_set_checkboxes(ProjectFileCheckout.Cloud)
             self._start_synchronization()
@@ -403,7 +488,7 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
                     )
                 )
 
-    def build_files_tree(self):
+    def build_files_tree(self, files_to_sync: List[ProjectFile]):
         assert self.project_transfer
 
         # NOTE algorithmic part
@@ -415,7 +500,7 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
         # ##########
         stack = []
 
-        for project_file in self.project_transfer.cloud_project.files_to_sync:
+        for project_file in files_to_sync:
             parts = tuple(project_file.path.parts)
             for part_idx, part in enumerate(parts):
                 if len(stack) > part_idx and stack[part_idx][0] == part:
@@ -673,6 +758,9 @@ class CloudTransferDialog(QDialog, CloudTransferDialogUi):
 
     def on_transfer_finished(self) -> None:
         assert self.project_transfer
+        assert self.cloud_project
+
+        sync_lock.release(self.cloud_project.id, self)
 
         self.show_end_page(
             self.tr("Transfer finished."),
@@ -21,17 +21,27 @@
  ***************************************************************************/
 """
 import os
+import time
+from typing import Optional
 
-from qgis.core import Qgis, QgsApplication, QgsProject
+from qgis.core import Qgis, QgsApplication, QgsMessageLog, QgsProject
 from qgis.PyQt.QtCore import QDir, Qt, QUrl
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QApplication, QDialog, QDialogButtonBox, QMessageBox
 from qgis.PyQt.uic import loadUiType
 
+from qfieldsync.core.package_cache import PackageCache
+from qfieldsync.core.package_task import PackageTask, ProjectPackager
 from qfieldsync.core.preferences import Preferences
+from qfieldsync.core.transfer_estimator import (
+    SizeEstimator,
+    estimate_duration,
+    format_estimate,
+    record_throughput,
+)
 from qfieldsync.gui.dirs_to_copy_widget import DirsToCopyWidget
 from qfieldsync.gui.project_configuration_dialog import ProjectConfigurationDialog
-from qfieldsync.libqfieldsync import LayerSource, OfflineConverter, ProjectConfiguration
+from qfieldsync.libqfieldsync import LayerSource, ProjectConfiguration
 from qfieldsync.libqfieldsync.project_checker import ProjectChecker
 from qfieldsync.libqfieldsync.utils.file_utils import fileparts
 from qfieldsync.libqfieldsync.utils.qgis import get_project_title
@@ -75,6 +85,10 @@ class PackageDialog(QDialog, DialogUi):
         )
 
         self.devices = None
+        self.estimated_bytes = 0
+        self.size_estimator: Optional[SizeEstimator] = None
+        self.package_task: Optional[PackageTask] = None
+        self.package_started_at = 0.0
         self.project_checker = ProjectChecker(QgsProject.instance())
         # self.refresh_devices()
         self.setup_gui()
@@ -96,6 +110,7 @@ class PackageDialog(QDialog, DialogUi):
 
         self.manualDir.setText(QDir.toNativeSeparators(str(export_dirname)))
         self.manualDir_btn.clicked.connect(make_folder_selector(self.manualDir))
+        self.zipCheckBox.setChecked(self.qfield_preferences.value("exportZip"))
         self.update_info_visibility()
 
         self.nextButton.clicked.connect(lambda: self.show_package_page())
@@ -126,12 +141,74 @@ class PackageDialog(QDialog, DialogUi):
         # manual
         return self.manualDir.text()
 
+    def get_zip_path(self) -> Optional[str]:
+        """Get the path of the ZIP archive next to the export folder, or `None` if no archive is requested"""
+        if not self.zipCheckBox.isChecked():
+            return None
+
+        return self.get_export_folder_from_dialog().rstrip("/\\") + ".zip"
+
     def show_package_page(self):
         self.nextButton.setVisible(False)
         self.button_box.setVisible(True)
         self.stackedWidget.setCurrentWidget(self.packagePage)
+        self.update_estimate()
+
+    def update_estimate(self):
+        if self.size_estimator:
+            self.size_estimator.cancel()
+
+        self.estimateLabel.setText(self.tr("Estimating package size…"))
+
+        # walking the attachment directories might take a while
+        size_estimator = SizeEstimator(
+            self.project, self.qfield_preferences.value("attachmentDirs")
+        )
+        size_estimator.taskCompleted.connect(
+            lambda: self.on_size_estimated(size_estimator)
+        )
+        self.size_estimator = size_estimator
+
+        QgsApplication.taskManager().addTask(size_estimator)
+
+    def on_size_estimated(self, size_estimator: SizeEstimator) -> None:
+        # a newer estimate was started meanwhile
+        if size_estimator is not self.size_estimator:
+            return
+
+        assert size_estimator.estimate
+
+        self.size_estimator = None
+        self.estimated_bytes = size_estimator.estimate["total_bytes"]
+        self.estimateLabel.setText(
+            self.tr("Estimated package size and duration: {}").format(
+                format_estimate(
+                    self.estimated_bytes,
+                    estimate_duration("package", self.estimated_bytes),
+                )
+            )
+        )
 
     def package_project(self):
+        # the cached packages are keyed by the project file, make sure it is up to date
+        if self.project.isDirty() or not self.project.fileName():
+            answer = QMessageBox.question(
+                self,
+                self.tr("Unsaved changes"),
+                self.tr(
+                    "The project has to be saved before packaging. Save the project now?"
+                ),
+                QMessageBox.Save | QMessageBox.Cancel,
+            )
+
+            if answer != QMessageBox.Save:
+                return
+
+            self.iface.actionSaveProject().trigger()
+
+            if self.project.isDirty() or not self.project.fileName():
+                return
+
         self.button_box.button(QDialogButtonBox.Save).setEnabled(False)
 
         export_folder = self.get_export_folder_from_dialog()
@@ -147,45 +224,134 @@ class PackageDialog(QDialog, DialogUi):
         )
 
         self.qfield_preferences.set_value("exportDirectoryProject", export_folder)
+        self.qfield_preferences.set_value("exportZip", self.zipCheckBox.isChecked())
         self.dirsToCopyWidget.save_settings()
 
-        offline_convertor = OfflineConverter(
+        attachment_dirs = self.qfield_preferences.value("attachmentDirs")
+        dirs_to_copy = self.dirsToCopyWidget.dirs_to_copy()
+        project_packager = ProjectPackager(
             self.project,
-            export_folder,
             area_of_interest,
             area_of_interest_crs,
-            self.qfield_preferences.value("attachmentDirs"),
+            attachment_dirs,
             self.offline_editing,
-            dirs_to_copy=self.dirsToCopyWidget.dirs_to_copy(),
+            dirs_to_copy=dirs_to_copy,
+            base_map_format=self.qfield_preferences.value("baseMapFormat"),
         )
 
         # progress connections
-        offline_convertor.total_progress_updated.connect(self.update_total)
-        offline_convertor.task_progress_updated.connect(self.update_task)
-        offline_convertor.warning.connect(
+        project_packager.total_progress_updated.connect(self.update_total)
+        project_packager.task_progress_updated.connect(self.update_task)
+        project_packager.warning.connect(
             lambda title, body: QMessageBox.warning(None, title, body)
         )
 
+        self.package_started_at = time.monotonic()
+
+        # libqfieldsync converts `QgsProject.instance()` in place, so the conversion blocks QGIS and cannot be canceled,
+        # only rendering the base map and writing the package are left to the task
         try:
             QApplication.setOverrideCursor(Qt.WaitCursor)
-            offline_convertor.convert()
-            self.do_post_offline_convert_action(True)
+            self.package_task = project_packager.package(
+                export_folder,
+                cache_key=PackageCache.get_key(
+                    self.project,
+                    area_of_interest,
+                    area_of_interest_crs,
+                    attachment_dirs,
+                    dirs_to_copy,
+                ),
+                zip_path=self.get_zip_path(),
+            )
         except Exception as err:
+            self.button_box.button(QDialogButtonBox.Save).setEnabled(True)
             self.do_post_offline_convert_action(False)
             raise err
         finally:
             QApplication.restoreOverrideCursor()
 
+        self.package_task.total_progress_updated.connect(self.update_total)
+        self.package_task.task_progress_updated.connect(self.update_task)
+        self.package_task.taskCompleted.connect(self.on_package_task_completed)
+        self.package_task.taskTerminated.connect(self.on_package_task_terminated)
+
+        self.button_box.button(QDialogButtonBox.Close).setText(self.tr("Cancel"))
+
+        QgsApplication.taskManager().addTask(self.package_task)
+
+    def on_package_task_completed(self):
+        package_task = self.package_task
+        self.package_task = None
+
+        assert package_task
+
+        # copying a cached package is not representative for the packaging throughput
+        if not package_task.is_cached:
+            record_throughput(
+                "package",
+                self.estimated_bytes,
+                time.monotonic() - self.package_started_at,
+            )
+        self.do_post_offline_convert_action(True)
+
         self.accept()
 
         self.progress_group.setEnabled(False)
 
+    def on_package_task_terminated(self):
+        package_task = self.package_task
+        self.package_task = None
+
+        assert package_task
+
+        self.button_box.button(QDialogButtonBox.Close).setText(self.tr("Close"))
+        self.button_box.button(QDialogButtonBox.Close).setEnabled(True)
+        self.button_box.button(QDialogButtonBox.Save).setEnabled(True)
+
+        if package_task.error is None:
+            self.statusLabel.setText(self.tr("Packaging canceled"))
+            return
+
+        QgsMessageLog.logMessage(
+            package_task.error_traceback, "Python Error", Qgis.Critical
+        )
+        self.do_post_offline_convert_action(False)
+
+    def reject(self):
+        # while packaging, the close button cancels the packaging instead
+        if self.package_task:
+            self.package_task.cancel()
+            self.button_box.button(QDialogButtonBox.Close).setText(
+                self.tr("Canceling…")
+            )
+            self.button_box.button(QDialogButtonBox.Close).setEnabled(False)
+            return
+
+        if self.size_estimator:
+            self.size_estimator.cancel()
+            self.size_estimator = None
+
+        super().reject()
+
     def do_post_offline_convert_action(self, is_success):
         """
         Show an information label that the project has been copied
         with a nice link to open the result folder.
         """
-        if is_success:
+        zip_path = self.get_zip_path()
+
+        if is_success and zip_path:
+            result_message = self.tr(
+                "Finished creating the project archive {result_file}. Please extract it on "
+                "your QField device."
+            ).format(
+                result_file='<a href="{folder}">{display_file}</a>'.format(
+                    folder=QUrl.fromLocalFile(os.path.dirname(zip_path)).toString(),
+                    display_file=QDir.toNativeSeparators(zip_path),
+                )
+            )
+            status = Qgis.Success
+        elif is_success:
             export_folder = self.get_export_folder_from_dialog()
             result_message = self.tr(
                 "Finished creating the project at {result_folder}. Please copy this folder to "
@@ -54,3 +54,4 @@ class PreferencesWidget(WidgetUi, QgsOptionsPageWidget, SettingDialog):
 
     def apply(self):
         self.set_values_from_widgets()
+        Preferences.invalidate_cache()
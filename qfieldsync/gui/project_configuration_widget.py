@@ -145,6 +145,10 @@ class ProjectConfigurationWidget(WidgetUi, QgsOptionsPageWidget):
         for theme in self.project.mapThemeCollection().mapThemes():
             self.mapThemeComboBox.addItem(theme)
 
+        self.baseMapFormatComboBox.clear()
+        self.baseMapFormatComboBox.addItem(self.tr("GeoPackage"), "gpkg")
+        self.baseMapFormatComboBox.addItem(self.tr("MBTiles"), "mbtiles")
+
         self.layerComboBox.setFilters(QgsMapLayerProxyModel.RasterLayer)
         self.digitizingLogsLayerComboBox.setFilters(QgsMapLayerProxyModel.PointLayer)
         self.digitizingLogsLayerComboBox.setAllowEmptyLayer(True)
@@ -185,6 +189,14 @@ class ProjectConfigurationWidget(WidgetUi, QgsOptionsPageWidget):
 
         self.mapUnitsPerPixel.setValue(self.__project_configuration.base_map_mupp)
         self.tileSize.setValue(self.__project_configuration.base_map_tile_size)
+        self.baseMapFormatComboBox.setCurrentIndex(
+            max(
+                self.baseMapFormatComboBox.findData(
+                    self.preferences.value("baseMapFormat")
+                ),
+                0,
+            )
+        )
         self.onlyOfflineCopyFeaturesInAoi.setChecked(
             self.__project_configuration.offline_copy_only_aoi
         )
@@ -260,6 +272,9 @@ class ProjectConfigurationWidget(WidgetUi, QgsOptionsPageWidget):
             self.mapUnitsPerPixel.value()
         )
         self.__project_configuration.base_map_tile_size = self.tileSize.value()
+        self.preferences.set_value(
+            "baseMapFormat", self.baseMapFormatComboBox.currentData()
+        )
 
         self.__project_configuration.maximum_image_width_height = (
             self.maximumImageWidthHeight.value()
@@ -23,7 +23,7 @@
 import os
 from pathlib import Path
 
-from qgis.core import QgsProject
+from qgis.core import Qgis, QgsMessageLog, QgsProject
 from qgis.PyQt.QtCore import QDir
 from qgis.PyQt.QtWidgets import QDialog, QDialogButtonBox, QMessageBox
 from qgis.PyQt.uic import loadUiType
@@ -33,11 +33,11 @@ from qfieldsync.gui.dirs_to_copy_widget import DirsToCopyWidget
 from qfieldsync.libqfieldsync import ProjectConfiguration
 from qfieldsync.libqfieldsync.utils.exceptions import NoProjectFoundError
 from qfieldsync.libqfieldsync.utils.file_utils import (
-    copy_attachments,
     get_project_in_folder,
     import_file_checksum,
 )
 from qfieldsync.libqfieldsync.utils.qgis import make_temp_qgis_file, open_project
+from qfieldsync.utils.file_utils import sync_attachments
 from qfieldsync.utils.qgis_utils import import_checksums_of_project
 from qfieldsync.utils.qt_utils import make_folder_selector
 
@@ -153,22 +153,34 @@ class SynchronizeDialog(QDialog, DialogUi):
 
                 # use the import dirs to copy selection if available, otherwise keep the old behavior
                 if import_dirs_to_copy:
-                    for path, should_copy in import_dirs_to_copy.items():
-                        if not should_copy:
-                            continue
-
-                        copy_attachments(
-                            qfield_path,
-                            original_path.parent,
-                            path,
-                        )
+                    attachment_dirs = [
+                        path
+                        for path, should_copy in import_dirs_to_copy.items()
+                        if should_copy
+                    ]
                 else:
-                    for attachment_dir in self.preferences.value("attachmentDirs"):
-                        copy_attachments(
-                            qfield_path,
-                            original_path.parent,
+                    attachment_dirs = self.preferences.value("attachmentDirs")
+
+                for attachment_dir in attachment_dirs:
+                    stats = sync_attachments(
+                        qfield_path,
+                        original_path.parent,
+                        attachment_dir,
+                        self.preferences.value("attachmentsHardlink"),
+                    )
+
+                    QgsMessageLog.logMessage(
+                        self.tr(
+                            'Attachments "{}": {} copied, {} hardlinked, {} unchanged.'
+                        ).format(
                             attachment_dir,
-                        )
+                            stats["copied"],
+                            stats["linked"],
+                            stats["skipped"],
+                        ),
+                        "QFieldSync",
+                        Qgis.Info,
+                    )
 
                 # save the data_file_checksum to the project and save it
                 imported_files_checksums.append(import_file_checksum(str(qfield_path)))
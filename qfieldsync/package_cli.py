@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QFieldSync
+                             -------------------
+        begin                : 2026-10-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+Packages a project for multiple QField devices at once, each with its own export folder and area of interest:
+
+    python -m qfieldsync.package_cli --json project.qgs targets.json
+
+The targets file is a JSON list of objects with "export_folder", "area_of_interest" (WKT) and "area_of_interest_crs"
+(e.g. "EPSG:2056"). The exit code is 0 if all the targets are packaged, 1 if any of them failed and 2 if the packaging
+could not even start.
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from qgis.core import QgsApplication, QgsProject
+
+from qfieldsync.cli import (
+    EXIT_NOT_STARTED,
+    EXIT_PROJECT_FAILED,
+    EXIT_SUCCESS,
+    SyncReporter,
+    wait_for,
+)
+from qfieldsync.core.batch_packager import BatchPackager, PackageTarget
+from qfieldsync.core.preferences import Preferences
+
+
+def read_targets(targets_path: str) -> List[PackageTarget]:
+    with open(targets_path, "r", encoding="utf-8") as f:
+        targets = json.load(f)
+
+    for target in targets:
+        for key in ("export_folder", "area_of_interest", "area_of_interest_crs"):
+            if not target.get(key):
+                raise ValueError(f'Target is missing "{key}": {target}')
+
+    return targets
+
+
+def report_target_finished(
+    reporter: SyncReporter, batch_packager: BatchPackager, target_idx: int
+) -> None:
+    entry = batch_packager.report[target_idx]
+    message = f"{entry['export_folder']}: {entry['status']}"
+
+    if entry["is_cached"]:
+        message += " (from cache)"
+
+    if entry["error"]:
+        message += f"\n  {entry['error']}"
+
+    reporter.event("target_finished", message, target=target_idx, **entry)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m qfieldsync.package_cli",
+        description="Package a project for multiple QField devices.",
+    )
+    parser.add_argument("project", help="QGIS project file")
+    parser.add_argument("targets", help="JSON file with the targets")
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print the progress as JSON lines on stdout",
+    )
+    args = parser.parse_args(argv)
+
+    app = QgsApplication.instance()
+    if app is None:
+        app = QgsApplication([], False)
+        app.initQgis()
+
+    reporter = SyncReporter(args.json)
+    project = QgsProject.instance()
+
+    try:
+        targets = read_targets(args.targets)
+    except (OSError, ValueError) as err:
+        reporter.event("error", f"Failed to start: {err}", message=str(err))
+        return EXIT_NOT_STARTED
+
+    if not project.read(args.project):
+        message = f'Failed to read the project "{args.project}"'
+        reporter.event("error", f"Failed to start: {message}", message=message)
+        return EXIT_NOT_STARTED
+
+    preferences = Preferences()
+    batch_packager = BatchPackager(
+        project,
+        targets,
+        preferences.value("attachmentDirs"),
+    )
+    batch_packager.target_started.connect(
+        lambda target_idx: reporter.event(
+            "target_started",
+            f"{targets[target_idx]['export_folder']}: packaging",
+            target=target_idx,
+            export_folder=targets[target_idx]["export_folder"],
+        )
+    )
+    batch_packager.target_finished.connect(
+        lambda target_idx: report_target_finished(reporter, batch_packager, target_idx)
+    )
+    batch_packager.start()
+
+    if not batch_packager.is_finished:
+        wait_for(batch_packager.finished)
+
+    Preferences.flush()
+
+    if any(entry["status"] != "packaged" for entry in batch_packager.report):
+        return EXIT_PROJECT_FAILED
+
+    return EXIT_SUCCESS
+
+
+if __name__ == "__main__":
+    sys.exit(main())
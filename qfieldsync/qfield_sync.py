@@ -22,6 +22,7 @@
 """
 
 import os
+from typing import List
 
 from qgis.core import Qgis, QgsApplication, QgsOfflineEditing, QgsProject
 from qgis.gui import QgsGui, QgsOptionsWidgetFactory
@@ -30,6 +31,7 @@ from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
 
 from qfieldsync.core import Preferences
+from qfieldsync.core.auto_syncer import AutoSyncer
 from qfieldsync.core.cloud_api import CloudNetworkAccessManager
 from qfieldsync.gui.cloud_browser_tree import (
     QFieldCloudItemGuiProvider,
@@ -135,6 +137,12 @@ class QFieldSync(object):
         self.network_manager.projects_cache.projects_updated.connect(
             self.update_button_enabled_status
         )
+        self.network_manager.mutation_queue.mutation_queued.connect(
+            self.on_cloud_mutation_queued
+        )
+        self.network_manager.mutation_queue.mutation_failed.connect(
+            self.on_cloud_mutation_failed
+        )
 
         self.cloud_item_provider = QFieldCloudItemProvider(self.network_manager)
         QgsApplication.instance().dataItemProviderRegistry().addProvider(
@@ -314,8 +322,47 @@ class QFieldSync(object):
 
         self.update_button_enabled_status()
 
+        self.auto_syncer = AutoSyncer(self.network_manager)
+        self.auto_syncer.sync_conflicts.connect(self.on_auto_sync_conflicts)
+
+        # the deferred preferences must be written before QGIS quits
+        QCoreApplication.instance().aboutToQuit.connect(Preferences.flush)
+
+    def on_cloud_mutation_queued(self, uri: str) -> None:
+        self.iface.messageBar().pushMessage(
+            self.tr(
+                "QFieldCloud is unreachable, {} change(s) will be sent once it is reachable again."
+            ).format(len(self.network_manager.mutation_queue.operations)),
+            Qgis.Warning,
+            10,
+        )
+
+    def on_cloud_mutation_failed(self, uri: str, error: str) -> None:
+        self.iface.messageBar().pushMessage(
+            self.tr("Failed to send a queued change to QFieldCloud: {}").format(error),
+            Qgis.Critical,
+            0,
+        )
+
+    def on_auto_sync_conflicts(self, project_id: str, filenames: List[str]) -> None:
+        if not filenames:
+            return
+
+        self.iface.messageBar().pushMessage(
+            self.tr(
+                "The following files were changed both locally and on QFieldCloud, synchronize the project manually to choose which copy to keep: {}"
+            ).format(", ".join(filenames)),
+            Qgis.Warning,
+            0,
+        )
+
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
+        QCoreApplication.instance().aboutToQuit.disconnect(Preferences.flush)
+        Preferences.flush()
+
+        self.auto_syncer.stop()
+
         for action in self.actions:
             self.iface.removePluginMenu(self.menu, action)
             self.iface.removeToolBarIcon(action)
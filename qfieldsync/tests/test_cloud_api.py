@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ QFieldSync
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+from unittest.mock import MagicMock
+
+from qgis.PyQt.QtNetwork import QNetworkReply
+from qgis.testing import start_app, unittest
+
+from qfieldsync.core.cloud_api import CloudMutationQueue, CloudProjectsCache
+from qfieldsync.core.preferences import Preferences
+
+start_app()
+
+
+def mocked_network_manager():
+    network_manager = MagicMock()
+    network_manager.has_token.return_value = False
+    network_manager.url = "https://app.qfield.cloud/"
+
+    return network_manager
+
+
+class CloudMutationQueueTest(unittest.TestCase):
+    def setUp(self):
+        Preferences().set_value("qfieldCloudPendingMutations", "[]")
+        self.queue = CloudMutationQueue(mocked_network_manager())
+
+    def tearDown(self):
+        Preferences().set_value("qfieldCloudPendingMutations", "[]")
+
+    def operation(self, operation_id, method, resource, payload=None):
+        return {
+            "id": operation_id,
+            "method": method,
+            "uri": resource.split("/"),
+            "payload": payload,
+            "resource": resource,
+            "url": "https://app.qfield.cloud/",
+            "username": "user",
+            "depends_on": [],
+        }
+
+    def test_coalesce_queued_patch(self):
+        self.queue._operations = [
+            self.operation(
+                "1", "PATCH", "projects/a", {"name": "old", "private": True}
+            ),
+            self.operation("2", "PATCH", "projects/b", {"name": "other"}),
+        ]
+        operation = self.operation("3", "PATCH", "projects/a", {"name": "new"})
+
+        self.queue._coalesce(operation, is_sent=False)
+
+        self.assertEqual(operation["payload"], {"name": "new", "private": True})
+        self.assertEqual([o["id"] for o in self.queue.operations], ["2"])
+
+    def test_coalesce_sent_patch(self):
+        self.queue._operations = [
+            self.operation(
+                "1", "PATCH", "projects/a", {"name": "old", "private": True}
+            ),
+            self.operation("2", "PATCH", "projects/a", {"name": "older"}),
+        ]
+        operation = self.operation("3", "PATCH", "projects/a", {"name": "new"})
+
+        self.queue._coalesce(operation, is_sent=True)
+
+        # the queued updates must not undo the sent one once replayed
+        self.assertEqual([o["id"] for o in self.queue.operations], ["1"])
+        self.assertEqual(self.queue.operations[0]["payload"], {"private": True})
+        self.assertEqual(
+            json.loads(Preferences().value("qfieldCloudPendingMutations")),
+            self.queue.operations,
+        )
+
+    def test_coalesce_delete(self):
+        self.queue._operations = [
+            self.operation("1", "PATCH", "projects/a", {"name": "new"}),
+            self.operation("2", "DELETE", "projects/a/data.gpkg"),
+            self.operation("3", "DELETE", "projects/ab"),
+        ]
+        operation = self.operation("4", "DELETE", "projects/a")
+
+        self.queue._coalesce(operation, is_sent=False)
+
+        self.assertEqual([o["id"] for o in self.queue.operations], ["3"])
+
+    def test_coalesce_skips_replayed(self):
+        self.queue._operations = [
+            self.operation("1", "PATCH", "projects/a", {"name": "old"}),
+        ]
+        self.queue._replies["1"] = MagicMock()
+        operation = self.operation("2", "PATCH", "projects/a", {"name": "new"})
+
+        self.queue._coalesce(operation, is_sent=False)
+
+        self.assertEqual([o["id"] for o in self.queue.operations], ["1"])
+        self.assertEqual(operation["payload"], {"name": "new"})
+
+    def test_send_offline(self):
+        operation = self.operation("1", "PATCH", "projects/a", {"name": "new"})
+        reply = MagicMock()
+        reply.error.return_value = QNetworkReply.HostNotFoundError
+
+        self.queue._on_send_finished(reply, operation)
+
+        self.assertEqual([o["id"] for o in self.queue.operations], ["1"])
+
+    def test_send_timeout(self):
+        operation = self.operation("1", "PATCH", "projects/a", {"name": "new"})
+        reply = MagicMock()
+        reply.error.return_value = QNetworkReply.TimeoutError
+
+        self.queue._on_send_finished(reply, operation)
+
+        # the server might have received the call, so it fails instead of being replayed later
+        self.assertEqual(self.queue.operations, [])
+
+
+class CloudProjectsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.network_manager = mocked_network_manager()
+        self.projects_cache = CloudProjectsCache(self.network_manager)
+        self.updated_count = 0
+        self.received_pages = []
+
+        def on_projects_updated():
+            self.updated_count += 1
+
+        def on_projects_page_received(projects):
+            self.received_pages.append([p.id for p in projects])
+
+        self.projects_cache.projects_updated.connect(on_projects_updated)
+        self.projects_cache.projects_page_received.connect(on_projects_page_received)
+
+    def receive(self, payload, offset):
+        reply = MagicMock()
+        reply.error.return_value = QNetworkReply.NoError
+        self.network_manager.handle_response.return_value = payload
+
+        self.projects_cache._on_get_projects_reply_finished(reply, offset)
+
+    def project_data(self, project_id):
+        return {"id": project_id, "name": project_id, "user_role": "admin"}
+
+    def test_paginated_projects(self):
+        self.receive(
+            {
+                "count": 3,
+                "next": "https://app.qfield.cloud/api/v1/projects/?offset=2",
+                "results": [self.project_data("a"), self.project_data("b")],
+            },
+            0,
+        )
+
+        # the projects are swapped in only once the last page arrives, but each page is available meanwhile
+        self.assertIsNone(self.projects_cache.projects)
+        self.assertEqual(self.updated_count, 0)
+        self.assertEqual(self.received_pages, [["a", "b"]])
+        self.assertEqual(
+            [p.id for p in self.projects_cache.received_projects], ["a", "b"]
+        )
+        self.assertEqual(self.projects_cache.find_project("b").name, "b")
+        self.network_manager.get_projects.assert_called_with(
+            limit=CloudProjectsCache.PROJECTS_PAGE_SIZE, offset=2
+        )
+
+        self.receive({"count": 3, "next": None, "results": [self.project_data("c")]}, 2)
+
+        self.assertEqual([p.id for p in self.projects_cache.projects], ["a", "b", "c"])
+        self.assertIs(
+            self.projects_cache.received_projects, self.projects_cache.projects
+        )
+        self.assertEqual(self.projects_cache.find_project("c").name, "c")
+        self.assertEqual(self.received_pages, [["a", "b"], ["c"]])
+        self.assertEqual(self.updated_count, 1)
+
+    def test_unpaginated_projects(self):
+        self.receive([self.project_data("a"), self.project_data("b")], 0)
+
+        self.network_manager.get_projects.assert_not_called()
+        self.assertEqual([p.id for p in self.projects_cache.projects], ["a", "b"])
+        self.assertEqual(self.received_pages, [["a", "b"]])
+
+    def test_offset_ignored(self):
+        page_size = CloudProjectsCache.PROJECTS_PAGE_SIZE
+        projects_data = [self.project_data(str(i)) for i in range(page_size)]
+
+        self.receive(projects_data, 0)
+        self.receive(projects_data, page_size)
+
+        # a page without new projects ends the pagination
+        self.assertEqual(self.network_manager.get_projects.call_count, 1)
+        self.assertEqual(len(self.projects_cache.projects), page_size)
+        self.assertEqual(len(self.received_pages), 1)
+        self.assertEqual(self.updated_count, 1)
+
+    def test_failed_page(self):
+        self.receive(
+            {"count": 3, "next": "next", "results": [self.project_data("a")]}, 0
+        )
+
+        self.network_manager.handle_response.side_effect = Exception("Timeout")
+        reply = MagicMock()
+        reply.error.return_value = QNetworkReply.TimeoutError
+
+        self.projects_cache._on_get_projects_reply_finished(reply, 1)
+
+        # no partial list of projects
+        self.assertIsNone(self.projects_cache.projects)
+        self.assertIsNone(self.projects_cache.received_projects)
+        self.assertIsNone(self.projects_cache.find_project("a"))
+        self.assertEqual(self.projects_cache.error_reason, "Timeout")
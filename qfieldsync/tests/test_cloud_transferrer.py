@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ QFieldSync
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.testing import start_app, unittest
+
+from qfieldsync.core.cloud_transferrer import TransferBudget
+
+start_app()
+
+
+class Transfer:
+    """Stands for a `FileTransfer`, the budget only needs its size."""
+
+    def __init__(self, size):
+        self.size = size
+
+
+class TransferBudgetTest(unittest.TestCase):
+    def test_max_parallel_requests(self):
+        budget = TransferBudget(max_parallel_requests=2)
+        transfers = [Transfer(1), Transfer(1), Transfer(1)]
+
+        self.assertTrue(budget.acquire(transfers[0]))
+        self.assertTrue(budget.acquire(transfers[1]))
+        self.assertFalse(budget.acquire(transfers[2]))
+
+        budget.release(transfers[0])
+
+        self.assertTrue(budget.acquire(transfers[2]))
+
+    def test_max_parallel_bytes(self):
+        budget = TransferBudget(max_parallel_requests=8, max_parallel_bytes=100)
+        small = Transfer(40)
+        large = Transfer(80)
+        huge = Transfer(1000)
+
+        self.assertTrue(budget.acquire(small))
+        self.assertFalse(budget.acquire(large))
+
+        budget.release(small)
+
+        self.assertTrue(budget.acquire(large))
+
+        budget.release(large)
+
+        # always allowed if nothing else is running
+        self.assertTrue(budget.acquire(huge))
+
+    def test_release_unknown(self):
+        budget = TransferBudget(max_parallel_requests=1)
+        transfer = Transfer(1)
+
+        budget.release(transfer)
+
+        self.assertTrue(budget.acquire(transfer))
+
+    def test_wait(self):
+        budget = TransferBudget(max_parallel_requests=1)
+        running = Transfer(1)
+        calls = []
+
+        def first_callback():
+            calls.append("first")
+            budget.acquire(Transfer(1))
+
+        def second_callback():
+            calls.append("second")
+
+        self.assertTrue(budget.acquire(running))
+
+        budget.wait(first_callback)
+        budget.wait(first_callback)
+        budget.wait(second_callback)
+        budget.release(running)
+
+        # called once, in order, and only as long as there is a free slot
+        self.assertEqual(calls, ["first"])
+
+    def test_cancel_wait(self):
+        budget = TransferBudget(max_parallel_requests=1)
+        running = Transfer(1)
+        calls = []
+
+        def callback():
+            calls.append("callback")
+
+        budget.acquire(running)
+        budget.wait(callback)
+        budget.cancel_wait(callback)
+        budget.release(running)
+
+        self.assertEqual(calls, [])
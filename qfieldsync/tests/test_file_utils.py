@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ QFieldSync
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+
+from qgis.testing import start_app, unittest
+
+from qfieldsync.utils.file_utils import break_hardlink, sync_files, zip_directory
+
+start_app()
+
+
+class FileUtilsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.source_dir = self.temp_dir.joinpath("source")
+        self.target_dir = self.temp_dir.joinpath("target")
+        self.source_dir.joinpath("DCIM").mkdir(parents=True)
+        self.source_dir.joinpath("data.gpkg").write_bytes(b"data")
+        self.source_dir.joinpath("DCIM", "photo.jpg").write_bytes(b"photo")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_sync_files(self):
+        stats = sync_files(self.source_dir, self.target_dir)
+
+        self.assertEqual(stats["copied"], 2)
+        self.assertEqual(stats["skipped"], 0)
+        self.assertEqual(self.target_dir.joinpath("data.gpkg").read_bytes(), b"data")
+        self.assertEqual(
+            self.target_dir.joinpath("DCIM", "photo.jpg").read_bytes(), b"photo"
+        )
+
+    def test_sync_files_skips_unchanged(self):
+        sync_files(self.source_dir, self.target_dir)
+
+        # same size, but modified way later
+        self.source_dir.joinpath("data.gpkg").write_bytes(b"DATA")
+        mtime = self.source_dir.joinpath("data.gpkg").stat().st_mtime + 60
+        os.utime(self.source_dir.joinpath("data.gpkg"), (mtime, mtime))
+
+        stats = sync_files(self.source_dir, self.target_dir)
+
+        self.assertEqual(stats["copied"], 1)
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(self.target_dir.joinpath("data.gpkg").read_bytes(), b"DATA")
+
+    def test_sync_files_hardlinks(self):
+        stats = sync_files(self.source_dir, self.target_dir, use_hardlinks=True)
+
+        self.assertEqual(stats["linked"], 2)
+        self.assertTrue(
+            self.source_dir.joinpath("data.gpkg").samefile(
+                self.target_dir.joinpath("data.gpkg")
+            )
+        )
+
+        # the same inode is recognized as the same file
+        stats = sync_files(self.source_dir, self.target_dir, use_hardlinks=True)
+
+        self.assertEqual(stats["skipped"], 2)
+
+    def test_sync_files_replaces_hardlinks(self):
+        sync_files(self.source_dir, self.target_dir, use_hardlinks=True)
+
+        stats = sync_files(self.source_dir, self.target_dir)
+
+        self.assertEqual(stats["copied"], 2)
+        self.assertFalse(
+            self.source_dir.joinpath("data.gpkg").samefile(
+                self.target_dir.joinpath("data.gpkg")
+            )
+        )
+
+        # writing the copy leaves the source untouched
+        self.target_dir.joinpath("data.gpkg").write_bytes(b"edited")
+
+        self.assertEqual(self.source_dir.joinpath("data.gpkg").read_bytes(), b"data")
+
+    def test_break_hardlink(self):
+        sync_files(self.source_dir, self.target_dir, use_hardlinks=True)
+        target_path = self.target_dir.joinpath("data.gpkg")
+
+        break_hardlink(target_path)
+        target_path.write_bytes(b"downloaded")
+
+        self.assertEqual(self.source_dir.joinpath("data.gpkg").read_bytes(), b"data")
+
+        # a file without other links is kept
+        break_hardlink(target_path)
+
+        self.assertEqual(target_path.read_bytes(), b"downloaded")
+
+    def test_sync_files_delete_extraneous(self):
+        self.target_dir.joinpath("stale").mkdir(parents=True)
+        self.target_dir.joinpath("stale", "old.jpg").write_bytes(b"old")
+        self.target_dir.joinpath("old.gpkg").write_bytes(b"old")
+
+        stats = sync_files(self.source_dir, self.target_dir)
+
+        self.assertEqual(stats["deleted"], 0)
+        self.assertTrue(self.target_dir.joinpath("old.gpkg").exists())
+
+        stats = sync_files(self.source_dir, self.target_dir, delete_extraneous=True)
+
+        self.assertEqual(stats["deleted"], 2)
+        self.assertFalse(self.target_dir.joinpath("old.gpkg").exists())
+        self.assertFalse(self.target_dir.joinpath("stale").exists())
+        self.assertTrue(self.target_dir.joinpath("DCIM", "photo.jpg").exists())
+
+    def test_zip_directory(self):
+        zip_path = self.temp_dir.joinpath("package.zip")
+
+        zip_directory(self.source_dir, zip_path)
+
+        with zipfile.ZipFile(zip_path) as zip_file:
+            self.assertEqual(
+                sorted(zip_file.namelist()), ["DCIM/photo.jpg", "data.gpkg"]
+            )
+            self.assertEqual(zip_file.read("data.gpkg"), b"data")
+            # already compressed files are stored as they are
+            self.assertEqual(
+                zip_file.getinfo("DCIM/photo.jpg").compress_type, zipfile.ZIP_STORED
+            )
+            self.assertEqual(
+                zip_file.getinfo("data.gpkg").compress_type, zipfile.ZIP_DEFLATED
+            )
+
+        self.assertFalse(self.temp_dir.joinpath(".package.zip.tmp").exists())
+
+    def test_zip_directory_replaces_archive(self):
+        zip_path = self.temp_dir.joinpath("package.zip")
+        zip_directory(self.source_dir, zip_path)
+
+        self.source_dir.joinpath("data.gpkg").unlink()
+        zip_directory(self.source_dir, zip_path)
+
+        with zipfile.ZipFile(zip_path) as zip_file:
+            self.assertEqual(zip_file.namelist(), ["DCIM/photo.jpg"])
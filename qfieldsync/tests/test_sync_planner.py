@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ QFieldSync
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from qgis.testing import start_app, unittest
+
+from qfieldsync.core.cloud_project import CloudProject, ProjectFile
+from qfieldsync.core.sync_planner import ConflictPolicy, plan_file_transfers
+
+start_app()
+
+CLOUD_UPDATED_AT = "01.01.2020 12:00:00 UTC"
+CLOUD_UPDATED_AT_TIMESTAMP = 1577880000
+
+
+class PlanFileTransfersTest(unittest.TestCase):
+    def setUp(self):
+        self.local_dir = tempfile.mkdtemp()
+        self.cloud_project = CloudProject({"id": "project_id", "user_role": "admin"})
+
+    def tearDown(self):
+        shutil.rmtree(self.local_dir)
+
+    def project_file(self, name, local_content=None, cloud_content=None, mtime=None):
+        data = {"name": name}
+
+        if local_content is not None:
+            local_path = Path(self.local_dir, name)
+            local_path.write_bytes(local_content)
+
+            if mtime is not None:
+                os.utime(local_path, (mtime, mtime))
+
+        if cloud_content is not None:
+            data["size"] = len(cloud_content)
+            data["sha256"] = hashlib.sha256(cloud_content).hexdigest()
+            data["versions"] = [{"last_modified": CLOUD_UPDATED_AT}]
+
+        return ProjectFile(data, local_dir=self.local_dir)
+
+    def test_newer_policy(self):
+        # 2010 is before and 2030 is after the cloud update
+        older = self.project_file("older.gpkg", b"local", b"cloud", mtime=1262304000)
+        newer = self.project_file("newer.gpkg", b"local", b"cloud", mtime=1893456000)
+        cloud_only = self.project_file("cloud_only.gpkg", cloud_content=b"cloud")
+        local_only = self.project_file("local_only.gpkg", local_content=b"local")
+
+        files = plan_file_transfers(
+            self.cloud_project, [older, newer, cloud_only, local_only]
+        )
+
+        self.assertEqual(files["to_upload"], [newer, local_only])
+        self.assertEqual(files["to_download"], [older, cloud_only])
+        self.assertEqual(files["to_delete"], [])
+        self.assertEqual(files["conflicts"], [])
+
+    def test_local_policy(self):
+        both = self.project_file("both.gpkg", b"local", b"cloud", mtime=1262304000)
+        cloud_only = self.project_file("cloud_only.gpkg", cloud_content=b"cloud")
+
+        files = plan_file_transfers(
+            self.cloud_project, [both, cloud_only], ConflictPolicy.Local
+        )
+
+        self.assertEqual(files["to_upload"], [both])
+        self.assertEqual(files["to_delete"], [cloud_only])
+
+    def test_local_policy_reader(self):
+        self.cloud_project.update_data({"user_role": "reader"})
+        both = self.project_file("both.gpkg", b"local", b"cloud", mtime=1893456000)
+
+        files = plan_file_transfers(self.cloud_project, [both], ConflictPolicy.Local)
+
+        # readers cannot upload
+        self.assertEqual(files["to_upload"], [])
+        self.assertEqual(files["to_download"], [both])
+
+    def test_cloud_policy(self):
+        both = self.project_file("both.gpkg", b"local", b"cloud", mtime=1893456000)
+        local_only = self.project_file("local_only.gpkg", local_content=b"local")
+
+        files = plan_file_transfers(
+            self.cloud_project, [both, local_only], ConflictPolicy.Cloud
+        )
+
+        self.assertEqual(files["to_download"], [both])
+        self.assertEqual(files["to_delete"], [local_only])
+
+    def test_conflicts(self):
+        synced_hash = hashlib.sha256(b"synced").hexdigest()
+        local_changed = self.project_file(
+            "local_changed.gpkg", b"local", b"synced", mtime=1893456000
+        )
+        cloud_changed = self.project_file(
+            "cloud_changed.gpkg", b"synced", b"cloud", mtime=1262304000
+        )
+        both_changed = self.project_file(
+            "both_changed.gpkg", b"local", b"cloud", mtime=1893456000
+        )
+        never_synced = self.project_file(
+            "never_synced.gpkg", b"local", b"cloud", mtime=1893456000
+        )
+
+        files = plan_file_transfers(
+            self.cloud_project,
+            [local_changed, cloud_changed, both_changed, never_synced],
+            synced_hashes={
+                "local_changed.gpkg": synced_hash,
+                "cloud_changed.gpkg": synced_hash,
+                "both_changed.gpkg": synced_hash,
+            },
+        )
+
+        self.assertEqual(files["to_upload"], [local_changed])
+        self.assertEqual(files["to_download"], [cloud_changed])
+        self.assertEqual(files["conflicts"], [both_changed, never_synced])
+
+    def test_synced_hashes_direction(self):
+        synced_hash = hashlib.sha256(b"synced").hexdigest()
+        # the modification times contradict the changed copies, the synced hashes win
+        local_changed = self.project_file(
+            "local_changed.gpkg", b"local", b"synced", mtime=1262304000
+        )
+        cloud_changed = self.project_file(
+            "cloud_changed.gpkg", b"synced", b"cloud", mtime=1893456000
+        )
+        local_deleted = self.project_file("local_deleted.gpkg", cloud_content=b"synced")
+        cloud_deleted = self.project_file(
+            "cloud_deleted.gpkg", local_content=b"synced", mtime=1893456000
+        )
+
+        files = plan_file_transfers(
+            self.cloud_project,
+            [local_changed, cloud_changed, local_deleted, cloud_deleted],
+            synced_hashes={
+                "local_changed.gpkg": synced_hash,
+                "cloud_changed.gpkg": synced_hash,
+                "local_deleted.gpkg": synced_hash,
+                "cloud_deleted.gpkg": synced_hash,
+            },
+        )
+
+        self.assertEqual(files["to_upload"], [local_changed])
+        self.assertEqual(files["to_download"], [cloud_changed])
+        self.assertEqual(files["to_delete"], [local_deleted, cloud_deleted])
+        self.assertEqual(files["conflicts"], [])
+
+    @unittest.skipUnless(hasattr(time, "tzset"), "requires time.tzset")
+    def test_newer_policy_utc(self):
+        old_tz = os.environ.get("TZ")
+        # the local time is ahead of UTC, a naive parsing would make the cloud copy 9 hours older
+        os.environ["TZ"] = "Asia/Tokyo"
+        time.tzset()
+
+        try:
+            older = self.project_file(
+                "older.gpkg", b"local", b"cloud", mtime=CLOUD_UPDATED_AT_TIMESTAMP - 60
+            )
+            newer = self.project_file(
+                "newer.gpkg", b"local", b"cloud", mtime=CLOUD_UPDATED_AT_TIMESTAMP + 60
+            )
+
+            files = plan_file_transfers(self.cloud_project, [older, newer])
+        finally:
+            if old_tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = old_tz
+
+            time.tzset()
+
+        self.assertEqual(files["to_upload"], [newer])
+        self.assertEqual(files["to_download"], [older])
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ QFieldSync
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by OPENGIS.ch
+        email                : info@opengis.ch
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from qgis.testing import start_app, unittest
+
+from qfieldsync.core.wal_checkpointer import WalCheckpointer
+
+start_app()
+
+
+class WalCheckpointerTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.database_path = os.path.join(self.temp_dir, "data.gpkg")
+        # closing the last connection checkpoints the WAL, so keep one open
+        self.conn = sqlite3.connect(self.database_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE points (id INTEGER PRIMARY KEY)")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def insert(self):
+        self.conn.execute("INSERT INTO points DEFAULT VALUES")
+        self.conn.commit()
+
+    def test_checkpoint_only_changed(self):
+        checkpointer = WalCheckpointer()
+        self.insert()
+
+        self.assertTrue(checkpointer.checkpoint(self.database_path))
+        self.assertFalse(checkpointer.checkpoint(self.database_path))
+
+        self.insert()
+
+        self.assertTrue(checkpointer.checkpoint(self.database_path))
+        self.assertEqual(checkpointer.take_stats()[0], 2)
+        self.assertEqual(checkpointer.take_stats()[0], 0)
+
+    def test_checkpoint_without_wal(self):
+        checkpointer = WalCheckpointer()
+
+        self.assertFalse(
+            checkpointer.checkpoint(os.path.join(self.temp_dir, "missing.gpkg"))
+        )
+
+    def test_checkpoint_truncate(self):
+        checkpointer = WalCheckpointer()
+        self.insert()
+
+        # unknown open databases, never truncated
+        self.assertTrue(checkpointer.checkpoint(self.database_path))
+        self.assertGreater(os.path.getsize(self.database_path + "-wal"), 0)
+
+        # known open databases, the others are truncated
+        checkpointer._open_database_paths = set()
+        self.insert()
+
+        self.assertTrue(checkpointer.checkpoint(self.database_path))
+        self.assertEqual(os.path.getsize(self.database_path + "-wal"), 0)
@@ -18,12 +18,36 @@
  *                                                                         *
  ***************************************************************************/
 """
+import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
-from typing import List, TypedDict, Union
+from typing import List, Optional, Set, Tuple, TypedDict, Union
 
 PathLike = Union[Path, str]
 
+# compressing these files again only costs time, so they are stored as they are in ZIP archives
+ALREADY_COMPRESSED_SUFFIXES = {
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".webp",
+    ".heic",
+    ".gif",
+    ".mp3",
+    ".m4a",
+    ".ogg",
+    ".mp4",
+    ".mov",
+    ".webm",
+    ".zip",
+    ".gz",
+    ".7z",
+    ".pdf",
+}
+
 
 class DirectoryTreeType(str, Enum):
     FILE = "file"
@@ -58,3 +82,216 @@ def path_to_dict(path: PathLike, dirs_only: bool = False) -> DirectoryTreeDict:
     node["content"].sort(key=lambda node: node["path"].name)
 
     return node
+
+
+class FileSyncStats(TypedDict):
+    copied: int
+    linked: int
+    skipped: int
+    deleted: int
+
+
+def _is_same_file(source_stat: os.stat_result, target_stat: os.stat_result) -> bool:
+    return (source_stat.st_dev, source_stat.st_ino) == (
+        target_stat.st_dev,
+        target_stat.st_ino,
+    )
+
+
+def _is_same_file_content(
+    source_stat: os.stat_result, target_stat: os.stat_result
+) -> bool:
+    if _is_same_file(source_stat, target_stat):
+        return True
+
+    # some file systems (e.g. FAT on SD cards) store the modification time with a 2 seconds resolution
+    return (
+        source_stat.st_size == target_stat.st_size
+        and abs(source_stat.st_mtime - target_stat.st_mtime) <= 2
+    )
+
+
+def break_hardlink(path: PathLike) -> None:
+    """Removes the file if it is hardlinked elsewhere, e.g. to an original attachment, see `sync_files`.
+
+    Must be called before writing a file in place, otherwise the write changes all the links, i.e. the original too.
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _sync_file(source_path: Path, target_path: Path, use_hardlinks: bool) -> str:
+    source_stat = source_path.stat()
+
+    try:
+        target_stat: Optional[os.stat_result] = target_path.stat()
+    except FileNotFoundError:
+        target_stat = None
+
+    if target_stat and _is_same_file(source_stat, target_stat) and not use_hardlinks:
+        # a hardlink of an earlier sync, writing into it would change the source too
+        target_path.unlink()
+        target_stat = None
+
+    if target_stat and _is_same_file_content(source_stat, target_stat):
+        return "skipped"
+
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if use_hardlinks:
+        try:
+            if target_stat:
+                target_path.unlink()
+
+            os.link(source_path, target_path)
+
+            return "linked"
+        except OSError:
+            # e.g. the target is on another volume or the file system does not support hardlinks
+            pass
+
+    # `copy2` keeps the modification time, so the file is skipped next time
+    shutil.copy2(source_path, target_path)
+
+    return "copied"
+
+
+def sync_files(
+    source_path: PathLike,
+    target_path: PathLike,
+    use_hardlinks: bool = False,
+    max_workers: int = 8,
+    delete_extraneous: bool = False,
+) -> FileSyncStats:
+    """Copies the `source_path` file or directory to `target_path`.
+
+    Only the new or changed files are copied, compared by size and modification time, and the files are copied by a
+    pool of worker threads. If `use_hardlinks` is set, the files are hardlinked instead of copied whenever possible.
+    A hardlink shares its content with the source, so whatever writes into the target files later must call
+    `break_hardlink` first. If `delete_extraneous` is set, the files and directories within `target_path` that are not in `source_path` are
+    deleted, so the target becomes a mirror of the source.
+    """
+    source_path = Path(source_path)
+    target_path = Path(target_path)
+    stats: FileSyncStats = {
+        "copied": 0,
+        "linked": 0,
+        "skipped": 0,
+        "deleted": 0,
+    }
+    file_paths: List[Tuple[Path, Path]] = []
+
+    if source_path.is_file():
+        file_paths.append((source_path, target_path))
+    elif source_path.is_dir():
+        for dirpath, _dirnames, filenames in os.walk(source_path):
+            relative_dir = Path(dirpath).relative_to(source_path)
+
+            for filename in filenames:
+                file_paths.append(
+                    (
+                        Path(dirpath, filename),
+                        target_path.joinpath(relative_dir, filename),
+                    )
+                )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda paths: _sync_file(paths[0], paths[1], use_hardlinks),
+            file_paths,
+        )
+
+        for result in results:
+            stats[result] += 1
+
+    if delete_extraneous and source_path.is_dir() and target_path.is_dir():
+        stats["deleted"] = _delete_extraneous_files(
+            target_path, {target for _source, target in file_paths}
+        )
+
+    return stats
+
+
+def _delete_extraneous_files(target_dir: Path, kept_paths: Set[Path]) -> int:
+    kept_dirs = {parent for path in kept_paths for parent in path.parents}
+    deleted_count = 0
+
+    for dirpath, dirnames, filenames in os.walk(target_dir, topdown=False):
+        for filename in filenames:
+            path = Path(dirpath, filename)
+
+            if path not in kept_paths:
+                path.unlink()
+                deleted_count += 1
+
+        for dirname in dirnames:
+            path = Path(dirpath, dirname)
+
+            if path in kept_dirs:
+                continue
+
+            if path.is_symlink():
+                path.unlink()
+            else:
+                path.rmdir()
+
+    return deleted_count
+
+
+def sync_attachments(
+    source_dir: PathLike,
+    target_dir: PathLike,
+    dir_name: str,
+    use_hardlinks: bool = False,
+    max_workers: int = 8,
+) -> FileSyncStats:
+    """Copies the `dir_name` file or directory from `source_dir` to `target_dir`.
+
+    Unlike `copy_attachments`, only the new or changed files are copied, see `sync_files`.
+    """
+    return sync_files(
+        Path(source_dir).joinpath(dir_name),
+        Path(target_dir).joinpath(dir_name),
+        use_hardlinks,
+        max_workers,
+    )
+
+
+def zip_directory(source_dir: PathLike, zip_path: PathLike) -> None:
+    """Writes the files within the directory into a ZIP archive.
+
+    The files are streamed into the archive one by one, the already compressed ones without compression. The archive
+    is written next to the target path first, so an existing archive is replaced only once the new one is complete.
+    """
+    source_dir = Path(source_dir)
+    zip_path = Path(zip_path)
+    temp_zip_path = zip_path.with_name(f".{zip_path.name}.tmp")
+
+    try:
+        with zipfile.ZipFile(
+            temp_zip_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True
+        ) as zip_file:
+            for dirpath, dirnames, filenames in os.walk(source_dir):
+                dirnames.sort()
+
+                for filename in sorted(filenames):
+                    file_path = Path(dirpath, filename)
+                    compress_type = (
+                        zipfile.ZIP_STORED
+                        if file_path.suffix.lower() in ALREADY_COMPRESSED_SUFFIXES
+                        else zipfile.ZIP_DEFLATED
+                    )
+
+                    zip_file.write(
+                        file_path,
+                        file_path.relative_to(source_dir).as_posix(),
+                        compress_type=compress_type,
+                    )
+
+        os.replace(temp_zip_path, zip_path)
+    finally:
+        if temp_zip_path.exists():
+            temp_zip_path.unlink()
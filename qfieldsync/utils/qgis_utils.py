@@ -19,14 +19,76 @@
  ***************************************************************************/
 """
 
-from typing import List
+import os
+from pathlib import Path
+from typing import Any, List, Optional, Set
 
-from qgis.core import QgsProject
+from qgis.core import QgsMapLayer, QgsProject, QgsProviderRegistry
 
 from qfieldsync.libqfieldsync import ProjectConfiguration
 from qfieldsync.libqfieldsync.utils.file_utils import get_project_in_folder
 from qfieldsync.libqfieldsync.utils.qgis import open_project
 
+# providers of the online layers, which are not copied into a package
+ONLINE_PROVIDERS = ("wms", "xyz", "arcgismapserver")
+# spatial index files, which do not change the data
+SPATIAL_INDEX_SUFFIXES = (".qix", ".sbn", ".sbx")
+
+
+def get_project_layer_paths(project: QgsProject = None) -> Set[str]:
+    """Returns the normalized paths of the files opened as layers in the project."""
+    project = project or QgsProject.instance()
+    layer_paths = set()
+
+    for layer in project.mapLayers().values():
+        uri_parts = QgsProviderRegistry.instance().decodeUri(
+            layer.providerType(), layer.source()
+        )
+
+        if uri_parts.get("path"):
+            layer_paths.add(os.path.normcase(str(Path(uri_parts["path"]))))
+
+    return layer_paths
+
+
+def get_layer_fingerprint(layer: QgsMapLayer) -> Optional[List[Any]]:
+    """Returns the source, provider, feature count and the modification time and size of each source file.
+
+    Only the layers stored in local files have a fingerprint, as the changes of the others cannot be detected.
+    """
+    if not layer.dataProvider() or layer.dataProvider().name() not in ("ogr", "gdal"):
+        return None
+
+    path = Path(layer.source().split("|")[0])
+
+    if not path.is_file():
+        return None
+
+    # e.g. editing the attributes of a Shapefile changes only the ".dbf" file
+    file_paths = [
+        file_path
+        for file_path in path.parent.iterdir()
+        if file_path.stem == path.stem
+        and file_path.suffix.lower() not in SPATIAL_INDEX_SUFFIXES
+    ]
+    file_paths.append(Path(f"{path}-wal"))
+    file_stats = []
+
+    for file_path in sorted(file_paths):
+        try:
+            stat = file_path.stat()
+        except OSError:
+            continue
+
+        file_stats.append([file_path.name, stat.st_mtime_ns, stat.st_size])
+
+    return [
+        layer.source(),
+        layer.dataProvider().name(),
+        layer.featureCount() if layer.type() == QgsMapLayer.VectorLayer else None,
+        file_stats,
+    ]
+
 
 def import_checksums_of_project(dirname: str) -> List[str]:
     project = QgsProject.instance()